@@ -20,6 +20,7 @@ from utils.logging_config import setup_logging
 from routes.main import register_main_routes
 from routes.api import register_api_routes
 from models.embedding_manager import DatasetEmbeddingManager
+from services.collection_extents import get_collection_extent_cache
 from config import Config
 
 # Configure logging
@@ -59,6 +60,12 @@ def create_app(config_object=Config):
         # This is critical, we may need to exit if this fails
         raise
     
+    # Keep cached collection extents fresh without blocking the tile path
+    get_collection_extent_cache(
+        config_object.COLLECTION_EXTENT_CACHE_PATH,
+        config_object.COLLECTION_EXTENT_REFRESH_INTERVAL
+    ).start_background_refresh()
+    
     # Register routes
     register_main_routes(app)
     register_api_routes(app, embedding_manager)
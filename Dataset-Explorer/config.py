@@ -27,6 +27,23 @@ class Config:
     DEBUG = os.environ.get('DEBUG', 'True').lower() == 'true'
     FEATURE_LIMIT = int(os.environ.get('FEATURE_LIMIT', '10000'))  # Default limit for feature collections
     
+    # Vector tile path for FeatureCollections (requires mapbox-vector-tile)
+    VECTOR_TILES_ENABLED = os.environ.get('VECTOR_TILES_ENABLED', 'True').lower() == 'true'
+    VECTOR_TILE_CACHE_DIR = os.environ.get('VECTOR_TILE_CACHE_DIR', 'vector_tile_cache')
+    VECTOR_TILE_MAX_AGE = int(os.environ.get('VECTOR_TILE_MAX_AGE', str(30 * 24 * 3600)))  # 30 days
+    VECTOR_TILE_MIN_ZOOM = int(os.environ.get('VECTOR_TILE_MIN_ZOOM', '10'))  # Below this a tile holds too many features
+    VECTOR_TILE_FEATURE_LIMIT = int(os.environ.get('VECTOR_TILE_FEATURE_LIMIT', '50000'))  # Per tile
+    
+    # Cached first/last image dates and band lists of ImageCollections
+    COLLECTION_EXTENT_CACHE_PATH = os.environ.get('COLLECTION_EXTENT_CACHE_PATH', 'saved_indexes/collection_extents.json')
+    COLLECTION_EXTENT_REFRESH_INTERVAL = int(os.environ.get('COLLECTION_EXTENT_REFRESH_INTERVAL', '86400'))  # 1 day
+    COLLECTION_EXTENT_RETRY_INTERVAL = int(os.environ.get('COLLECTION_EXTENT_RETRY_INTERVAL', '3600'))  # Wait after a failed probe
+    
+    # Catalog preview thumbnails (see generate_previews.py)
+    PREVIEW_IMAGE_DIR = os.environ.get('PREVIEW_IMAGE_DIR', 'static/preview_images')
+    PREVIEW_IMAGE_SIZE = int(os.environ.get('PREVIEW_IMAGE_SIZE', '256'))
+    PREVIEW_WORKERS = int(os.environ.get('PREVIEW_WORKERS', '4'))  # Concurrent Earth Engine thumbnail requests
+    
     # App specific settings
     APP_NAME = "GEE Dataset Explorer"
     APP_VERSION = "1.1.0"
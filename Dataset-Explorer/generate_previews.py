@@ -0,0 +1,74 @@
+"""
+Render preview thumbnails for every dataset in the catalog.
+
+Usage:
+    python generate_previews.py                    # render new or changed datasets
+    python generate_previews.py --force            # re-render everything
+    python generate_previews.py --source placeholder --limit 20
+
+Thumbnails are written to static/preview_images/{id}.png, which is where the
+search results point. Runs are resumable: datasets whose catalog entry has not
+changed since their thumbnail was rendered are skipped.
+"""
+import os
+import sys
+import pickle
+import logging
+import argparse
+
+script_dir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, script_dir)
+
+import ee
+from utils.logging_config import setup_logging
+from services.preview_images import generate_previews, EarthEngineImageSource, PlaceholderImageSource
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate catalog preview thumbnails")
+    parser.add_argument('--datasets', default=Config.DATASETS_PATH, help="Path to the pickled catalog")
+    parser.add_argument('--output', default=os.path.join(script_dir, Config.PREVIEW_IMAGE_DIR),
+                        help="Directory the thumbnails are written to")
+    parser.add_argument('--workers', type=int, default=Config.PREVIEW_WORKERS, help="Concurrent renders")
+    parser.add_argument('--size', type=int, default=Config.PREVIEW_IMAGE_SIZE, help="Thumbnail size in pixels")
+    parser.add_argument('--source', choices=['earthengine', 'placeholder'], default='earthengine',
+                        help="Image source; 'placeholder' renders palette swatches without Earth Engine")
+    parser.add_argument('--force', action='store_true', help="Re-render datasets that are up to date")
+    parser.add_argument('--limit', type=int, default=None, help="Render at most this many thumbnails")
+    parser.add_argument('--prune', action='store_true', help="Delete thumbnails of datasets no longer in the catalog")
+    return parser.parse_args()
+
+
+def main():
+    setup_logging()
+    args = parse_args()
+
+    with open(args.datasets, 'rb') as f:
+        datasets = pickle.load(f)
+    logger.info(f"Loaded {len(datasets)} datasets from {args.datasets}")
+
+    if args.source == 'earthengine':
+        ee.Initialize(project='ee-gdgocist')
+        image_source = EarthEngineImageSource()
+    else:
+        image_source = PlaceholderImageSource()
+
+    entries = datasets.values() if isinstance(datasets, dict) else datasets
+    stats = generate_previews(
+        entries,
+        args.output,
+        image_source,
+        workers=args.workers,
+        dimensions=args.size,
+        force=args.force,
+        limit=args.limit,
+        prune=args.prune
+    )
+    return 1 if stats['failed'] and not stats['rendered'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response
 import logging
 import ee
 import json
@@ -14,7 +14,8 @@ from services.dataset_service import (
     get_date_range,
     get_best_scale_for_dataset,         # New import
     apply_temporal_filter_to_collection, # New import
-    get_image_from_collection          # New import
+    get_image_from_collection,         # New import
+    filter_within_extent
 )
 
 from services.earth_engine import (
@@ -24,6 +25,17 @@ from services.earth_engine import (
     handle_worldcover_visualization,
     handle_sentinel1_visualization
 )
+from services.collection_extents import get_collection_extent_cache
+from services.preview_images import preview_image_id
+from services.vector_tiles import (
+    get_vector_tile_cache,
+    vector_tiles_available,
+    is_valid_tile,
+    fetch_tile_features,
+    encode_features,
+    MVT_MIMETYPE
+)
+from config import Config
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +54,9 @@ def register_api_routes(app, embedding_manager):
     # Register the value retrieval route
     register_value_retrieval_route(app, embedding_manager)
     
+    # Register the vector tile route for FeatureCollections
+    register_vector_tile_routes(app, embedding_manager)
+    
     @app.route('/search_datasets', methods=['POST'])
     def search_datasets():
         data = request.get_json()
@@ -83,7 +98,7 @@ def register_api_routes(app, embedding_manager):
                         logger.warning(f"Missing dataset ID in result: {result}")
                         continue
                         
-                    image_id = dataset_id.replace('/', '_') if '/' in dataset_id else dataset_id
+                    image_id = preview_image_id(dataset_id)
                     
                     # Create a copy of the result to modify
                     processed_result = result.copy()
@@ -594,7 +609,13 @@ def register_api_routes(app, embedding_manager):
                 # Process other image collections with temporal filter if provided
                 else:
                     try:
-                        collection = ee.ImageCollection(gee_collection).filterDate(date_range[0], date_range[1])
+                        unfiltered = ee.ImageCollection(gee_collection)
+                        collection = unfiltered.filterDate(date_range[0], date_range[1])
+                        # A collection that stopped updating would otherwise render an empty layer
+                        extent = get_collection_extent_cache().get(gee_collection)
+                        within_extent = filter_within_extent(unfiltered, collection, date_range, extent)
+                        if within_extent is not None:
+                            collection = within_extent
                         
                         # Check if we need to apply temporal aggregation (median)
                         aggregation_method = None
@@ -627,10 +648,14 @@ def register_api_routes(app, embedding_manager):
                             selected_band = visualization.get('band')
                             logger.info(f"Selecting specific band for visualization: {selected_band}")
                             
-                            # Select only the requested band
+                            # Select only the requested band, validated against the cached band list
                             if isinstance(selected_band, str):
-                                image = image.select(selected_band)
-                                logger.info(f"Visualizing single band: {selected_band}")
+                                if get_collection_extent_cache().has_band(gee_collection, selected_band) is False:
+                                    logger.warning(f"Band {selected_band} not found in {gee_collection}, keeping all bands")
+                                    vis_params.pop('bands', None)
+                                else:
+                                    image = image.select(selected_band)
+                                    logger.info(f"Visualizing single band: {selected_band}")
                         
                         map_id_dict = image.getMapId(vis_params)
                         is_feature_collection = False
@@ -666,6 +691,11 @@ def register_api_routes(app, embedding_manager):
                 'date_range': date_range  # Include date range in the response
             }
             
+            # Offer the cached vector tile path for FeatureCollections
+            if is_feature_collection and Config.VECTOR_TILES_ENABLED and vector_tiles_available():
+                response_data['vector_tile_url'] = f"/vector_tiles/{dataset_id}/{{z}}/{{x}}/{{y}}.mvt"
+                response_data['vector_tile_min_zoom'] = Config.VECTOR_TILE_MIN_ZOOM
+            
             # Add js_map_center if it's available as a dictionary
             if isinstance(dataset.get('js_visualization_info', None), dict) and 'map_center' in dataset['js_visualization_info']:
                 response_data['js_map_center'] = dataset['js_visualization_info']['map_center']
@@ -702,6 +732,57 @@ def register_api_routes(app, embedding_manager):
             logger.error(f"Error in get_tile: {str(e)}")
             return jsonify({'error': str(e)}), 500
 
+def register_vector_tile_routes(app, embedding_manager):
+    """Register the route serving cached Mapbox Vector Tiles for FeatureCollections"""
+    
+    @app.route('/vector_tiles/<path:dataset_id>/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+    def get_vector_tile(dataset_id, z, x, y):
+        if not Config.VECTOR_TILES_ENABLED or not vector_tiles_available():
+            return jsonify({'error': 'Vector tiles are not enabled on this server'}), 501
+        
+        if not is_valid_tile(z, x, y):
+            return jsonify({'error': f'Invalid tile coordinates: {z}/{x}/{y}'}), 400
+        
+        if z < Config.VECTOR_TILE_MIN_ZOOM:
+            # Too many features per tile at this zoom, the raster path covers it
+            return Response(status=204)
+        
+        dataset = next((embedding_manager.datasets[d] for d in embedding_manager.datasets if embedding_manager.datasets[d]['id'] == dataset_id), None)
+        if not dataset:
+            logger.error(f"Dataset not found: {dataset_id}")
+            return jsonify({'error': 'Dataset not found'}), 404
+        
+        if dataset.get('gee:type', 'image_collection').lower() != 'table':
+            return jsonify({'error': 'Vector tiles are only available for FeatureCollection datasets'}), 400
+        
+        gee_collection = dataset.get('gee_id', dataset['id'])
+        skip_confidence_filter = request.args.get('skip_confidence_filter', 'false').lower() == 'true'
+        
+        # Keep tiles with and without the confidence filter apart; '#' never appears in dataset IDs
+        cache_key = f"{dataset_id}#all" if skip_confidence_filter else dataset_id
+        
+        def build_tile():
+            features = fetch_tile_features(
+                gee_collection,
+                z, x, y,
+                limit=Config.VECTOR_TILE_FEATURE_LIMIT,
+                skip_confidence_filter=skip_confidence_filter
+            )
+            return encode_features(features, z, x, y, layer_name=dataset_id.replace('/', '_'))
+        
+        try:
+            cache = get_vector_tile_cache(Config.VECTOR_TILE_CACHE_DIR, Config.VECTOR_TILE_MAX_AGE)
+            tile, cache_hit = cache.get_or_create(cache_key, z, x, y, build_tile)
+            logger.info(f"Vector tile {dataset_id} {z}/{x}/{y} served ({'cache hit' if cache_hit else 'generated'})")
+            
+            response = Response(tile, mimetype=MVT_MIMETYPE)
+            response.headers['Cache-Control'] = 'public, max-age=86400'
+            response.headers['X-Tile-Cache'] = 'HIT' if cache_hit else 'MISS'
+            return response
+        except Exception as e:
+            logger.error(f"Error generating vector tile for {dataset_id} {z}/{x}/{y}: {str(e)}")
+            return jsonify({'error': f'Error generating vector tile: {str(e)}'}), 500
+
 def register_value_retrieval_route(app,embedding_manager):
     """Register route for retrieving values at specific locations"""
     
@@ -761,7 +842,8 @@ def register_value_retrieval_route(app,embedding_manager):
                 filtered_collection, date_range, aggregation_method = apply_temporal_filter_to_collection(
                     collection, 
                     temporal_filter,
-                    dataset
+                    dataset,
+                    collection_id=dataset_id
                 )
                 
                 # Override aggregation method if specified in the request
@@ -798,20 +880,23 @@ def register_value_retrieval_route(app,embedding_manager):
                     date_str = date_obj.strftime('%Y-%m-%d')
                 
                 # Handle specific band selection if provided
+                selected_band = None
                 if visualization_params and 'band' in visualization_params:
                     selected_band = visualization_params['band']
                     logger.info(f"Selecting specific band for value retrieval: {selected_band}")
-                    try:
-                        image = image.select(selected_band)
-                    except Exception as e:
-                        logger.warning(f"Failed to select band {selected_band}: {str(e)}")
                 elif data.get('band'):
                     selected_band = data.get('band')
                     logger.info(f"Selecting specific band from request: {selected_band}")
-                    try:
-                        image = image.select(selected_band)
-                    except Exception as e:
-                        logger.warning(f"Failed to select band {selected_band}: {str(e)}")
+                
+                if selected_band:
+                    # Validate against the cached band list, select() itself only fails at getInfo()
+                    if get_collection_extent_cache().has_band(dataset_id, selected_band) is False:
+                        logger.warning(f"Band {selected_band} not found in {dataset_id}, sampling all bands")
+                    else:
+                        try:
+                            image = image.select(selected_band)
+                        except Exception as e:
+                            logger.warning(f"Failed to select band {selected_band}: {str(e)}")
                 
                 # Sample the image at the specified point with progressive scales
                 values = sample_image_values(image, point, sampling_scale)
@@ -862,7 +947,8 @@ def register_value_retrieval_route(app,embedding_manager):
                     filtered_collection, date_range, aggregation_method = apply_temporal_filter_to_collection(
                         collection, 
                         temporal_filter,
-                        dataset
+                        dataset,
+                        collection_id=dataset_id
                     )
                     
                     # Get appropriate image
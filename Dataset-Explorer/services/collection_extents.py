@@ -0,0 +1,262 @@
+"""
+Persisted cache of ImageCollection temporal extents and band lists.
+
+The temporal filtering helpers used to probe Earth Engine on every request
+(collection sizes, band names of the most recent image) to decide which date
+window and compositing strategy to use. This module keeps the actual first and
+last image timestamps and the band list of each collection in a JSON file,
+refreshes them on a background thread, and lets the request path read them
+without blocking on Earth Engine.
+"""
+import os
+import json
+import time
+import queue
+import logging
+import tempfile
+import threading
+from datetime import datetime, timezone
+import ee
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def probe_collection_extent(collection_id):
+    """
+    Fetch the temporal extent and band list of an ImageCollection.
+
+    Everything is gathered in a single getInfo() round trip.
+
+    Parameters:
+    collection_id (str): The GEE ImageCollection ID
+
+    Returns:
+    dict: Extent entry with first/last timestamps (ms and ISO date) and bands
+    """
+    collection = ee.ImageCollection(collection_id)
+    info = ee.Dictionary({
+        'range': collection.reduceColumns(ee.Reducer.minMax(), ['system:time_start']),
+        'bands': collection.first().bandNames()
+    }).getInfo()
+
+    time_range = info.get('range') or {}
+    first_millis = time_range.get('min')
+    last_millis = time_range.get('max')
+
+    return {
+        'first_millis': first_millis,
+        'last_millis': last_millis,
+        'first_date': _millis_to_date(first_millis),
+        'last_date': _millis_to_date(last_millis),
+        'bands': info.get('bands') or [],
+        'updated_at': time.time()
+    }
+
+
+def _millis_to_date(millis):
+    if millis is None:
+        return None
+    return datetime.fromtimestamp(millis / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+class CollectionExtentCache:
+    """
+    Thread-safe, JSON-persisted store of collection extents.
+
+    Lookups never touch Earth Engine. Unknown collections are queued for the
+    background worker, which also re-probes entries older than the refresh
+    interval. A collection whose probe failed is not queued again until the
+    retry interval has passed.
+    """
+
+    def __init__(self, cache_path, refresh_interval=86400, prober=probe_collection_extent, retry_interval=3600):
+        self.cache_path = cache_path
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.prober = prober
+        self.entries = {}
+        self._failures = {}
+        self.lock = threading.RLock()
+        self._pending = queue.Queue()
+        self._queued = set()
+        self._worker = None
+        self._stop = threading.Event()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r') as f:
+                self.entries = json.load(f)
+            logger.info(f"Loaded temporal extents for {len(self.entries)} collections from {self.cache_path}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load collection extent cache: {str(e)}")
+            self.entries = {}
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            snapshot = json.dumps(self.entries)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(snapshot)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not persist collection extent cache: {str(e)}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def get(self, collection_id):
+        """
+        Return the cached extent for a collection without blocking.
+
+        On a miss the collection is queued for the background refresher and
+        None is returned so callers can fall back to their heuristics.
+        """
+        if not collection_id:
+            return None
+        with self.lock:
+            entry = self.entries.get(collection_id)
+        if entry is None:
+            self.request_refresh(collection_id)
+        return entry
+
+    def get_bands(self, collection_id):
+        """Return the cached band list of a collection, or None if unknown"""
+        entry = self.get(collection_id)
+        return entry.get('bands') if entry else None
+
+    def has_band(self, collection_id, band):
+        """
+        Check a band name against the cached band list.
+
+        Returns:
+        bool or None: None when the collection's bands are not known yet
+        """
+        bands = self.get_bands(collection_id)
+        if not bands:
+            return None
+        return band in bands
+
+    def request_refresh(self, collection_id):
+        """Queue a collection for the background refresher"""
+        with self.lock:
+            if collection_id in self._queued:
+                return
+            failed_at = self._failures.get(collection_id)
+            if failed_at is not None and time.time() - failed_at < self.retry_interval:
+                return
+            self._queued.add(collection_id)
+        self._pending.put(collection_id)
+
+    def refresh(self, collection_id):
+        """Probe a collection now and persist the result"""
+        try:
+            entry = self.prober(collection_id)
+        except Exception as e:
+            logger.warning(f"Could not probe temporal extent for {collection_id}: {str(e)}")
+            with self.lock:
+                self._failures[collection_id] = time.time()
+            return None
+        finally:
+            with self.lock:
+                self._queued.discard(collection_id)
+
+        with self.lock:
+            self.entries[collection_id] = entry
+            self._failures.pop(collection_id, None)
+        self._save()
+        logger.info(f"Cached temporal extent for {collection_id}: "
+                    f"{entry.get('first_date')} to {entry.get('last_date')}, {len(entry.get('bands', []))} bands")
+        return entry
+
+    def _is_fresh(self, collection_id):
+        with self.lock:
+            entry = self.entries.get(collection_id)
+        return entry is not None and time.time() - entry.get('updated_at', 0) <= self.refresh_interval
+
+    def refresh_stale(self):
+        """Re-probe every entry older than the refresh interval"""
+        now = time.time()
+        with self.lock:
+            stale = [cid for cid, entry in self.entries.items()
+                     if now - entry.get('updated_at', 0) > self.refresh_interval]
+        for collection_id in stale:
+            if self._stop.is_set():
+                break
+            self.refresh(collection_id)
+        return len(stale)
+
+    def start_background_refresh(self, poll_interval=60):
+        """Start the daemon thread that fills misses and refreshes stale entries"""
+        if self._worker is not None and self._worker.is_alive():
+            return
+
+        def worker():
+            last_sweep = 0
+            while not self._stop.is_set():
+                try:
+                    collection_id = self._pending.get(timeout=poll_interval)
+                    if self._is_fresh(collection_id):
+                        # Probed synchronously since it was queued
+                        with self.lock:
+                            self._queued.discard(collection_id)
+                    else:
+                        self.refresh(collection_id)
+                except queue.Empty:
+                    pass
+                except Exception as e:
+                    logger.error(f"Error in collection extent refresher: {str(e)}")
+
+                if time.time() - last_sweep > poll_interval:
+                    last_sweep = time.time()
+                    try:
+                        self.refresh_stale()
+                    except Exception as e:
+                        logger.error(f"Error refreshing stale collection extents: {str(e)}")
+
+        self._worker = threading.Thread(target=worker, name='collection-extent-refresh', daemon=True)
+        self._worker.start()
+        logger.info(f"Collection extent refresher started (refresh interval {self.refresh_interval}s)")
+
+    def stop(self):
+        """Stop the background refresher"""
+        self._stop.set()
+
+
+def overlaps_extent(date_range, extent):
+    """
+    Check whether a [start, end] date range overlaps a cached collection extent.
+
+    Returns:
+    bool or None: None when either side is incomplete
+    """
+    if not date_range or len(date_range) != 2 or not extent:
+        return None
+    first, last = extent.get('first_date'), extent.get('last_date')
+    if not first or not last:
+        return None
+    start, end = str(date_range[0])[:10], str(date_range[1])[:10]
+    return start <= last and end >= first
+
+
+_collection_extent_cache = None
+
+
+def get_collection_extent_cache(cache_path=None, refresh_interval=None):
+    """Get the shared collection extent cache instance"""
+    global _collection_extent_cache
+    if _collection_extent_cache is None:
+        _collection_extent_cache = CollectionExtentCache(
+            cache_path or Config.COLLECTION_EXTENT_CACHE_PATH,
+            refresh_interval or Config.COLLECTION_EXTENT_REFRESH_INTERVAL,
+            retry_interval=Config.COLLECTION_EXTENT_RETRY_INTERVAL
+        )
+    return _collection_extent_cache
@@ -7,6 +7,7 @@ from services.earth_engine import (
     handle_open_buildings_temporal_visualization,
     handle_sentinel1_visualization
 )
+from services.collection_extents import get_collection_extent_cache, overlaps_extent
 from config import Config
 from datetime import datetime, timedelta
 
@@ -53,7 +54,35 @@ def get_best_scale_for_dataset(dataset_id):
     return default_scale
 
 
-def apply_temporal_filter_to_collection(collection, temporal_filter=None, dataset=None):
+def filter_within_extent(collection, filtered_collection, date_range, extent):
+    """
+    Choose between a date-filtered collection and the unfiltered one using a cached extent.
+    
+    Parameters:
+    collection (ee.ImageCollection): The unfiltered collection
+    filtered_collection (ee.ImageCollection): The collection filtered to date_range
+    date_range (list): The [start, end] dates the collection was filtered to
+    extent (dict): Cached extent entry of the collection, or None
+    
+    Returns:
+    ee.ImageCollection or None: None when the extent is not known yet
+    """
+    logger = logging.getLogger(__name__)
+    
+    overlap = overlaps_extent(date_range, extent)
+    if overlap is None:
+        return None
+    if not overlap:
+        logger.warning(f"Date range {date_range} is outside the collection extent "
+                       f"{extent['first_date']} to {extent['last_date']}, using unfiltered collection")
+        return collection
+    # The range can still fall in a gap of the collection; fall back server side without blocking
+    return ee.ImageCollection(
+        ee.Algorithms.If(filtered_collection.size().gt(0), filtered_collection, collection)
+    )
+
+
+def apply_temporal_filter_to_collection(collection, temporal_filter=None, dataset=None, collection_id=None):
     """
     Apply temporal filtering to an image collection with enhanced error handling.
     
@@ -61,6 +90,7 @@ def apply_temporal_filter_to_collection(collection, temporal_filter=None, datase
     collection (ee.ImageCollection): The collection to filter
     temporal_filter (dict): Optional temporal filter parameters (start_date, end_date, aggregation)
     dataset (dict): Optional dataset metadata for fallback temporal info
+    collection_id (str): Optional GEE collection ID used to look up the cached temporal extent
     
     Returns:
     tuple: (filtered_collection, date_range, aggregation_method)
@@ -89,6 +119,11 @@ def apply_temporal_filter_to_collection(collection, temporal_filter=None, datase
             logger.warning(f"Date filtering not supported for this dataset: {str(e)}")
             return collection, date_range, aggregation_method
     
+    # Cached first/last image dates of the collection, None until the background refresher has probed it
+    if not collection_id and dataset:
+        collection_id = dataset.get('gee_id', dataset_id)
+    extent = get_collection_extent_cache().get(collection_id)
+    
     try:
         # First priority: Use provided temporal filter
         if temporal_filter and 'start_date' in temporal_filter and 'end_date' in temporal_filter:
@@ -113,6 +148,11 @@ def apply_temporal_filter_to_collection(collection, temporal_filter=None, datase
         # Third priority: Use default recent time window
         else:
             now = datetime.now()
+            
+            # Anchor the window on the collection's latest image if it stopped updating
+            if extent and extent.get('last_date') and extent['last_date'] < now.strftime('%Y-%m-%d'):
+                now = datetime.strptime(extent['last_date'], '%Y-%m-%d') + timedelta(days=1)
+            
             three_months_ago = now - timedelta(days=90)
             
             start_date = three_months_ago.strftime('%Y-%m-%d')
@@ -121,6 +161,11 @@ def apply_temporal_filter_to_collection(collection, temporal_filter=None, datase
             
             logger.info(f"Using default recent time window: {start_date} to {end_date}")
             filtered_collection = collection.filterDate(start_date, end_date)
+        
+        # Use the cached extent instead of probing the filtered collection size
+        within_extent = filter_within_extent(collection, filtered_collection, date_range, extent)
+        if within_extent is not None:
+            return within_extent, date_range, aggregation_method
             
         # Check if filtering produced valid results
         try:
@@ -143,7 +188,7 @@ def apply_temporal_filter_to_collection(collection, temporal_filter=None, datase
         return collection, None, None
     
 
-def get_image_from_collection(collection, date_range=None, aggregation_method=None, dataset_id=None):
+def get_image_from_collection(collection, date_range=None, aggregation_method=None, dataset_id=None, collection_id=None):
     """
     Select an appropriate image from a collection based on temporal parameters
     and dataset characteristics.
@@ -153,6 +198,7 @@ def get_image_from_collection(collection, date_range=None, aggregation_method=No
     date_range (list): Optional date range [start_date, end_date]
     aggregation_method (str): Optional aggregation method ('median', 'mean', etc.)
     dataset_id (str): Optional dataset ID for type-specific handling
+    collection_id (str): Optional GEE collection ID, defaults to dataset_id
     
     Returns:
     ee.Image: The selected or aggregated image
@@ -201,13 +247,20 @@ def get_image_from_collection(collection, date_range=None, aggregation_method=No
                 logger.info(f"Trying most recent image as default approach")
                 recent = collection.sort('system:time_start', False).first()
                 
-                # Check if the recent image has any bands
-                band_count = len(recent.bandNames().getInfo())
-                if band_count > 0:
-                    return recent
-                else:
-                    logger.info(f"Recent image has no bands, creating mosaic instead")
+                # Collections whose cached band list is empty never have a usable recent image
+                extent = get_collection_extent_cache().get(collection_id or dataset_id)
+                if extent is not None and not extent.get('bands'):
+                    logger.info(f"Collection images have no bands, creating mosaic instead")
                     return collection.mosaic()
+                
+                # Decide server side so an empty filtered collection or a band-less
+                # recent image still falls back to a mosaic without blocking on getInfo()
+                mosaic = collection.mosaic()
+                return ee.Image(ee.Algorithms.If(
+                    collection.size().gt(0),
+                    ee.Algorithms.If(ee.Image(recent).bandNames().size().gt(0), recent, mosaic),
+                    mosaic
+                ))
             except:
                 logger.info(f"Failed to get recent image, creating mosaic instead")
                 return collection.mosaic()
@@ -0,0 +1,325 @@
+"""
+Batch generation of catalog preview thumbnails.
+
+Search results link to static/preview_images/{id}.png. This module renders
+those files for every dataset in the catalog with a bounded worker pool,
+reusing the visualization parameters extracted from the catalog metadata.
+
+A manifest next to the images records the metadata hash each thumbnail was
+rendered from, so an interrupted run resumes where it stopped and a later
+run only re-renders datasets whose catalog entry changed. Rendering goes
+through an image source object, which lets the pipeline run against a local
+placeholder source instead of Earth Engine.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+import ee
+import requests
+from services.dataset_service import (
+    extract_visualization_params,
+    get_spatial_extent,
+    apply_temporal_filter_to_collection,
+    get_image_from_collection,
+    handle_palette_colors
+)
+from services.earth_engine import create_feature_collection_image
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = 'manifest.json'
+
+# Catalog fields that affect how a thumbnail looks
+PREVIEW_HASH_FIELDS = ['id', 'gee_id', 'gee:type', 'summaries', 'js_visualization_info', 'extent', 'bands']
+
+
+def preview_image_id(dataset_id):
+    """Get the preview filename stem for a dataset ID"""
+    return dataset_id.replace('/', '_')
+
+
+def dataset_preview_hash(dataset, dimensions):
+    """
+    Hash the parts of a catalog entry that determine its thumbnail.
+
+    Parameters:
+    dataset (dict): The catalog entry
+    dimensions (int): Thumbnail size in pixels, part of the hash so a size change re-renders
+
+    Returns:
+    str: Hex digest of the relevant metadata
+    """
+    relevant = {field: dataset.get(field) for field in PREVIEW_HASH_FIELDS if field in dataset}
+    relevant['dimensions'] = dimensions
+    payload = json.dumps(relevant, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def write_file_atomic(path, data):
+    """Write bytes to a path through a temporary file so readers never see a partial file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class EarthEngineImageSource:
+    """Render thumbnails with Earth Engine's getThumbURL"""
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+
+    def build_image(self, dataset, vis_params):
+        """
+        Build the ee.Image and visualization parameters for a dataset.
+
+        Returns:
+        tuple: (ee.Image, vis_params)
+        """
+        gee_collection = dataset.get('gee_id', dataset['id'])
+        gee_type = dataset.get('gee:type', 'image_collection').lower()
+
+        if gee_type == 'table':
+            if 'palette' not in vis_params:
+                vis_params['palette'] = ['#FF0000']
+            features = ee.FeatureCollection(gee_collection)
+            return create_feature_collection_image(features, gee_collection, vis_params)
+
+        if gee_type == 'image':
+            image = ee.Image(gee_collection)
+        else:
+            collection, date_range, aggregation_method = apply_temporal_filter_to_collection(
+                ee.ImageCollection(gee_collection),
+                None,
+                dataset,
+                collection_id=gee_collection
+            )
+            image = get_image_from_collection(
+                collection, date_range, aggregation_method,
+                dataset_id=dataset['id'], collection_id=gee_collection
+            )
+
+        # Three bands without a palette are rendered as RGB
+        bands = vis_params.get('bands')
+        if bands and len(bands) == 3 and 'palette' not in vis_params:
+            for key in ('min', 'max'):
+                if not isinstance(vis_params.get(key), list):
+                    vis_params[key] = [vis_params.get(key, 0 if key == 'min' else 255)] * 3
+        elif bands and len(bands) > 1 and 'palette' in vis_params:
+            # Palettes only apply to a single band
+            vis_params['bands'] = bands[:1]
+
+        return image, vis_params
+
+    def render(self, dataset, vis_params, dimensions):
+        """
+        Render a PNG thumbnail for a dataset.
+
+        Parameters:
+        dataset (dict): The catalog entry
+        vis_params (dict): Visualization parameters from the catalog
+        dimensions (int): Longest side of the thumbnail in pixels
+
+        Returns:
+        bytes: PNG image data
+        """
+        image, vis_params = self.build_image(dataset, dict(vis_params))
+
+        thumb_params = dict(vis_params)
+        thumb_params.update({'dimensions': dimensions, 'format': 'png'})
+        bbox = get_spatial_extent(dataset)
+        if bbox and len(bbox) == 4:
+            west, south, east, north = bbox
+            # Clamp to the web-mercator limits getThumbURL accepts
+            thumb_params['region'] = ee.Geometry.Rectangle(
+                [max(west, -180), max(south, -85), min(east, 180), min(north, 85)], None, False
+            )
+
+        url = image.getThumbURL(thumb_params)
+        response = requests.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+
+class PlaceholderImageSource:
+    """
+    Render flat swatches from the catalog palette without contacting Earth Engine.
+
+    Useful for exercising the pipeline locally and as a stand-in image source
+    in tests.
+    """
+
+    def __init__(self, delay=0):
+        self.delay = delay
+
+    def render(self, dataset, vis_params, dimensions):
+        from PIL import Image, ImageColor
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        # Named colours and bare hex codes are normalised the same way as for Earth Engine
+        colors = []
+        for color in handle_palette_colors(vis_params.get('palette')) or ['#808080']:
+            try:
+                colors.append(ImageColor.getrgb(str(color)))
+            except ValueError:
+                logger.warning(f"Unrecognised palette colour {color!r}, using grey")
+                colors.append((128, 128, 128))
+
+        image = Image.new('RGB', (dimensions, dimensions))
+        stripe = max(1, dimensions // len(colors))
+        for index, color in enumerate(colors):
+            left = index * stripe
+            right = dimensions if index == len(colors) - 1 else left + stripe
+            image.paste(color, (left, 0, right, dimensions))
+
+        buffer = BytesIO()
+        image.save(buffer, format='PNG')
+        return buffer.getvalue()
+
+
+class PreviewManifest:
+    """JSON record of which catalog hash each thumbnail was rendered from"""
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self.entries = {}
+        self.lock = threading.Lock()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read preview manifest, starting fresh: {str(e)}")
+
+    def is_current(self, dataset_id, preview_hash, image_path):
+        with self.lock:
+            entry = self.entries.get(dataset_id)
+        return bool(entry) and entry.get('hash') == preview_hash and os.path.exists(image_path)
+
+    def record(self, dataset_id, preview_hash, filename):
+        with self.lock:
+            self.entries[dataset_id] = {
+                'hash': preview_hash,
+                'file': filename,
+                'generated_at': time.time()
+            }
+
+    def remove(self, dataset_id):
+        with self.lock:
+            return self.entries.pop(dataset_id, None)
+
+    def save(self):
+        with self.lock:
+            data = json.dumps(self.entries, indent=2, sort_keys=True).encode('utf-8')
+        write_file_atomic(self.path, data)
+
+
+def generate_previews(datasets, output_dir, image_source, workers=4, dimensions=256,
+                      force=False, limit=None, prune=False, checkpoint_every=25):
+    """
+    Render preview thumbnails for a catalog.
+
+    Parameters:
+    datasets (iterable): Catalog entries (dicts with at least an 'id')
+    output_dir (str): Directory the PNG files and manifest are written to
+    image_source: Object with a render(dataset, vis_params, dimensions) -> bytes method
+    workers (int): Maximum number of thumbnails rendered concurrently
+    dimensions (int): Thumbnail size in pixels
+    force (bool): Re-render every dataset regardless of the manifest
+    limit (int): Optional maximum number of thumbnails to render in this run
+    prune (bool): Delete thumbnails of datasets no longer in the catalog
+    checkpoint_every (int): Save the manifest after this many completed renders
+
+    Returns:
+    dict: Counts of rendered, skipped, failed and pruned datasets
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = PreviewManifest(output_dir)
+    stats = {'rendered': 0, 'skipped': 0, 'failed': 0, 'pruned': 0}
+
+    pending = []
+    catalog_ids = set()
+    for dataset in datasets:
+        dataset_id = dataset.get('id')
+        if not dataset_id:
+            continue
+        catalog_ids.add(dataset_id)
+
+        filename = f"{preview_image_id(dataset_id)}.png"
+        preview_hash = dataset_preview_hash(dataset, dimensions)
+        if not force and manifest.is_current(dataset_id, preview_hash, os.path.join(output_dir, filename)):
+            stats['skipped'] += 1
+            continue
+        pending.append((dataset, filename, preview_hash))
+
+    if limit is not None:
+        pending = pending[:limit]
+
+    logger.info(f"Rendering {len(pending)} preview thumbnails with {workers} workers "
+                f"({stats['skipped']} already up to date)")
+
+    def render_one(dataset, filename, preview_hash):
+        vis_params, _, _, _ = extract_visualization_params(dataset)
+        data = image_source.render(dataset, vis_params, dimensions)
+        write_file_atomic(os.path.join(output_dir, filename), data)
+        manifest.record(dataset['id'], preview_hash, filename)
+
+    completed = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(render_one, dataset, filename, preview_hash): dataset['id']
+            for dataset, filename, preview_hash in pending
+        }
+        try:
+            for future in as_completed(futures):
+                dataset_id = futures[future]
+                try:
+                    future.result()
+                    stats['rendered'] += 1
+                except Exception as e:
+                    stats['failed'] += 1
+                    logger.warning(f"Failed to render preview for {dataset_id}: {str(e)}")
+
+                completed += 1
+                if completed % checkpoint_every == 0:
+                    manifest.save()
+                    logger.info(f"Preview progress: {completed}/{len(pending)}")
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            logger.warning("Interrupted, saving progress so the next run resumes")
+            manifest.save()
+            raise
+
+    if prune:
+        for dataset_id in list(manifest.entries):
+            if dataset_id in catalog_ids:
+                continue
+            entry = manifest.remove(dataset_id)
+            try:
+                os.remove(os.path.join(output_dir, entry['file']))
+            except OSError:
+                pass
+            stats['pruned'] += 1
+
+    manifest.save()
+    logger.info(f"Preview generation finished: {stats}")
+    return stats
@@ -0,0 +1,296 @@
+"""
+Vector tile support for FeatureCollection (table) datasets.
+
+Rasterising tables with paint() is slow for dense layers and the Open Buildings
+path is capped to a small buffer. This module pulls the features for a single
+web-mercator tile once, simplifies them for the tile's zoom level, encodes them
+as a Mapbox Vector Tile and keeps the result in a local disk cache keyed by
+(dataset, z, x, y) so repeat views are served straight from disk.
+"""
+import os
+import math
+import time
+import logging
+import tempfile
+import threading
+from urllib.parse import quote
+import ee
+
+try:
+    import mapbox_vector_tile
+    from shapely.geometry import shape, box
+    from shapely.ops import transform
+except ImportError:  # Optional dependency, the raster path keeps working without it
+    mapbox_vector_tile = None
+
+logger = logging.getLogger(__name__)
+
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+MVT_MIMETYPE = 'application/vnd.mapbox-vector-tile'
+
+# Ground resolution of a 256px tile pixel at the equator for zoom 0 (meters)
+EQUATOR_RESOLUTION = 156543.03392804097
+
+# getInfo() aborts on collections with more than 5000 elements, so page through them
+FEATURE_PAGE_SIZE = 5000
+
+
+def vector_tiles_available():
+    """Return True if the optional vector tile encoder is installed"""
+    return mapbox_vector_tile is not None
+
+
+def tile_bounds(z, x, y):
+    """
+    Get the lon/lat bounds of a web-mercator (XYZ) tile.
+
+    Parameters:
+    z (int): Zoom level
+    x (int): Tile column
+    y (int): Tile row (counted from the top)
+
+    Returns:
+    tuple: (west, south, east, north) in degrees
+    """
+    n = 2 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def is_valid_tile(z, x, y):
+    """Check that the tile coordinates exist at the given zoom level"""
+    if z < 0 or z > 24:
+        return False
+    n = 2 ** z
+    return 0 <= x < n and 0 <= y < n
+
+
+def simplify_tolerance(z, pixels=0.5):
+    """
+    Simplification tolerance in meters for a zoom level.
+
+    Features are simplified to roughly half a screen pixel, which keeps
+    outlines visually identical while dropping most vertices at low zooms.
+    """
+    return EQUATOR_RESOLUTION / (2 ** z) * pixels
+
+
+def _lonlat_to_tile_pixel(z, x, y):
+    """Build a coordinate transformer from lon/lat to tile-local MVT coordinates"""
+    n = 2 ** z
+
+    def to_pixel(lon, lat, *args):
+        lat = max(min(lat, 85.05112878), -85.05112878)
+        lat_rad = math.radians(lat)
+        world_x = (lon + 180.0) / 360.0 * n
+        world_y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+        return (world_x - x) * MVT_EXTENT, (world_y - y) * MVT_EXTENT
+
+    def transformer(xs, ys, zs=None):
+        if hasattr(xs, '__iter__'):
+            points = [to_pixel(lon, lat) for lon, lat in zip(xs, ys)]
+            return [p[0] for p in points], [p[1] for p in points]
+        return to_pixel(xs, ys)
+
+    return transformer
+
+
+def fetch_tile_features(gee_collection, z, x, y, limit=None, skip_confidence_filter=False):
+    """
+    Pull the features of a FeatureCollection that intersect a tile.
+
+    Parameters:
+    gee_collection (str): The GEE FeatureCollection ID
+    z, x, y (int): Tile coordinates
+    limit (int): Optional maximum number of features for the tile
+    skip_confidence_filter (bool): Skip the Open Buildings confidence filter
+
+    Returns:
+    list: GeoJSON feature dictionaries
+    """
+    west, south, east, north = tile_bounds(z, x, y)
+    region = ee.Geometry.Rectangle([west, south, east, north], None, False)
+
+    features = ee.FeatureCollection(gee_collection).filterBounds(region)
+
+    # Keep the same confidence threshold as the raster Open Buildings path
+    if 'open-buildings' in gee_collection and not skip_confidence_filter:
+        features = features.filter('confidence >= 0.65')
+
+    tolerance = simplify_tolerance(z)
+    features = features.map(lambda feature: feature.simplify(maxError=tolerance))
+
+    collected = []
+    offset = 0
+    while True:
+        page_size = FEATURE_PAGE_SIZE
+        if limit is not None:
+            page_size = min(page_size, limit - len(collected))
+            if page_size <= 0:
+                break
+
+        page = features.toList(page_size, offset).getInfo()
+        collected.extend(page)
+        offset += len(page)
+
+        if len(page) < page_size:
+            break
+
+    logger.info(f"Fetched {len(collected)} features for {gee_collection} tile {z}/{x}/{y}")
+    return collected
+
+
+def encode_features(features, z, x, y, layer_name='features'):
+    """
+    Encode GeoJSON features into a Mapbox Vector Tile.
+
+    Geometries are projected into the tile's pixel space and clipped to the
+    tile extent plus a small buffer so neighbouring tiles join cleanly.
+
+    Returns:
+    bytes: The encoded tile
+    """
+    if mapbox_vector_tile is None:
+        raise RuntimeError("mapbox-vector-tile is not installed, vector tiles are unavailable")
+
+    to_pixel = _lonlat_to_tile_pixel(z, x, y)
+    clip_box = box(-MVT_BUFFER, -MVT_BUFFER, MVT_EXTENT + MVT_BUFFER, MVT_EXTENT + MVT_BUFFER)
+
+    encoded_features = []
+    for feature in features:
+        geometry = feature.get('geometry')
+        if not geometry:
+            continue
+
+        try:
+            geom = transform(to_pixel, shape(geometry))
+            geom = geom.intersection(clip_box)
+        except Exception as e:
+            logger.warning(f"Skipping invalid feature geometry: {str(e)}")
+            continue
+
+        if geom.is_empty:
+            continue
+
+        # MVT only supports scalar property values
+        properties = {
+            key: value for key, value in (feature.get('properties') or {}).items()
+            if isinstance(value, (str, int, float, bool))
+        }
+        encoded_features.append({'geometry': geom, 'properties': properties})
+
+    return mapbox_vector_tile.encode(
+        [{'name': layer_name, 'features': encoded_features}],
+        default_options={'extents': MVT_EXTENT, 'y_coord_down': True}
+    )
+
+
+class VectorTileCache:
+    """
+    Disk cache of encoded vector tiles keyed by (dataset, z, x, y).
+
+    Tiles are written atomically so concurrent readers never see a partial
+    file, and a per-key lock makes concurrent misses for the same tile
+    fetch from Earth Engine only once. Locks are reference counted and only
+    dropped once no request is holding or waiting on them.
+    """
+
+    def __init__(self, cache_dir, max_age_seconds=None):
+        self.cache_dir = cache_dir
+        self.max_age_seconds = max_age_seconds
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _tile_path(self, dataset_id, z, x, y):
+        # Percent-encode the key so distinct keys never map to the same directory
+        safe_id = quote(dataset_id, safe='')
+        return os.path.join(self.cache_dir, safe_id, str(z), str(x), f"{y}.mvt")
+
+    def _acquire_lock_ref(self, key):
+        with self._locks_guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def _release_lock_ref(self, key):
+        with self._locks_guard:
+            entry = self._locks[key]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def get(self, dataset_id, z, x, y):
+        """Return the cached tile bytes, or None if missing or expired"""
+        path = self._tile_path(dataset_id, z, x, y)
+        try:
+            if self.max_age_seconds and time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, dataset_id, z, x, y, data):
+        """Store tile bytes, replacing any previous version atomically"""
+        path = self._tile_path(dataset_id, z, x, y)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def get_or_create(self, dataset_id, z, x, y, builder):
+        """
+        Return a cached tile, building and storing it on a miss.
+
+        Parameters:
+        builder (callable): Function returning the encoded tile bytes
+
+        Returns:
+        tuple: (tile_bytes, cache_hit)
+        """
+        data = self.get(dataset_id, z, x, y)
+        if data is not None:
+            return data, True
+
+        key = (dataset_id, z, x, y)
+        lock = self._acquire_lock_ref(key)
+        try:
+            with lock:
+                # Another request may have filled the tile while we waited
+                data = self.get(dataset_id, z, x, y)
+                if data is not None:
+                    return data, True
+
+                data = builder()
+                self.put(dataset_id, z, x, y, data)
+                return data, False
+        finally:
+            self._release_lock_ref(key)
+
+
+_vector_tile_cache = None
+
+
+def get_vector_tile_cache(cache_dir, max_age_seconds=None):
+    """Get the shared vector tile cache instance"""
+    global _vector_tile_cache
+    if _vector_tile_cache is None:
+        _vector_tile_cache = VectorTileCache(cache_dir, max_age_seconds)
+    return _vector_tile_cache
@@ -0,0 +1,5 @@
+"""Shared test setup: import the app's packages from the project root."""
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,128 @@
+"""Tests for the persisted collection extent cache, with a fake Earth Engine probe."""
+import time
+from unittest.mock import MagicMock, patch
+
+from services import collection_extents
+from services.collection_extents import CollectionExtentCache, overlaps_extent
+from services.dataset_service import filter_within_extent
+
+
+class FakeProbe:
+    """Stand-in for probe_collection_extent that records the collections it probed"""
+
+    def __init__(self, bands=('B1', 'B2'), fail=False):
+        self.bands = list(bands)
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, collection_id):
+        self.calls.append(collection_id)
+        if self.fail:
+            raise RuntimeError('Earth Engine unavailable')
+        return {
+            'first_millis': 946684800000,
+            'last_millis': 1577836800000,
+            'first_date': '2000-01-01',
+            'last_date': '2020-01-01',
+            'bands': self.bands,
+            'updated_at': time.time()
+        }
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_probe_reads_extent_and_bands_in_one_round_trip():
+    fake_ee = MagicMock()
+    fake_ee.Dictionary.return_value.getInfo.return_value = {
+        'range': {'min': 946684800000, 'max': 1577836800000},
+        'bands': ['B1']
+    }
+    with patch.object(collection_extents, 'ee', fake_ee):
+        entry = collection_extents.probe_collection_extent('MODIS/061/MOD13Q1')
+
+    assert fake_ee.Dictionary.return_value.getInfo.call_count == 1
+    assert (entry['first_date'], entry['last_date'], entry['bands']) == ('2000-01-01', '2020-01-01', ['B1'])
+
+
+def test_entries_persist_and_reload(tmp_path):
+    path = str(tmp_path / 'extents.json')
+    cache = CollectionExtentCache(path, prober=FakeProbe())
+    cache.refresh('A/ONE')
+
+    reloaded = CollectionExtentCache(path, prober=FakeProbe())
+    assert reloaded.get('A/ONE')['last_date'] == '2020-01-01'
+    assert not [p for p in tmp_path.iterdir() if p.suffix == '.tmp']
+
+
+def test_miss_is_filled_by_the_background_refresher(tmp_path):
+    probe = FakeProbe()
+    cache = CollectionExtentCache(str(tmp_path / 'extents.json'), prober=probe)
+    cache.start_background_refresh(poll_interval=0.05)
+    try:
+        assert cache.get('A/ONE') is None
+        assert wait_for(lambda: cache.get('A/ONE') is not None)
+    finally:
+        cache.stop()
+    assert probe.calls == ['A/ONE']
+
+
+def test_stale_entries_are_reprobed(tmp_path):
+    probe = FakeProbe()
+    cache = CollectionExtentCache(str(tmp_path / 'extents.json'), refresh_interval=60, prober=probe)
+    cache.refresh('A/ONE')
+    cache.refresh('A/TWO')
+    cache.entries['A/ONE']['updated_at'] -= 120
+
+    assert cache.refresh_stale() == 1
+    assert probe.calls[-1] == 'A/ONE'
+
+
+def test_failed_probe_is_not_retried_until_the_retry_interval(tmp_path):
+    probe = FakeProbe(fail=True)
+    cache = CollectionExtentCache(str(tmp_path / 'extents.json'), prober=probe, retry_interval=3600)
+
+    assert cache.refresh('A/ONE') is None
+    assert cache.get('A/ONE') is None
+    assert cache._pending.empty()
+
+    cache.retry_interval = 0
+    assert cache.get('A/ONE') is None
+    assert cache._pending.get_nowait() == 'A/ONE'
+
+
+def test_has_band_is_unknown_until_bands_are_cached(tmp_path):
+    cache = CollectionExtentCache(str(tmp_path / 'extents.json'), prober=FakeProbe(bands=['NDVI']))
+    assert cache.has_band('A/ONE', 'NDVI') is None
+
+    cache.refresh('A/ONE')
+    assert cache.has_band('A/ONE', 'NDVI') is True
+    assert cache.has_band('A/ONE', 'EVI') is False
+
+    cache.prober = FakeProbe(bands=[])
+    cache.refresh('A/EMPTY')
+    assert cache.has_band('A/EMPTY', 'NDVI') is None
+
+
+def test_overlaps_extent():
+    extent = {'first_date': '2000-01-01', 'last_date': '2020-01-01'}
+    assert overlaps_extent(['2019-06-01', '2021-01-01'], extent) is True
+    assert overlaps_extent(['2021-01-01T00:00:00', '2021-06-01'], extent) is False
+    assert overlaps_extent(['1990-01-01', '1999-12-31'], extent) is False
+    assert overlaps_extent(['2019-06-01', '2021-01-01'], None) is None
+    assert overlaps_extent(['2019-06-01', '2021-01-01'], {'first_date': '2000-01-01'}) is None
+    assert overlaps_extent(None, extent) is None
+
+
+def test_range_outside_the_extent_uses_the_unfiltered_collection():
+    collection, filtered = object(), object()
+    extent = {'first_date': '2000-01-01', 'last_date': '2020-01-01'}
+
+    assert filter_within_extent(collection, filtered, ['2023-01-01', '2023-04-01'], extent) is collection
+    assert filter_within_extent(collection, filtered, ['2023-01-01', '2023-04-01'], None) is None
@@ -0,0 +1,84 @@
+"""Tests for the preview thumbnail pipeline, run against the placeholder image source."""
+import os
+
+from services.preview_images import (
+    MANIFEST_FILENAME,
+    PlaceholderImageSource,
+    generate_previews,
+    preview_image_id
+)
+
+
+def make_dataset(dataset_id, palette=('blue', 'green')):
+    return {
+        'id': dataset_id,
+        'summaries': {'gee:visualizations': [{
+            'image_visualization': {'band_vis': {'bands': ['b1'], 'palette': list(palette)}}
+        }]}
+    }
+
+
+class FailingImageSource(PlaceholderImageSource):
+    """Placeholder source that fails for chosen datasets"""
+
+    def __init__(self, failing_ids):
+        super().__init__()
+        self.failing_ids = set(failing_ids)
+
+    def render(self, dataset, vis_params, dimensions):
+        if dataset['id'] in self.failing_ids:
+            raise RuntimeError('render failed')
+        return super().render(dataset, vis_params, dimensions)
+
+
+def png_files(output_dir):
+    return sorted(name for name in os.listdir(output_dir) if name.endswith('.png'))
+
+
+def test_first_run_renders_and_rerun_skips(tmp_path):
+    datasets = [make_dataset('A/ONE'), make_dataset('A/TWO'), make_dataset('B/THREE')]
+    source = PlaceholderImageSource()
+
+    first = generate_previews(datasets, str(tmp_path), source, workers=2, dimensions=32)
+    assert first == {'rendered': 3, 'skipped': 0, 'failed': 0, 'pruned': 0}
+    assert png_files(tmp_path) == sorted(f"{preview_image_id(d['id'])}.png" for d in datasets)
+    assert os.path.exists(tmp_path / MANIFEST_FILENAME)
+
+    second = generate_previews(datasets, str(tmp_path), source, workers=2, dimensions=32)
+    assert second == {'rendered': 0, 'skipped': 3, 'failed': 0, 'pruned': 0}
+
+
+def test_dimension_or_catalog_change_rerenders(tmp_path):
+    datasets = [make_dataset('A/ONE'), make_dataset('A/TWO')]
+    source = PlaceholderImageSource()
+    generate_previews(datasets, str(tmp_path), source, dimensions=32)
+
+    resized = generate_previews(datasets, str(tmp_path), source, dimensions=64)
+    assert resized['rendered'] == 2
+
+    datasets[1] = make_dataset('A/TWO', palette=('red',))
+    changed = generate_previews(datasets, str(tmp_path), source, dimensions=64)
+    assert (changed['rendered'], changed['skipped']) == (1, 1)
+
+
+def test_prune_removes_stale_thumbnails(tmp_path):
+    source = PlaceholderImageSource()
+    generate_previews([make_dataset('A/ONE'), make_dataset('A/GONE')], str(tmp_path), source, dimensions=32)
+
+    stats = generate_previews([make_dataset('A/ONE')], str(tmp_path), source, dimensions=32, prune=True)
+    assert (stats['skipped'], stats['pruned']) == (1, 1)
+    assert png_files(tmp_path) == ['A_ONE.png']
+
+
+def test_failures_are_counted_and_leave_no_temp_files(tmp_path):
+    datasets = [make_dataset('A/ONE'), make_dataset('A/BROKEN'), make_dataset('A/TWO')]
+
+    stats = generate_previews(datasets, str(tmp_path), FailingImageSource({'A/BROKEN'}),
+                              workers=3, dimensions=32, checkpoint_every=1)
+    assert (stats['rendered'], stats['failed']) == (2, 1)
+    assert png_files(tmp_path) == ['A_ONE.png', 'A_TWO.png']
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+    # The failed dataset is retried on the next run
+    retry = generate_previews(datasets, str(tmp_path), PlaceholderImageSource(), dimensions=32)
+    assert (retry['rendered'], retry['skipped']) == (1, 2)
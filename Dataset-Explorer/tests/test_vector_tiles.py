@@ -0,0 +1,116 @@
+"""Tests for the vector tile disk cache and the /vector_tiles route, with tile fetching stubbed out."""
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+
+from routes import api
+from services.vector_tiles import VectorTileCache
+
+BUILDINGS_ID = 'GOOGLE/Research/open-buildings/v3/polygons'
+
+
+def test_hit_is_served_from_disk_without_building(tmp_path):
+    cache = VectorTileCache(str(tmp_path))
+    cache.put('A/ONE', 12, 1, 2, b'tile')
+
+    def builder():
+        raise AssertionError('a cached tile should not be rebuilt')
+
+    assert cache.get_or_create('A/ONE', 12, 1, 2, builder) == (b'tile', True)
+
+
+def test_concurrent_misses_share_one_build(tmp_path):
+    cache = VectorTileCache(str(tmp_path))
+    calls = []
+    start = threading.Barrier(5)
+    results = []
+
+    def builder():
+        calls.append(1)
+        time.sleep(0.05)
+        return b'tile'
+
+    def request_tile():
+        start.wait()
+        results.append(cache.get_or_create('A/ONE', 12, 1, 2, builder))
+
+    threads = [threading.Thread(target=request_tile) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(hit for _, hit in results) == [False, True, True, True, True]
+    # Locks are dropped once no request holds them
+    assert cache._locks == {}
+
+
+def test_dataset_ids_map_to_distinct_files(tmp_path):
+    cache = VectorTileCache(str(tmp_path))
+    ids = ['A/B', 'A_B', 'A%2FB', 'A/B#all']
+    for index, dataset_id in enumerate(ids):
+        cache.put(dataset_id, 12, 1, 2, str(index).encode())
+
+    assert [cache.get(dataset_id, 12, 1, 2) for dataset_id in ids] == [b'0', b'1', b'2', b'3']
+    assert sorted(os.listdir(tmp_path)) == sorted({'A%2FB', 'A_B', 'A%252FB', 'A%2FB%23all'})
+
+
+class FakeEmbeddingManager:
+    def __init__(self, datasets):
+        self.datasets = {index: dataset for index, dataset in enumerate(datasets)}
+
+
+@pytest.fixture
+def tile_client(tmp_path):
+    app = Flask(__name__)
+    api.register_vector_tile_routes(app, FakeEmbeddingManager([{'id': BUILDINGS_ID, 'gee:type': 'table'}]))
+    fetches = []
+
+    def fetch_tile_features(gee_collection, z, x, y, limit=None, skip_confidence_filter=False):
+        fetches.append((gee_collection, z, x, y, skip_confidence_filter))
+        return []
+
+    cache = VectorTileCache(str(tmp_path))
+    with patch.object(api, 'vector_tiles_available', return_value=True), \
+            patch.object(api, 'get_vector_tile_cache', return_value=cache), \
+            patch.object(api, 'fetch_tile_features', fetch_tile_features), \
+            patch.object(api, 'encode_features', return_value=b'mvt'):
+        yield app.test_client(), fetches
+
+
+def test_route_serves_repeat_requests_from_the_cache(tile_client):
+    client, fetches = tile_client
+    url = f'/vector_tiles/{BUILDINGS_ID}/14/8000/5000.mvt'
+
+    first = client.get(url)
+    second = client.get(url)
+
+    assert (first.status_code, first.headers['X-Tile-Cache'], first.data) == (200, 'MISS', b'mvt')
+    assert (second.status_code, second.headers['X-Tile-Cache']) == (200, 'HIT')
+    assert second.mimetype == api.MVT_MIMETYPE
+    assert fetches == [(BUILDINGS_ID, 14, 8000, 5000, False)]
+
+
+def test_route_caches_unfiltered_tiles_separately(tile_client):
+    client, fetches = tile_client
+    url = f'/vector_tiles/{BUILDINGS_ID}/14/8000/5000.mvt'
+
+    client.get(url)
+    unfiltered = client.get(url + '?skip_confidence_filter=true')
+
+    assert unfiltered.headers['X-Tile-Cache'] == 'MISS'
+    assert [fetch[-1] for fetch in fetches] == [False, True]
+
+
+def test_route_rejects_low_zoom_and_invalid_tiles(tile_client):
+    client, fetches = tile_client
+
+    assert client.get(f'/vector_tiles/{BUILDINGS_ID}/2/1/1.mvt').status_code == 204
+    assert client.get(f'/vector_tiles/{BUILDINGS_ID}/14/99999/1.mvt').status_code == 400
+    assert client.get('/vector_tiles/UNKNOWN/DATASET/14/1/1.mvt').status_code == 404
+    assert fetches == []
@@ -3,11 +3,16 @@ OpenWeatherMap connector for the GIS AI Agent.
 
 This module provides a client for interacting with the OpenWeatherMap API,
 allowing the agent to access weather data and forecasts.
+
+Requests share one pooled HTTP session with keep-alive and DNS caching.
+Location names are resolved to coordinates once and the result is kept in
+the persistent cache, and identical requests in flight at the same time are
+sent only once.
 """
 
 import logging
 import json
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Union, Tuple
 import asyncio
 import tempfile
 import os
@@ -15,20 +20,63 @@ from pathlib import Path
 import aiohttp
 import time
 from ..config import get_config
+from ..utils.cache import AsyncCache, get_async_cache
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Defaults, overridable in server_config.yaml (data.openweathermap)
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_KEEPALIVE_TIMEOUT = 30  # seconds an idle connection is kept open
+DEFAULT_DNS_CACHE_TTL = 300  # seconds
+DEFAULT_REQUEST_TIMEOUT = 15  # seconds
+DEFAULT_GEOCODE_TTL = 30 * 24 * 3600  # place coordinates rarely change
+DEFAULT_BULK_CONCURRENCY = 8
+DEFAULT_BULK_REQUESTS_PER_SECOND = 10
+
 
 class OpenWeatherMapClient:
     """Client for interacting with the OpenWeatherMap API."""
 
-    def __init__(self):
-        """Initialize the OpenWeatherMap client."""
+    def __init__(self, cache: Optional[AsyncCache] = None):
+        """
+        Initialize the OpenWeatherMap client.
+
+        Args:
+            cache: Cache for resolved locations. If None, the shared cache is used.
+        """
         self.config = get_config()
         self.api_key = None
         self.base_url = "https://api.openweathermap.org/data/2.5"
+        self.geo_url = "https://api.openweathermap.org/geo/1.0"
         self._get_api_key()
+        
+        owm_config = self.config.get_server_config().get("data", {}).get("openweathermap", {}) or {}
+        self.max_connections = owm_config.get("max_connections", DEFAULT_MAX_CONNECTIONS)
+        self.keepalive_timeout = owm_config.get("keepalive_timeout", DEFAULT_KEEPALIVE_TIMEOUT)
+        self.dns_cache_ttl = owm_config.get("dns_cache_ttl", DEFAULT_DNS_CACHE_TTL)
+        self.request_timeout = owm_config.get("request_timeout", DEFAULT_REQUEST_TIMEOUT)
+        self.geocode_ttl = owm_config.get("geocode_ttl", DEFAULT_GEOCODE_TTL)
+        self.bulk_concurrency = owm_config.get("bulk_concurrency", DEFAULT_BULK_CONCURRENCY)
+        self.bulk_requests_per_second = owm_config.get("bulk_requests_per_second", DEFAULT_BULK_REQUESTS_PER_SECOND)
+        
+        # Created lazily, since the client is built before the event loop runs
+        self._cache = cache
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Requests being sent, keyed by endpoint and parameters
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        
+        # Earliest start time of the next rate-capped bulk request
+        self._next_bulk_request_at = 0.0
+        
+        self.stats = {
+            "requests": 0,
+            "coalesced_requests": 0,
+            "geocode_hits": 0,
+            "geocode_lookups": 0
+        }
 
     def _get_api_key(self) -> None:
         """Get the OpenWeatherMap API key from configuration or environment."""
@@ -43,13 +91,46 @@ class OpenWeatherMapClient:
         if not self.api_key:
             logger.warning("No OpenWeatherMap API key found. Some features may not work.")
 
-    async def _make_request(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Get or create the pooled aiohttp ClientSession.
+
+        Returns:
+            A ClientSession that keeps connections alive and caches DNS lookups.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+            self._session_loop = loop
+        
+        return self._session
+
+    async def close(self) -> None:
+        """Close the pooled session."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    async def _make_request(self, endpoint: str, params: Dict[str, Any], base_url: Optional[str] = None) -> Any:
         """
         Make a request to the OpenWeatherMap API.
 
+        A request identical to one already in flight waits for that one's
+        response instead of being sent again.
+
         Args:
             endpoint: API endpoint.
             params: Query parameters.
+            base_url: API root to use instead of the weather data API.
 
         Returns:
             API response data.
@@ -57,18 +138,98 @@ class OpenWeatherMapClient:
         if not self.api_key:
             raise ValueError("OpenWeatherMap API key not configured")
         
-        # Add API key to parameters
-        params["appid"] = self.api_key
+        url = f"{base_url or self.base_url}/{endpoint}"
+        request_key = json.dumps([url, params], sort_keys=True, default=str)
         
-        url = f"{self.base_url}/{endpoint}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    logger.error(f"OpenWeatherMap API error: {error_text}")
-                    raise Exception(f"OpenWeatherMap API error: {response.status} - {error_text}")
-                
-                return await response.json()
+        task = self._in_flight.get(request_key)
+        if task is None:
+            # Add API key to a copy of the parameters
+            task = asyncio.ensure_future(self._send_request(url, dict(params, appid=self.api_key)))
+            self._in_flight[request_key] = task
+            task.add_done_callback(lambda t, key=request_key: self._release_in_flight(key, t))
+        else:
+            logger.debug(f"Coalescing OpenWeatherMap request to {endpoint} with an identical one in flight")
+            self.stats["coalesced_requests"] += 1
+        
+        # One caller giving up does not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _send_request(self, url: str, params: Dict[str, Any]) -> Any:
+        """Send a GET request over the pooled session and return the JSON body."""
+        session = await self.get_session()
+        self.stats["requests"] += 1
+        async with session.get(url, params=params) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error(f"OpenWeatherMap API error: {error_text}")
+                raise Exception(f"OpenWeatherMap API error: {response.status} - {error_text}")
+            
+            return await response.json()
+
+    def _release_in_flight(self, request_key: str, task: asyncio.Future) -> None:
+        """Forget a finished request."""
+        if self._in_flight.get(request_key) is task:
+            del self._in_flight[request_key]
+        # Mark the exception retrieved when every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def _get_cache(self) -> AsyncCache:
+        """Get the cache used for resolved locations."""
+        if self._cache is None:
+            self._cache = get_async_cache()
+        return self._cache
+
+    async def resolve_location(self, location: str) -> Optional[Tuple[float, float]]:
+        """
+        Resolve a location to coordinates.
+
+        Coordinates ("lat,lon") are parsed directly. Names are looked up with
+        the OpenWeatherMap geocoding API and the result is cached.
+
+        Args:
+            location: Location name or coordinates (lat,lon).
+
+        Returns:
+            (latitude, longitude), or None if the name could not be resolved.
+        """
+        # Check if location is coordinates
+        if "," in location and all(part.strip().replace(".", "").replace("-", "").isdigit()
+                                 for part in location.split(",")):
+            lat, lon = map(float, location.split(","))
+            return lat, lon
+        
+        cache = self._get_cache()
+        cache_key = {"openweathermap_geocode": " ".join(location.lower().split())}
+        cached = await cache.get(cache_key)
+        if cached is not None:
+            self.stats["geocode_hits"] += 1
+            return cached[0], cached[1]
+        
+        self.stats["geocode_lookups"] += 1
+        matches = await self._make_request("direct", {"q": location, "limit": 1}, base_url=self.geo_url)
+        if not matches:
+            logger.warning(f"OpenWeatherMap could not geocode location: {location}")
+            return None
+        
+        coordinates = (matches[0]["lat"], matches[0]["lon"])
+        await cache.set(cache_key, list(coordinates), self.geocode_ttl)
+        return coordinates
+
+    async def _location_params(self, location: str) -> Dict[str, Any]:
+        """
+        Build the query parameters that select a location.
+
+        Args:
+            location: Location name or coordinates (lat,lon).
+
+        Returns:
+            lat/lon parameters, or the name itself if it could not be resolved.
+        """
+        coordinates = await self.resolve_location(location)
+        if coordinates is None:
+            return {"q": location}
+        return {"lat": coordinates[0], "lon": coordinates[1]}
 
     async def get_current_weather(self, location: str, units: str = "metric") -> Dict[str, Any]:
         """
@@ -83,16 +244,7 @@ class OpenWeatherMapClient:
         """
         try:
             params = {"units": units}
-            
-            # Check if location is coordinates
-            if "," in location and all(part.replace(".", "").replace("-", "").isdigit() 
-                                     for part in location.split(",")):
-                lat, lon = map(float, location.split(","))
-                params["lat"] = lat
-                params["lon"] = lon
-            else:
-                # Location name
-                params["q"] = location
+            params.update(await self._location_params(location))
             
             # Make API request
             result = await self._make_request("weather", params)
@@ -156,16 +308,7 @@ class OpenWeatherMapClient:
         """
         try:
             params = {"units": units}
-            
-            # Check if location is coordinates
-            if "," in location and all(part.replace(".", "").replace("-", "").isdigit() 
-                                     for part in location.split(",")):
-                lat, lon = map(float, location.split(","))
-                params["lat"] = lat
-                params["lon"] = lon
-            else:
-                # Location name
-                params["q"] = location
+            params.update(await self._location_params(location))
             
             # Make API request
             result = await self._make_request("forecast", params)
@@ -228,20 +371,11 @@ class OpenWeatherMapClient:
             Air pollution data.
         """
         try:
-            params = {}
-            
             # OpenWeatherMap air pollution API requires coordinates
-            if "," in location and all(part.replace(".", "").replace("-", "").isdigit() 
-                                     for part in location.split(",")):
-                lat, lon = map(float, location.split(","))
-                params["lat"] = lat
-                params["lon"] = lon
-            else:
-                # For location names, first get coordinates
-                weather_data = await self.get_current_weather(location)
-                coords = weather_data.get("location", {}).get("coordinates", {})
-                params["lat"] = coords.get("latitude", 0)
-                params["lon"] = coords.get("longitude", 0)
+            coordinates = await self.resolve_location(location)
+            if coordinates is None:
+                raise ValueError(f"Could not find coordinates for location: {location}")
+            params = {"lat": coordinates[0], "lon": coordinates[1]}
             
             # Make API request
             result = await self._make_request("air_pollution", params)
@@ -301,6 +435,49 @@ class OpenWeatherMapClient:
             logger.error(f"Error getting air pollution data: {e}")
             raise
 
+    async def get_weather_bulk(self,
+                               locations: List[str],
+                               units: str = "metric",
+                               max_concurrency: Optional[int] = None,
+                               requests_per_second: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Get current weather for many locations concurrently.
+
+        Args:
+            locations: Location names or coordinates (lat,lon).
+            units: Units of measurement (metric, imperial, standard).
+            max_concurrency: Maximum requests at once. If None, the configured value is used.
+            requests_per_second: Maximum request starts per second. If None, the configured value is used.
+
+        Returns:
+            Current weather data by location; locations that failed map to {"error": message}.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.bulk_concurrency)
+        rate = requests_per_second or self.bulk_requests_per_second
+        
+        async def fetch(location: str) -> Dict[str, Any]:
+            async with semaphore:
+                await self._wait_for_bulk_slot(rate)
+                try:
+                    return await self.get_current_weather(location, units)
+                except Exception as e:
+                    return {"error": str(e)}
+        
+        unique_locations = list(dict.fromkeys(locations))
+        results = await asyncio.gather(*(fetch(location) for location in unique_locations))
+        return dict(zip(unique_locations, results))
+
+    async def _wait_for_bulk_slot(self, requests_per_second: float) -> None:
+        """Wait until the next request may start under the bulk rate cap."""
+        if requests_per_second <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start_at = max(now, self._next_bulk_request_at)
+        self._next_bulk_request_at = start_at + 1.0 / requests_per_second
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
     def _get_aqi_description(self, aqi: int) -> str:
         """Get description for Air Quality Index value."""
         if aqi == 1:
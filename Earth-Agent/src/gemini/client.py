@@ -6,9 +6,10 @@ allowing the agent to use Gemini's language capabilities.
 """
 
 import os
+import time
 import logging
 import google.generativeai as genai
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Union, AsyncIterator
 import asyncio
 
 from ..config import get_config
@@ -177,28 +178,9 @@ class GeminiClient:
                                 
                                 # Check if it's a function call part
                                 elif hasattr(part, 'function_call'):
-                                    try:
-                                        name = getattr(part.function_call, 'name', None)
-                                        args = {}
-                                        if hasattr(part.function_call, 'args'):
-                                            # The 'args' attribute is often a protobuf Map, convert to dict
-                                            args = dict(part.function_call.args)
-                                        elif hasattr(part.function_call, 'arguments'):
-                                            # Handle potential alternative attribute name
-                                            args = part.function_call.arguments
-                                            if not isinstance(args, dict): # Ensure it's a dict
-                                                args = {}
-
-                                        if name:
-                                            result["tool_calls"].append({
-                                                "name": name,
-                                                "arguments": args
-                                            })
-                                        else:
-                                             logger.warning("Found function_call part without a name.")
-
-                                    except Exception as e:
-                                        logger.warning(f"Error extracting function call details: {e}")
+                                    tool_call = self._extract_function_call(part)
+                                    if tool_call:
+                                        result["tool_calls"].append(tool_call)
                                 else:
                                      logger.debug(f"Skipping unknown part type: {type(part)}")
 
@@ -225,6 +207,55 @@ class GeminiClient:
         logger.debug(f"Processed response: {result}")
         return result
 
+    def _extract_function_call(self, part: Any) -> Optional[Dict[str, Any]]:
+        """
+        Extract a tool call from a function call part.
+
+        Args:
+            part: A response part with a function_call attribute.
+
+        Returns:
+            Dict with 'name' and 'arguments', or None if the part has no usable call.
+        """
+        try:
+            name = getattr(part.function_call, 'name', None)
+            args = {}
+            if hasattr(part.function_call, 'args'):
+                # The 'args' attribute is often a protobuf Map, convert to dict
+                args = dict(part.function_call.args)
+            elif hasattr(part.function_call, 'arguments'):
+                # Handle potential alternative attribute name
+                args = part.function_call.arguments
+                if not isinstance(args, dict): # Ensure it's a dict
+                    args = {}
+
+            if name:
+                return {
+                    "name": name,
+                    "arguments": args
+                }
+            logger.warning("Found function_call part without a name.")
+        except Exception as e:
+            logger.warning(f"Error extracting function call details: {e}")
+        return None
+
+    def _build_generation_config(self,
+                                 temperature: Optional[float],
+                                 max_tokens: Optional[int]) -> Any:
+        """Create the generation config, filling unset values from configuration."""
+        model_config = self.config.get_model_config()
+        if temperature is None:
+            temperature = model_config.get("temperature", 0.7)
+        if max_tokens is None:
+            max_tokens = model_config.get("max_tokens", 4096)
+        
+        return genai.GenerationConfig(
+            temperature=temperature,
+            top_p=model_config.get("top_p", 0.95),
+            top_k=model_config.get("top_k", 40),
+            max_output_tokens=max_tokens
+        )
+
     async def chat(self, 
             messages: List[Dict[str, Any]], 
             temperature: Optional[float] = None,
@@ -236,6 +267,9 @@ class GeminiClient:
         Args:
             messages: List of messages in the conversation so far.
                      Each message should have 'role' (user or assistant) and 'content'.
+                     Assistant messages may carry 'tool_calls' (dicts with 'name' and
+                     'arguments'), which are sent as function calls, and messages with
+                     role 'tool', 'name' and a dict 'content' are sent as function responses.
             temperature: Temperature for sampling. Higher values make output more random.
             max_tokens: Maximum number of tokens to generate.
             tools: List of tools to make available to the model.
@@ -247,34 +281,9 @@ class GeminiClient:
             self._initialize_model()
         
         # Format messages for Gemini API
-        formatted_messages = []
+        formatted_messages = self._format_messages(messages)
         
-        for message in messages:
-            role = message.get("role", "user")
-            content = message.get("content", "")
-            
-            if role == "user":
-                formatted_messages.append({"role": "user", "parts": [{"text": content}]})
-            elif role == "assistant":
-                formatted_messages.append({"role": "model", "parts": [{"text": content}]})
-            elif role == "system":
-                # Add system prompt as a user message at the beginning
-                if not formatted_messages:
-                    formatted_messages.append({"role": "user", "parts": [{"text": f"System: {content}"}]})
-        
-        # Get default values from configuration if not provided
-        model_config = self.config.get_model_config()
-        if temperature is None:
-            temperature = model_config.get("temperature", 0.7)
-        if max_tokens is None:
-            max_tokens = model_config.get("max_tokens", 4096)
-        
-        generation_config = genai.GenerationConfig(
-            temperature=temperature,
-            top_p=model_config.get("top_p", 0.95),
-            top_k=model_config.get("top_k", 40),
-            max_output_tokens=max_tokens
-        )
+        generation_config = self._build_generation_config(temperature, max_tokens)
         
         try:
             # Generate response
@@ -297,6 +306,111 @@ class GeminiClient:
             logger.error(f"Error in chat with Gemini: {e}")
             raise
 
+    async def chat_stream(self,
+            messages: List[Dict[str, Any]],
+            temperature: Optional[float] = None,
+            max_tokens: Optional[int] = None,
+            tools: Optional[List[Dict[str, Any]]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a chat response from the Gemini model.
+
+        Args:
+            messages: List of messages in the conversation so far, as for chat().
+            temperature: Temperature for sampling. Higher values make output more random.
+            max_tokens: Maximum number of tokens to generate.
+            tools: List of tools to make available to the model.
+
+        Yields:
+            {"text": ...} for each text chunk as it arrives, then
+            {"done": True, "response": ...} with the complete response in the
+            same shape chat() returns.
+        """
+        if not self.model:
+            self._initialize_model()
+        
+        formatted_messages = self._format_messages(messages)
+        generation_config = self._build_generation_config(temperature, max_tokens)
+        
+        request_kwargs = {"generation_config": generation_config, "stream": True}
+        if tools:
+            request_kwargs["tools"] = tools
+        
+        text_parts = []
+        tool_calls = []
+        start_time = time.monotonic()
+        first_token_time = None
+        try:
+            response = await self.model.generate_content_async(formatted_messages, **request_kwargs)
+            async for chunk in response:
+                for candidate in getattr(chunk, 'candidates', None) or []:
+                    content = getattr(candidate, 'content', None)
+                    for part in getattr(content, 'parts', None) or []:
+                        text = getattr(part, 'text', '')
+                        if text:
+                            if first_token_time is None:
+                                first_token_time = time.monotonic()
+                                logger.info(f"Gemini stream first token after {first_token_time - start_time:.2f} seconds")
+                            text_parts.append(text)
+                            yield {"text": text}
+                        elif hasattr(part, 'function_call') and getattr(part.function_call, 'name', None):
+                            tool_call = self._extract_function_call(part)
+                            if tool_call:
+                                tool_calls.append(tool_call)
+        except Exception as e:
+            logger.error(f"Error in streaming chat with Gemini: {e}")
+            raise
+        
+        logger.info(f"Gemini stream completed in {time.monotonic() - start_time:.2f} seconds "
+                    f"({len(text_parts)} chunks, {len(tool_calls)} tool calls)")
+        
+        result = {"text": "".join(text_parts), "tool_calls": tool_calls}
+        if not result["text"] and tool_calls:
+            result["text"] = "Okay, I will use the requested tool."
+        yield {"done": True, "response": result}
+
+    def _format_messages(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Convert chat messages to Gemini content turns.
+
+        Args:
+            messages: Messages as accepted by chat().
+
+        Returns:
+            List of Gemini content dicts.
+        """
+        formatted_messages = []
+        previous_role = None
+        
+        for message in messages:
+            role = message.get("role", "user")
+            content = message.get("content", "")
+            
+            if role == "user":
+                formatted_messages.append({"role": "user", "parts": [{"text": content}]})
+            elif role == "assistant":
+                if message.get("tool_calls"):
+                    # Function calls go in a model turn of their own
+                    formatted_messages.append({"role": "model", "parts": [
+                        {"function_call": {"name": call["name"], "args": call.get("arguments", {})}}
+                        for call in message["tool_calls"]
+                    ]})
+                else:
+                    formatted_messages.append({"role": "model", "parts": [{"text": content}]})
+            elif role == "tool":
+                part = {"function_response": {"name": message.get("name", ""), "response": content}}
+                if previous_role == "tool":
+                    # Responses to parallel calls share one turn
+                    formatted_messages[-1]["parts"].append(part)
+                else:
+                    formatted_messages.append({"role": "user", "parts": [part]})
+            elif role == "system":
+                # Add system prompt as a user message at the beginning
+                if not formatted_messages:
+                    formatted_messages.append({"role": "user", "parts": [{"text": f"System: {content}"}]})
+            previous_role = role
+        
+        return formatted_messages
+
 # Create a singleton instance
 gemini_client = GeminiClient()
 
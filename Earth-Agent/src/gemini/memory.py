@@ -3,15 +3,66 @@ Memory management for the Gemini client.
 
 This module provides functionality for storing and managing conversation history
 for the Gemini model, allowing for persistent memory across interactions.
+
+Histories are bounded by an estimated token budget as well as a message
+count. Messages that no longer fit are folded into a running summary, which
+is produced off the request path when a summarizer is configured. Sessions are
+kept in least-recently-used order, so touching and evicting a session take
+constant time, and get_history returns a read-only snapshot. Tool
+results are kept in history as compact digests; the full payloads are held
+separately and can be fetched by reference.
+
+A session can be exported as a snapshot and imported again, and a resumed
+session is restored lazily: its snapshot is fetched through the configured
+loader the first time the session is used, not when the client reconnects.
 """
 
+import json
+import uuid
+import asyncio
 import logging
 import time
-from typing import Dict, List, Any, Optional
+from collections import OrderedDict, deque
+from types import MappingProxyType
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Deque, Mapping, Tuple
+
+from ..config import get_config
+from ..utils.result_projection import project_tool_result, serialized_size
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Rough token estimate: characters per token, plus a per-message overhead
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Summarizer signature: (previous_summary, folded_messages) -> new summary
+Summarizer = Callable[[str, List[Mapping[str, Any]]], Awaitable[str]]
+
+# Read-only view of a session's history as returned by get_history
+HistorySnapshot = Tuple[Mapping[str, Any], ...]
+
+# Session loader signature: session_id -> snapshot from export_session, or None
+SessionLoader = Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a piece of text.
+    
+    Args:
+        text: The text to measure.
+        
+    Returns:
+        Approximate token count.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def message_tokens(message: Mapping[str, Any]) -> int:
+    """Estimate the tokens a history message adds to a prompt."""
+    return estimate_tokens(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS
+
 class ChatHistory:
     """
     Class for managing conversation history for the Gemini model.
@@ -20,22 +71,73 @@ class ChatHistory:
     organized by session IDs, with support for:
     - Adding messages to history
     - Retrieving history for a specific session
-    - Pruning old or large histories
+    - Pruning old or large histories into a running summary
+    - Storing tool results as digests with the full payload by reference
     - Adding system prompts
+    - Exporting sessions and restoring resumed ones on first use
     """
     
-    def __init__(self, max_history_length: int = 20, max_sessions: int = 1000):
+    def __init__(self,
+                 max_history_length: int = 20,
+                 max_sessions: int = 1000,
+                 max_history_tokens: int = 3000,
+                 summary_max_tokens: int = 300,
+                 tool_digest_chars: int = 800,
+                 max_tool_results: int = 10,
+                 summarizer: Optional[Summarizer] = None,
+                 session_loader: Optional[SessionLoader] = None):
         """
         Initialize the chat history manager.
         
         Args:
             max_history_length: Maximum number of messages to keep per session.
             max_sessions: Maximum number of sessions to track.
+            max_history_tokens: Estimated token budget for a session's messages.
+            summary_max_tokens: Estimated token budget for a session's running summary.
+            tool_digest_chars: Maximum serialized size of a tool result digest.
+            max_tool_results: Full tool results kept per session for lookup by reference.
+            summarizer: Optional coroutine that folds messages into the running
+                        summary. Without one, a short extractive summary is used.
+            session_loader: Optional coroutine that fetches the stored snapshot
+                            of a resumed session.
         """
-        self.histories: Dict[str, List[Dict[str, Any]]] = {}
+        # Sessions in least-recently-used order; each holds its messages
+        # without the system prompt, which is kept per session below
+        self.histories: "OrderedDict[str, Deque[Mapping[str, Any]]]" = OrderedDict()
+        self.system_prompts: Dict[str, str] = {}
+        self.history_tokens: Dict[str, int] = {}
         self.session_timestamps: Dict[str, float] = {}
         self.max_history_length = max_history_length
         self.max_sessions = max_sessions
+        self.max_history_tokens = max_history_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.tool_digest_chars = tool_digest_chars
+        self.max_tool_results = max_tool_results
+        self.summarizer = summarizer
+        self.session_loader = session_loader
+        
+        # Resumed sessions not yet restored, in least-recently-marked order, and restores in progress
+        self._restorable: "OrderedDict[str, None]" = OrderedDict()
+        self._restore_tasks: Dict[str, asyncio.Task] = {}
+        
+        # Running summaries, full tool results and folds awaiting summarization
+        self.summaries: Dict[str, str] = {}
+        self.tool_results: Dict[str, "OrderedDict[str, Dict[str, Any]]"] = {}
+        self._pending_folds: Dict[str, List[Mapping[str, Any]]] = {}
+        self._summary_tasks: Dict[str, asyncio.Task] = {}
+        
+        self.stats = {
+            "folded_messages": 0,
+            "folded_tokens": 0,
+            "summaries": 0,
+            "summary_failures": 0,
+            "tool_result_tokens": 0,
+            "tool_digest_tokens": 0,
+            "evicted_sessions": 0,
+            "restored_sessions": 0,
+            "restore_misses": 0,
+            "restore_failures": 0
+        }
         
         # System prompt (can be customized)
         self.system_prompt = (
@@ -58,54 +160,392 @@ class ChatHistory:
             logger.warning(f"Invalid role '{role}', defaulting to 'user'")
             role = 'user'
         
-        # Initialize history for new sessions with system prompt
-        if session_id not in self.histories:
-            self.histories[session_id] = []
-            # Add system prompt if this is a new session
-            self.histories[session_id].append({
-                "role": "system",
-                "content": self.system_prompt
-            })
-        
-        # Add the message
-        self.histories[session_id].append({
-            "role": role,
-            "content": content
-        })
-        
-        # Update session timestamp
+        history = self.histories.get(session_id)
+        if history is None:
+            history = self._create_session(session_id)
+        else:
+            self._touch(session_id)
+        
+        # Messages are stored read-only so snapshots can share them
+        message = MappingProxyType({"role": role, "content": content})
+        
+        # The deque would drop its oldest message silently; take it out first so it is folded
+        folded = []
+        if len(history) == history.maxlen:
+            folded.append(history.popleft())
+            self.history_tokens[session_id] -= message_tokens(folded[0])
+        history.append(message)
+        self.history_tokens[session_id] += message_tokens(message)
+        
+        # Fold the oldest messages into the summary if the history is too long
+        self._enforce_limits(session_id, folded)
+    
+    def _create_session(self, session_id: str) -> Deque[Mapping[str, Any]]:
+        """
+        Start an empty history for a session, evicting the least recently used session if needed.
+        
+        Args:
+            session_id: Unique identifier for the conversation session.
+            
+        Returns:
+            The new session's message deque.
+        """
+        history: Deque[Mapping[str, Any]] = deque(maxlen=max(1, self.max_history_length))
+        self.histories[session_id] = history
+        self.system_prompts[session_id] = self.system_prompt
+        self.history_tokens[session_id] = 0
+        self.session_timestamps[session_id] = time.time()
+        
+        self._prune_old_sessions()
+        return history
+    
+    def _touch(self, session_id: str) -> None:
+        """Mark a session as the most recently used."""
+        self.histories.move_to_end(session_id)
         self.session_timestamps[session_id] = time.time()
+    
+    def add_tool_result(self, session_id: str, tool_name: str, result: Any) -> str:
+        """
+        Record a tool result as a compact digest and keep the full payload by reference.
+        
+        Args:
+            session_id: Unique identifier for the conversation session.
+            tool_name: Name of the tool that produced the result.
+            result: The full tool result.
+            
+        Returns:
+            Reference for fetching the full result with get_tool_result.
+        """
+        ref = uuid.uuid4().hex[:12]
+        results = self.tool_results.setdefault(session_id, OrderedDict())
+        results[ref] = {"tool_name": tool_name, "result": result, "created_at": time.time()}
+        while len(results) > self.max_tool_results:
+            results.popitem(last=False)
         
-        # Prune history if needed
-        if len(self.histories[session_id]) > self.max_history_length + 1:  # +1 for system message
-            # Keep system message and trim oldest messages
-            system_message = None
-            if self.histories[session_id][0]["role"] == "system":
-                system_message = self.histories[session_id][0]
-                self.histories[session_id] = self.histories[session_id][-(self.max_history_length):]
-                self.histories[session_id].insert(0, system_message)
-            else:
-                self.histories[session_id] = self.histories[session_id][-(self.max_history_length):]
+        digest = project_tool_result(tool_name, result, max_chars=self.tool_digest_chars)
+        digest_text = json.dumps(digest, separators=(",", ":"))
         
-        # Prune old sessions if needed
-        if len(self.histories) > self.max_sessions:
-            self._prune_old_sessions()
+        full_tokens = serialized_size(result) // CHARS_PER_TOKEN
+        digest_tokens = len(digest_text) // CHARS_PER_TOKEN
+        self.stats["tool_result_tokens"] += full_tokens
+        self.stats["tool_digest_tokens"] += digest_tokens
+        logger.info(f"Stored {tool_name} result for session {session_id} as ref {ref}: "
+                    f"~{digest_tokens} tokens in history instead of ~{full_tokens}")
+        
+        self.add_message(session_id, "assistant", f"Tool '{tool_name}' result (ref {ref}): {digest_text}")
+        return ref
     
-    def get_history(self, session_id: str) -> List[Dict[str, Any]]:
+    def get_tool_result(self, session_id: str, ref: str) -> Optional[Dict[str, Any]]:
         """
-        Get the conversation history for a session.
+        Get a full tool result recorded with add_tool_result.
         
         Args:
             session_id: Unique identifier for the conversation session.
+            ref: Reference returned by add_tool_result.
             
         Returns:
-            List of message dictionaries for the session, or an empty list if no history exists.
+            Dict with 'tool_name', 'result' and 'created_at', or None if unknown or evicted.
         """
-        # Update timestamp if session exists
-        if session_id in self.histories:
-            self.session_timestamps[session_id] = time.time()
-            return self.histories[session_id]
-        return []
+        return self.tool_results.get(session_id, {}).get(ref)
+    
+    def get_history(self, session_id: str) -> HistorySnapshot:
+        """
+        Get a read-only snapshot of the conversation history for a session.
+        
+        The snapshot starts with the session's system message, to which the
+        running summary of folded messages, if any, is appended. Later changes
+        to the session do not affect a snapshot already returned.
+        
+        Args:
+            session_id: Unique identifier for the conversation session.
+            
+        Returns:
+            Tuple of read-only messages for the session, or an empty tuple if no history exists.
+        """
+        history = self.histories.get(session_id)
+        if history is None:
+            return ()
+        
+        self._touch(session_id)
+        
+        system_content = self.system_prompts[session_id]
+        summary = self.summaries.get(session_id)
+        if summary:
+            summary_text = f"Summary of the earlier conversation:\n{summary}"
+            system_content = f"{system_content}\n\n{summary_text}" if system_content else summary_text
+        
+        if not system_content:
+            return tuple(history)
+        return (MappingProxyType({"role": "system", "content": system_content}),) + tuple(history)
+    
+    def export_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Export a session's state so it can be restored later.
+        
+        Messages still waiting for the summarizer are folded into the
+        exported summary extractively.
+        
+        Args:
+            session_id: Unique identifier for the conversation session.
+            
+        Returns:
+            Dict with 'messages', 'summary', 'system_prompt', 'tool_results'
+            and 'saved_at', or None if the session has no history.
+        """
+        history = self.histories.get(session_id)
+        if history is None:
+            return None
+        
+        summary = self.summaries.get(session_id, "")
+        pending = self._pending_folds.get(session_id)
+        if pending:
+            summary = self._extractive_summary(summary, pending)
+        
+        return {
+            "messages": [dict(message) for message in history],
+            "summary": summary,
+            "system_prompt": self.system_prompts[session_id],
+            "tool_results": [[ref, dict(entry)] for ref, entry in self.tool_results.get(session_id, {}).items()],
+            "saved_at": time.time()
+        }
+    
+    def import_session(self, session_id: str, snapshot: Mapping[str, Any]) -> None:
+        """
+        Replace a session's state with a snapshot.
+        
+        The snapshot may come from export_session or hold only 'messages'. The
+        newest messages that fit the session's limits are kept; older ones are
+        folded into the summary extractively, so restoring never calls the model.
+        
+        Args:
+            session_id: Unique identifier for the conversation session.
+            snapshot: The session state to restore.
+        """
+        self._drop_session(session_id)
+        history = self._create_session(session_id)
+        if snapshot.get("system_prompt"):
+            self.system_prompts[session_id] = snapshot["system_prompt"]
+        if snapshot.get("summary"):
+            self.summaries[session_id] = snapshot["summary"]
+        
+        messages = [
+            MappingProxyType({"role": message.get("role", "user"), "content": str(message.get("content", ""))})
+            for message in snapshot.get("messages") or [] if isinstance(message, Mapping)
+        ]
+        
+        # Keep the newest messages within the message and token limits
+        kept, tokens = [], 0
+        for message in reversed(messages):
+            size = message_tokens(message)
+            if len(kept) == history.maxlen or (kept and tokens + size > self.max_history_tokens):
+                break
+            kept.append(message)
+            tokens += size
+        history.extend(reversed(kept))
+        self.history_tokens[session_id] = tokens
+        
+        older = messages[:len(messages) - len(kept)]
+        if older:
+            self._apply_summary(session_id, self._extractive_summary(self.summaries.get(session_id, ""), older), older)
+        
+        results = [(ref, dict(entry)) for ref, entry in snapshot.get("tool_results") or []]
+        if results:
+            self.tool_results[session_id] = OrderedDict(results[-self.max_tool_results:])
+    
+    def mark_restorable(self, session_id: str) -> None:
+        """
+        Note that a resumed session may have state stored elsewhere.
+        
+        Nothing is loaded yet; ensure_session loads the state the first time
+        the session is used.
+        
+        Args:
+            session_id: Unique identifier of the resumed session.
+        """
+        if self.session_loader is None or session_id in self.histories:
+            return
+        
+        self._restorable[session_id] = None
+        self._restorable.move_to_end(session_id)
+        while len(self._restorable) > self.max_sessions:
+            self._restorable.popitem(last=False)
+    
+    async def ensure_session(self, session_id: str) -> bool:
+        """
+        Restore a resumed session before it is used.
+        
+        Concurrent callers share one load. Sessions that were not marked
+        restorable return at once.
+        
+        Args:
+            session_id: Unique identifier for the conversation session.
+            
+        Returns:
+            True if the session's state was restored by this load.
+        """
+        task = self._restore_tasks.get(session_id)
+        if task is None:
+            if session_id not in self._restorable:
+                return False
+            del self._restorable[session_id]
+            task = asyncio.get_running_loop().create_task(self._restore_session(session_id))
+            self._restore_tasks[session_id] = task
+        return await asyncio.shield(task)
+    
+    async def _restore_session(self, session_id: str) -> bool:
+        """
+        Load a resumed session's snapshot and import it.
+        
+        Args:
+            session_id: Unique identifier for the conversation session.
+            
+        Returns:
+            True if a snapshot was imported.
+        """
+        try:
+            snapshot = await self.session_loader(session_id)
+        except Exception as e:
+            logger.warning(f"Could not restore session {session_id}, starting it empty: {e}")
+            self.stats["restore_failures"] += 1
+            return False
+        finally:
+            self._restore_tasks.pop(session_id, None)
+        
+        # Messages added while loading belong to a newer conversation than the snapshot
+        if not snapshot or session_id in self.histories:
+            self.stats["restore_misses"] += 1
+            return False
+        
+        self.import_session(session_id, snapshot)
+        self.stats["restored_sessions"] += 1
+        logger.info(f"Restored session {session_id}: {len(self.histories[session_id])} messages, "
+                    f"{len(self.tool_results.get(session_id, {}))} tool results")
+        return True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get history statistics.
+        
+        Returns:
+            Counters for folded messages, summaries, tool result digests and restores.
+        """
+        return {
+            **self.stats,
+            "sessions": len(self.histories),
+            "pending_summaries": len(self._summary_tasks)
+        }
+    
+    def _enforce_limits(self, session_id: str, folded: List[Mapping[str, Any]]) -> None:
+        """
+        Fold the oldest messages out of a history that exceeds its token budget.
+        
+        The message count is bounded by the session's deque; the newest message
+        is always kept.
+        
+        Args:
+            session_id: Unique identifier for the conversation session.
+            folded: Messages already removed from the history, oldest first.
+        """
+        history = self.histories[session_id]
+        while len(history) > 1 and self.history_tokens[session_id] > self.max_history_tokens:
+            message = history.popleft()
+            self.history_tokens[session_id] -= message_tokens(message)
+            folded.append(message)
+        
+        if folded:
+            self._fold(session_id, folded, self.history_tokens[session_id])
+    
+    def _fold(self, session_id: str, messages: List[Mapping[str, Any]], remaining_tokens: int) -> None:
+        """
+        Move messages into the session's running summary.
+        
+        With a summarizer and a running event loop the summary is updated in a
+        background task; otherwise a short extractive summary is built at once.
+        
+        Args:
+            session_id: Unique identifier for the conversation session.
+            messages: Messages removed from the history, oldest first.
+            remaining_tokens: Estimated tokens left in the history.
+        """
+        folded_tokens = sum(message_tokens(message) for message in messages)
+        self.stats["folded_messages"] += len(messages)
+        self.stats["folded_tokens"] += folded_tokens
+        logger.info(f"Folded {len(messages)} messages (~{folded_tokens} tokens) out of session {session_id}; "
+                    f"history now ~{remaining_tokens} tokens")
+        
+        self._pending_folds.setdefault(session_id, []).extend(messages)
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        
+        if self.summarizer is not None and loop is not None:
+            if session_id not in self._summary_tasks:
+                self._summary_tasks[session_id] = loop.create_task(self._summarize_pending(session_id))
+        else:
+            pending = self._pending_folds.pop(session_id)
+            self._apply_summary(session_id, self._extractive_summary(self.summaries.get(session_id, ""), pending), pending)
+    
+    async def _summarize_pending(self, session_id: str) -> None:
+        """
+        Fold pending messages into the summary with the summarizer until none are left.
+        
+        Args:
+            session_id: Unique identifier for the conversation session.
+        """
+        try:
+            while self._pending_folds.get(session_id):
+                pending = self._pending_folds.pop(session_id)
+                previous = self.summaries.get(session_id, "")
+                try:
+                    summary = await self.summarizer(previous, pending)
+                except Exception as e:
+                    logger.warning(f"Summarizing history for session {session_id} failed, using extractive summary: {e}")
+                    self.stats["summary_failures"] += 1
+                    summary = ""
+                if not summary:
+                    summary = self._extractive_summary(previous, pending)
+                
+                # The session may have been cleared while the summary was generated
+                if session_id in self.histories:
+                    self._apply_summary(session_id, summary, pending)
+        finally:
+            self._summary_tasks.pop(session_id, None)
+    
+    def _apply_summary(self, session_id: str, summary: str, folded: List[Mapping[str, Any]]) -> None:
+        """Store a session's new summary, trimmed to the summary budget."""
+        max_chars = self.summary_max_tokens * CHARS_PER_TOKEN
+        if len(summary) > max_chars:
+            summary = summary[-max_chars:]
+        self.summaries[session_id] = summary
+        self.stats["summaries"] += 1
+        
+        folded_tokens = sum(message_tokens(message) for message in folded)
+        logger.info(f"Updated summary for session {session_id}: ~{estimate_tokens(summary)} tokens "
+                    f"now stand in for {len(folded)} more folded messages (~{folded_tokens} tokens)")
+    
+    def _extractive_summary(self, previous: str, messages: List[Mapping[str, Any]]) -> str:
+        """
+        Build a summary from the first line of each folded message.
+        
+        Args:
+            previous: The current summary.
+            messages: Messages to add to it.
+            
+        Returns:
+            The summary, keeping the most recent lines within the summary budget.
+        """
+        lines = [line for line in previous.splitlines() if line]
+        for message in messages:
+            content = str(message.get("content", "")).strip().splitlines()
+            if content:
+                lines.append(f"- {message.get('role', 'user')}: {content[0][:160]}")
+        
+        max_chars = self.summary_max_tokens * CHARS_PER_TOKEN
+        while lines and len("\n".join(lines)) > max_chars:
+            lines.pop(0)
+        return "\n".join(lines)
     
     def clear_history(self, session_id: str) -> bool:
         """
@@ -117,35 +557,34 @@ class ChatHistory:
         Returns:
             True if history was cleared, False if session not found.
         """
+        self._restorable.pop(session_id, None)
         if session_id in self.histories:
-            del self.histories[session_id]
-            if session_id in self.session_timestamps:
-                del self.session_timestamps[session_id]
+            self._drop_session(session_id)
             return True
         return False
     
+    def _drop_session(self, session_id: str) -> None:
+        """Remove all state held for a session."""
+        self.histories.pop(session_id, None)
+        self.system_prompts.pop(session_id, None)
+        self.history_tokens.pop(session_id, None)
+        self.session_timestamps.pop(session_id, None)
+        self.summaries.pop(session_id, None)
+        self.tool_results.pop(session_id, None)
+        self._pending_folds.pop(session_id, None)
+        task = self._summary_tasks.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+    
     def _prune_old_sessions(self) -> None:
         """
-        Remove the oldest sessions when the number of sessions exceeds the maximum.
+        Remove the least recently used sessions when the number of sessions exceeds the maximum.
         """
-        if len(self.histories) <= self.max_sessions:
-            return
-        
-        # Sort sessions by timestamp (oldest first)
-        sorted_sessions = sorted(
-            self.session_timestamps.items(),
-            key=lambda x: x[1]
-        )
-        
-        # Remove oldest sessions until we're under the limit
-        sessions_to_remove = len(self.histories) - self.max_sessions
-        for i in range(sessions_to_remove):
-            if i < len(sorted_sessions):
-                session_id = sorted_sessions[i][0]
-                if session_id in self.histories:
-                    del self.histories[session_id]
-                if session_id in self.session_timestamps:
-                    del self.session_timestamps[session_id]
+        while len(self.histories) > self.max_sessions:
+            # The first entry is the least recently used session
+            oldest = next(iter(self.histories))
+            self._drop_session(oldest)
+            self.stats["evicted_sessions"] += 1
     
     def set_system_prompt(self, prompt: str) -> None:
         """
@@ -170,23 +609,36 @@ class ChatHistory:
         if session_id not in self.histories:
             return False
         
-        # Find and update system message if it exists
-        for i, message in enumerate(self.histories[session_id]):
-            if message["role"] == "system":
-                self.histories[session_id][i]["content"] = prompt
-                return True
-        
-        # Add system message if it doesn't exist
-        self.histories[session_id].insert(0, {
-            "role": "system",
-            "content": prompt
-        })
+        self.system_prompts[session_id] = prompt
         return True
 
 
-# Create a singleton instance
-chat_history = ChatHistory()
+# Singleton instance
+_chat_history = None
+
 
 def get_chat_history() -> ChatHistory:
-    """Get the chat history manager instance."""
-    return chat_history 
\ No newline at end of file
+    """
+    Get the chat history manager instance.
+    
+    Limits are read from model.history in server_config.yaml on first use.
+    """
+    global _chat_history
+    
+    if _chat_history is None:
+        try:
+            history_config = get_config().get_model_config().get("history", {}) or {}
+        except Exception as e:
+            logger.warning(f"Could not load chat history configuration, using defaults: {e}")
+            history_config = {}
+        
+        _chat_history = ChatHistory(
+            max_history_length=history_config.get("max_messages", 20),
+            max_sessions=history_config.get("max_sessions", 1000),
+            max_history_tokens=history_config.get("max_tokens", 3000),
+            summary_max_tokens=history_config.get("summary_max_tokens", 300),
+            tool_digest_chars=history_config.get("tool_digest_chars", 800),
+            max_tool_results=history_config.get("max_tool_results", 10)
+        )
+    
+    return _chat_history 
\ No newline at end of file
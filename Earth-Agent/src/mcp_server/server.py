@@ -6,12 +6,15 @@ allowing the agent to expose tools to LLMs and handle tool calls.
 """
 
 import asyncio
+import copy
 import json
 import logging
+import tempfile
 import time
-from typing import Dict, Any, List, Callable, Optional, Union, Tuple
+from pathlib import Path
+from typing import Dict, Any, List, Callable, Awaitable, Optional, Union, Tuple, Set
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
@@ -19,7 +22,9 @@ from ..config import get_config
 from ..gemini.client import get_gemini_client
 from ..gemini.memory import get_chat_history
 from .tools import get_all_tools, get_tool_schemas
+from .tool_router import KeywordToolRouter
 from ..tools.climate_analysis import climate_analysis_tools
+from ..data_sources.openweathermap_connector import get_openweathermap_client
 from ..tools.resilience_planning import resilience_planning_tools
 from ..utils import (
     get_connection_manager,
@@ -27,16 +32,85 @@ from ..utils import (
     get_tool_call_rate_limiter,
     get_input_validator,
     get_tool_executor,
+    get_session_snapshot_store,
     get_cache,
+    get_async_cache,
     QueryMessage,
     ToolCallMessage,
     ClearHistoryMessage,
+    FetchResultMessage,
     schedule_cache_maintenance
 )
+from ..utils.wire_format import JSON, negotiate_encoding, decode_message
+from ..utils.result_projection import (
+    project_tool_result,
+    serialized_size,
+    DEFAULT_MAX_CHARS,
+    DEFAULT_MAX_LIST_ITEMS,
+    DEFAULT_MAX_STRING_CHARS
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+class StreamEmitter:
+    """
+    Sends the intermediate messages of one streamed request.
+    
+    Text arrives as response_chunk messages and tool runs as tool_progress
+    messages; the final response is sent by the caller as usual. The time
+    from the start of the request to the first chunk is logged as the
+    time-to-first-token.
+    """
+
+    def __init__(self, session_id: str, send: Callable[[Dict[str, Any]], Awaitable[None]]):
+        """
+        Initialize the emitter.
+        
+        Args:
+            session_id: Client session ID
+            send: Coroutine that sends a message to the client
+        """
+        self.session_id = session_id
+        self.send = send
+        self.started_at = time.monotonic()
+        self.first_chunk_at: Optional[float] = None
+        self.chunks = 0
+
+    async def chunk(self, text: str) -> None:
+        """Send a piece of response text."""
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.monotonic()
+            logger.info(f"Time to first token for session {self.session_id}: "
+                        f"{self.first_chunk_at - self.started_at:.3f}s")
+        self.chunks += 1
+        await self.send({
+            "type": "response_chunk",
+            "content": text,
+            "session_id": self.session_id
+        })
+
+    async def tool_progress(self, index: int, tool_name: str, status: str, **details: Any) -> None:
+        """Send a tool status change (started, completed or failed)."""
+        await self.send({
+            "type": "tool_progress",
+            "index": index,
+            "tool_name": tool_name,
+            "status": status,
+            "elapsed": round(time.monotonic() - self.started_at, 3),
+            "session_id": self.session_id,
+            **details
+        })
+
+    def finish(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Mark the final message and log the stream's timings."""
+        message["streamed"] = self.chunks > 0
+        ttft = f"{self.first_chunk_at - self.started_at:.3f}s" if self.first_chunk_at else "n/a"
+        logger.info(f"Streamed response for session {self.session_id}: {self.chunks} chunks, "
+                    f"TTFT {ttft}, total {time.monotonic() - self.started_at:.3f}s")
+        return message
+
+
 class MCPServer:
     """Model Context Protocol server implementation."""
 
@@ -58,6 +132,18 @@ class MCPServer:
         self.port = server_config.get("port", 8080)
         self.debug = server_config.get("debug", False)
         
+        # Per-connection request handling
+        websocket_config = server_config.get("websocket", {}) or {}
+        self.max_in_flight_per_session = max(1, websocket_config.get("max_in_flight_per_session", 4))
+        self.max_queued_messages = max(1, websocket_config.get("max_queued_messages", 16))
+        self.per_message_deflate = websocket_config.get("per_message_deflate", True)
+        # Tool results larger than this are sent by reference to clients that fetch them
+        self.max_inline_result_bytes = websocket_config.get("max_inline_result_bytes", 32 * 1024)
+        # Sessions whose client connected with result_refs=true
+        self._result_ref_sessions: Set[str] = set()
+        # Set when a session's connection closes, cancelling its outstanding tool calls
+        self._disconnect_events: Dict[str, asyncio.Event] = {}
+        
         # Initialize FastAPI app
         self.app = FastAPI(title=f"{name} MCP Server", 
                           docs_url="/api/docs",
@@ -89,9 +175,20 @@ class MCPServer:
         # Initialize tool executor with tools
         self.tool_executor = get_tool_executor(self.tools)
         
+        # Gemini tool declarations, built on first use and rebuilt after register_tool
+        self._gemini_tool_declarations: Optional[Dict[str, Dict[str, Any]]] = None
+        self._tool_router: Optional[KeywordToolRouter] = None
+        
         # Get service instances
         self.connection_manager = get_connection_manager()
         self.chat_history = get_chat_history()
+        history_config = self.config.get_model_config().get("history", {}) or {}
+        if history_config.get("summarize_with_model", True) and self.chat_history.summarizer is None:
+            self.chat_history.summarizer = self._summarize_history
+        # Resumed sessions are restored from the snapshot saved when they hibernated
+        self.session_snapshots = get_session_snapshot_store()
+        if self.chat_history.session_loader is None:
+            self.chat_history.session_loader = self.session_snapshots.load
         self.query_rate_limiter = get_query_rate_limiter()
         self.tool_call_rate_limiter = get_tool_call_rate_limiter()
         self.validator = get_input_validator()
@@ -119,6 +216,47 @@ class MCPServer:
         async def health_check():
             return {"status": "healthy", "timestamp": time.time()}
         
+        # Release the pooled OpenWeatherMap connections instead of leaving them to exit
+        @self.app.on_event("shutdown")
+        async def close_data_sources():
+            await get_openweathermap_client().close()
+        
+        @self.app.get("/cache/stats")
+        async def cache_stats():
+            stats = get_cache().get_stats()
+            stats["async"] = get_async_cache().get_stats()
+            stats["tool_executor"] = self.tool_executor.get_stats()
+            return stats
+        
+        @self.app.get("/connections/stats")
+        async def connection_stats():
+            stats = self.connection_manager.get_stats()
+            stats["chat_history"] = self.chat_history.get_stats()
+            stats["session_snapshots"] = self.session_snapshots.get_stats()
+            return stats
+        
+        # Results are only served with the session's token from session_info
+        @self.app.get("/results/{session_id}/{ref}")
+        async def get_tool_result(session_id: str, ref: str, token: Optional[str] = None):
+            self._check_session_token(session_id, token)
+            entry = self.chat_history.get_tool_result(session_id, ref)
+            if entry is None:
+                raise HTTPException(status_code=404, detail="Result not found")
+            return {"ref": ref, "tool_name": entry["tool_name"], "result": entry["result"]}
+        
+        @self.app.get("/results/{session_id}/{ref}/file")
+        async def get_tool_result_file(session_id: str, ref: str, token: Optional[str] = None):
+            self._check_session_token(session_id, token)
+            entry = self.chat_history.get_tool_result(session_id, ref)
+            file_path = entry["result"].get("file_path") if entry and isinstance(entry["result"], dict) else None
+            # Only files the visualization tools wrote to the temporary directory are served
+            if not file_path:
+                raise HTTPException(status_code=404, detail="Result has no file")
+            path = Path(file_path).resolve()
+            if Path(tempfile.gettempdir()).resolve() not in path.parents or not path.is_file():
+                raise HTTPException(status_code=404, detail="File not found")
+            return FileResponse(path)
+        
         @self.app.get("/tools")
         async def get_tools():
             tool_list = []
@@ -132,42 +270,50 @@ class MCPServer:
         
         @self.app.websocket("/ws")
         async def websocket_endpoint(websocket: WebSocket):
+            # A client can resume its previous session with /ws?session_id=...&resume_token=...,
+            # ask for MessagePack binary frames with /ws?encoding=msgpack, and opt in to
+            # chunked large messages (chunked=true) and large tool results sent by reference
+            # (result_refs=true); other clients get every message whole
+            requested_session = websocket.query_params.get("session_id")
+            resume_token = websocket.query_params.get("resume_token")
+            encoding = negotiate_encoding(websocket.query_params.get("encoding"))
+            chunked = self._query_flag(websocket, "chunked")
+            
             # Connect and get session ID
             try:
-                session_id = await self.connection_manager.connect(websocket)
+                session_id = await self.connection_manager.connect(
+                    websocket, requested_session, encoding, resume_token=resume_token, chunked=chunked
+                )
             except ValueError as e:
                 logger.warning(f"Connection rejected: {e}")
                 return
             
+            if self._query_flag(websocket, "result_refs"):
+                self._result_ref_sessions.add(session_id)
+            else:
+                self._result_ref_sessions.discard(session_id)
+            
+            # The session's history is loaded when its first message needs it
+            resumed = session_id == requested_session
+            if resumed:
+                self.chat_history.mark_restorable(session_id)
+            
             try:
                 # Send session info to client
-                await websocket.send_json({
+                await self.connection_manager.send_json(session_id, {
                     "type": "session_info",
-                    "session_id": session_id
+                    "session_id": session_id,
+                    "resumed": resumed,
+                    "resume_token": self.connection_manager.token_signer.issue(session_id),
+                    "encoding": encoding
                 })
                 
                 # Handle messages
-                while True:
-                    # Receive message
-                    data = await websocket.receive_json()
-                    
-                    # Add session_id to the message if not provided
-                    if "session_id" not in data:
-                        data["session_id"] = session_id
-                    
-                    # Update activity timestamp in session 
-                    self.connection_manager.update_activity(session_id)
-                    
-                    # Process the message
-                    response = await self._handle_websocket_message(data)
-                    
-                    # Log response before sending
-                    logger.debug(f"Sending response back via WebSocket: {response}")
-                    await websocket.send_json(response)
+                await self._serve_websocket(websocket, session_id, encoding)
             
             except WebSocketDisconnect:
                 logger.info(f"Client disconnected: {session_id}")
-                await self.connection_manager.disconnect(session_id)
+                await self._hibernate_session(session_id)
             
             except Exception as e:
                 logger.error(f"Error in WebSocket connection: {e}")
@@ -175,20 +321,173 @@ class MCPServer:
                     await websocket.close(code=1011, reason=f"Internal server error: {str(e)[:50]}")
                 except:
                     pass
-                await self.connection_manager.disconnect(session_id)
+                await self._hibernate_session(session_id)
+    
+    @staticmethod
+    def _query_flag(websocket: WebSocket, name: str) -> bool:
+        """Read a boolean query parameter of a WebSocket connection."""
+        return (websocket.query_params.get(name) or "").lower() in ("1", "true", "yes")
+    
+    def _check_session_token(self, session_id: str, token: Optional[str]) -> None:
+        """Reject an HTTP request that does not carry the session's token."""
+        if not self.connection_manager.token_signer.verify(session_id, token):
+            raise HTTPException(status_code=403, detail="Invalid session token")
+    
+    async def _hibernate_session(self, session_id: str) -> None:
+        """
+        Hibernate a disconnected session and save a snapshot of its state.
+        
+        Args:
+            session_id: The session ID of the closed connection.
+        """
+        await self.connection_manager.disconnect(session_id)
+        self._result_ref_sessions.discard(session_id)
+        try:
+            await self.session_snapshots.save(session_id, self.chat_history.export_session(session_id))
+        except Exception as e:
+            logger.error(f"Could not save snapshot of session {session_id}: {e}")
+    
+    async def _serve_websocket(self, websocket: WebSocket, session_id: str, encoding: str = JSON) -> None:
+        """
+        Read and process messages from one connection until it closes.
+        
+        This coroutine is the connection's reader: it feeds a bounded queue
+        that a fixed number of workers drain, so a slow request does not hold
+        up the messages behind it. When the queue is full the reader stops
+        receiving, which pushes back on the client through the socket.
+        
+        Args:
+            websocket: The accepted WebSocket connection.
+            session_id: Session ID assigned to the connection.
+            encoding: Wire format negotiated for the connection. JSON connections
+                      send text frames; others may also send MessagePack binary frames.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queued_messages)
+        disconnected = self._disconnect_events[session_id] = asyncio.Event()
+        send_lock = asyncio.Lock()
+        request_counter = 0
+        managed = self.connection_manager.is_connected(session_id)
+        
+        async def send(message: Dict[str, Any]) -> None:
+            if managed:
+                # Registered connections are written by their own writer task
+                await self.connection_manager.send_json(session_id, message)
+                return
+            # Workers share the socket; keep their frames whole
+            async with send_lock:
+                await websocket.send_json(message)
+        
+        async def worker() -> None:
+            while True:
+                data = await queue.get()
+                try:
+                    await self._process_websocket_request(data, send)
+                except Exception as e:
+                    logger.error(f"Error sending response for request {data.get('request_id')}: {e}")
+                finally:
+                    queue.task_done()
+        
+        workers = [asyncio.create_task(worker()) for _ in range(self.max_in_flight_per_session)]
+        try:
+            while True:
+                # Receive message
+                data = await (websocket.receive_json() if encoding == JSON else self._receive_message(websocket))
+                if not isinstance(data, dict):
+                    await send(self._format_error_response(session_id, "Messages must be JSON objects"))
+                    continue
+                
+                # Messages always act on the connection's own session; add a request id if not provided
+                request_counter += 1
+                data["session_id"] = session_id
+                data.setdefault("request_id", request_counter)
+                
+                # Update activity timestamp in session 
+                self.connection_manager.update_activity(session_id)
+                
+                if queue.full():
+                    logger.warning(f"Request queue full for session {session_id}, "
+                                   f"pausing reads until a request completes")
+                await queue.put(data)
+        finally:
+            # Tool calls stop on the disconnect event; cancelling the workers cancels everything else
+            disconnected.set()
+            if self._disconnect_events.get(session_id) is disconnected:
+                del self._disconnect_events[session_id]
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
     
-    async def _handle_websocket_message(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _receive_message(self, websocket: WebSocket) -> Any:
+        """
+        Receive a message sent as a JSON text frame or a MessagePack binary frame.
+        
+        Args:
+            websocket: The WebSocket connection.
+            
+        Returns:
+            The decoded message.
+        """
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+        if message.get("bytes") is not None:
+            return decode_message(message["bytes"])
+        return decode_message(message["text"])
+    
+    async def _process_websocket_request(self,
+                                         data: Dict[str, Any],
+                                         send: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        """
+        Handle one queued message and send its response.
+        
+        Every message sent for the request, including streamed ones, carries
+        the request's request_id so the client can match responses to
+        requests that complete out of order.
+        
+        Args:
+            data: The message received from the client.
+            send: Coroutine that sends a message on the connection.
+        """
+        request_id = data.get("request_id")
+        
+        async def send_for_request(message: Dict[str, Any]) -> None:
+            message["request_id"] = request_id
+            await send(message)
+        
+        start_time = time.monotonic()
+        try:
+            response = await self._handle_websocket_message(data, send=send_for_request)
+        except Exception as e:
+            logger.error(f"Error processing request {request_id}: {e}")
+            response = self._format_error_response(data.get("session_id", "default"), str(e))
+        
+        # Log response before sending
+        logger.debug(f"Sending response back via WebSocket: {response}")
+        logger.info(f"Request {request_id} ({data.get('type')}) for session {data.get('session_id')} "
+                    f"completed in {time.monotonic() - start_time:.2f}s")
+        await send_for_request(response)
+    
+    async def _handle_websocket_message(self,
+                                        data: Dict[str, Any],
+                                        send: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+                                        ) -> Dict[str, Any]:
         """
         Handle a message received through the WebSocket connection.
 
         Args:
             data: The message received from the client.
+            send: Optional coroutine for sending intermediate messages. Queries and
+                  tool calls with "stream": true use it to stream response_chunk and
+                  tool_progress messages before the final response.
 
         Returns:
             Response message to send back to the client.
         """
         session_id = data.get("session_id", "default")
         
+        # Restore a resumed session before its history is read or changed
+        await self.chat_history.ensure_session(session_id)
+        
         # Determine message type and validate
         message_type = data.get("type")
         
@@ -199,7 +498,7 @@ class MCPServer:
                 return self._format_error_response(session_id, "Invalid query format")
             
             # Apply rate limiting
-            if not self.query_rate_limiter.can_request(session_id):
+            if not await self.query_rate_limiter.acquire(session_id):
                 logger.warning(f"Rate limit exceeded for session {session_id}")
                 return self._format_error_response(session_id, "Rate limit exceeded. Please try again later.")
             
@@ -208,158 +507,9 @@ class MCPServer:
             if not query:
                 return self._format_error_response(session_id, "No query provided")
             
-            try:
-                # Get the Gemini client
-                gemini_client = get_gemini_client()
-                
-                # Format tools for Gemini API
-                gemini_tools = self._prepare_tools_for_gemini()
-                
-                # Add the user's message to the chat history
-                self.chat_history.add_message(session_id, "user", query)
-                
-                # Get the conversation history for this session
-                conversation_history = self.chat_history.get_history(session_id)
-                
-                logger.info(f"Using chat history for session {session_id} with {len(conversation_history)} messages")
-                
-                # Generate response from Gemini using chat with history
-                llm_response = await gemini_client.chat(
-                    messages=conversation_history,
-                    tools=gemini_tools
-                )
-                logger.debug(f"LLM response received: {llm_response}")
-                
-                # Add the assistant's response to chat history
-                if llm_response.get("text"):
-                    self.chat_history.add_message(session_id, "assistant", llm_response.get("text"))
-                
-                # Check if the LLM requested a tool call
-                tool_calls = llm_response.get("tool_calls")
-                if tool_calls:
-                    # Currently handling only the first tool call if multiple are present
-                    # TODO: Extend to handle multiple sequential/parallel tool calls if needed
-                    tool_call = tool_calls[0]
-                    tool_name = tool_call.get("name")
-                    arguments = tool_call.get("arguments", {})
-                    
-                    logger.info(f"LLM requested tool call: {tool_name} with args: {arguments}")
-                    
-                    if tool_name in self.tools:
-                        try:
-                            # Execute the tool using the tool executor
-                            tool_result = await self.tool_executor.execute_tool(
-                                tool_name,
-                                arguments,
-                                use_cache=True
-                            )
-                            logger.info(f"Tool {tool_name} executed successfully.")
-                            
-                            # Check if the tool failed (returned an error)
-                            if isinstance(tool_result, dict) and "error" in tool_result:
-                                logger.warning(f"Tool {tool_name} returned an error: {tool_result['error']}")
-                                
-                                # Use Gemini fallback for tool execution failures
-                                # Focus on useful parameters rather than errors
-                                response_message = await self._handle_tool_failure(
-                                    session_id,
-                                    tool_name,
-                                    query,
-                                    arguments,
-                                    tool_result['error']
-                                )
-                                
-                                return response_message
-                            
-                            else:
-                                # Tool executed successfully without errors
-                                # Add the tool result to chat history
-                                tool_result_text = f"Tool '{tool_name}' result: {json.dumps(tool_result)}"
-                                self.chat_history.add_message(session_id, "assistant", tool_result_text)
-                                
-                                # Get AI analysis of the tool results
-                                analysis = await self._analyze_tool_result(session_id, tool_name, arguments, tool_result)
-                                logger.info(f"Generated analysis for {tool_name} results")
-                                
-                                # Send tool result and analysis back to client
-                                response_message = self._format_tool_response(
-                                    session_id,
-                                    tool_name,
-                                    arguments,
-                                    tool_result,
-                                    analysis,
-                                    False
-                                )
-                                
-                                return response_message
-                            
-                        except Exception as tool_e:
-                            logger.error(f"Error executing tool {tool_name}: {tool_e}")
-                            
-                            # Use Gemini fallback for tool execution exceptions
-                            response_message = await self._handle_tool_failure(
-                                session_id,
-                                tool_name,
-                                query,
-                                arguments,
-                                str(tool_e)
-                            )
-                            
-                            return response_message
-                    else:
-                        logger.warning(f"LLM requested unknown tool: {tool_name}")
-                        # Instead of returning an error, use Gemini fallback
-                        response_message = await self._handle_generic_query_fallback(
-                            session_id,
-                            query
-                        )
-                        
-                        return response_message
-                        
-                else:
-                    # No tool call, check if the response is empty or generic
-                    response_text = llm_response.get("text", "").strip().lower()
-                    generic_responses = [
-                        "i don't know", 
-                        "i don't have", 
-                        "no tool found", 
-                        "no data available",
-                        "i don't have access",
-                        "i cannot access",
-                        "i do not have the necessary",
-                        "there is no specific tool",
-                        "i'm unable to provide"
-                    ]
-                    
-                    is_generic_response = not response_text or any(phrase in response_text for phrase in generic_responses)
-                    
-                    if is_generic_response:
-                        # Use Gemini fallback for generic responses
-                        response_message = await self._handle_generic_query_fallback(
-                            session_id,
-                            query
-                        )
-                        
-                        return response_message
-                    else:
-                        # Regular non-empty, non-generic response
-                        response_message = {
-                            "type": "response",
-                            "query": query,
-                            "response": llm_response.get("text", ""),
-                            "session_id": session_id
-                        }
-                        
-                        # Log response before sending
-                        logger.debug(f"Sending response back via WebSocket: {response_message}")
-                        return response_message
-
-            except asyncio.TimeoutError:
-                logger.error(f"Request timed out for session {session_id}")
-                return self._format_error_response(session_id, "Request timed out. Please try again.")
-            except Exception as e:
-                logger.error(f"Error processing query: {e}")
-                return self._format_error_response(session_id, str(e))
+            emitter = StreamEmitter(session_id, send) if data.get("stream") and send is not None else None
+            response_message = await self._process_query(session_id, query, emitter)
+            return emitter.finish(response_message) if emitter else response_message
                 
         elif message_type == "clear_history":
             # Validate clear history message format
@@ -367,8 +517,9 @@ class MCPServer:
             if not validated_data:
                 return self._format_error_response(session_id, "Invalid clear_history format")
             
-            # Clear chat history from memory
+            # Clear chat history from memory, and its snapshot so a reconnect does not bring it back
             success = self.chat_history.clear_history(session_id)
+            await self.session_snapshots.delete(session_id)
             
             return {
                 "type": "history_cleared", 
@@ -376,6 +527,25 @@ class MCPServer:
                 "session_id": session_id
             }
 
+        elif message_type == "fetch_result":
+            # Validate fetch result message format
+            validated_data = self.validator.validate_model(data, FetchResultMessage)
+            if not validated_data:
+                return self._format_error_response(session_id, "Invalid fetch_result format")
+            
+            # Full result of a response that only carried its reference
+            entry = self.chat_history.get_tool_result(session_id, data["ref"])
+            if entry is None:
+                return self._format_error_response(session_id, f"Result not found: {data['ref']}")
+            
+            return {
+                "type": "tool_result",
+                "ref": data["ref"],
+                "tool_name": entry["tool_name"],
+                "result": entry["result"],
+                "session_id": session_id
+            }
+
         elif message_type == "tool_call":
             # Validate tool call message format
             validated_data = self.validator.validate_model(data, ToolCallMessage)
@@ -383,7 +553,7 @@ class MCPServer:
                 return self._format_error_response(session_id, "Invalid tool_call format")
             
             # Apply rate limiting
-            if not self.tool_call_rate_limiter.can_request(session_id):
+            if not await self.tool_call_rate_limiter.acquire(session_id):
                 logger.warning(f"Tool call rate limit exceeded for session {session_id}")
                 return self._format_error_response(session_id, "Rate limit exceeded for tool calls. Please try again later.")
             
@@ -396,16 +566,27 @@ class MCPServer:
             if tool_name not in self.tools:
                 return self._format_error_response(session_id, f"Tool not found: {tool_name}")
             
+            emitter = StreamEmitter(session_id, send) if data.get("stream") and send is not None else None
+            # Stands in for the query when the Gemini fallback answers a failed call
+            tool_call_text = f"Tool call: {tool_name} with arguments: {json.dumps(arguments)}"
+            
             try:
+                if emitter:
+                    await emitter.tool_progress(0, tool_name, "started", arguments=arguments)
+                
                 # Execute the tool using the tool executor
                 tool_result = await self.tool_executor.execute_tool(
                     tool_name,
                     arguments,
                     use_cache=True
                 )
+                tool_failed = isinstance(tool_result, dict) and "error" in tool_result
+                
+                if emitter:
+                    await emitter.tool_progress(0, tool_name, "failed" if tool_failed else "completed")
                 
                 # Check if the tool failed (returned an error)
-                if isinstance(tool_result, dict) and "error" in tool_result:
+                if tool_failed:
                     logger.warning(f"Direct tool call {tool_name} returned an error: {tool_result['error']}")
                     
                     # Use Gemini fallback for tool execution failures
@@ -413,32 +594,32 @@ class MCPServer:
                     response_message = await self._handle_tool_failure(
                         session_id,
                         tool_name,
-                        query,
+                        tool_call_text,
                         arguments,
                         tool_result['error']
                     )
                     
                     return response_message
                 
-                # Add tool call and result to history
-                tool_call_text = f"Tool call: {tool_name} with arguments: {json.dumps(arguments)}"
+                # Add tool call to history
                 self.chat_history.add_message(session_id, "user", tool_call_text)
-                
-                tool_result_text = f"Tool result: {json.dumps(tool_result)}"
-                self.chat_history.add_message(session_id, "assistant", tool_result_text)
+                request_history = list(self.chat_history.get_history(session_id))
                 
                 # Get AI analysis of the tool results
-                analysis = await self._analyze_tool_result(session_id, tool_name, arguments, tool_result)
+                call = {"tool_name": tool_name, "arguments": arguments, "result": tool_result}
+                analysis = await self._analyze_tool_results(session_id, request_history, [call], emitter)
                 logger.info(f"Generated analysis for direct {tool_name} call results")
                 
-                return self._format_tool_response(
+                response_message = self._format_tool_response(
                     session_id,
                     tool_name,
                     arguments,
                     tool_result,
                     analysis,
-                    False
+                    False,
+                    result_ref=call.get("ref")
                 )
+                return emitter.finish(response_message) if emitter else response_message
             except Exception as e:
                 logger.error(f"Error calling tool {tool_name}: {e}")
                 
@@ -446,7 +627,7 @@ class MCPServer:
                 response_message = await self._handle_tool_failure(
                     session_id,
                     tool_name,
-                    query,
+                    tool_call_text,
                     arguments,
                     str(e)
                 )
@@ -456,20 +637,178 @@ class MCPServer:
         else:
             return {"error": f"Unknown message type: {message_type}", "session_id": session_id}
     
-    def _prepare_tools_for_gemini(self) -> List[Dict[str, Any]]:
+    async def _chat_with_model(self,
+                               messages: List[Dict[str, Any]],
+                               tools: Optional[List[Dict[str, Any]]] = None,
+                               emitter: Optional["StreamEmitter"] = None) -> Dict[str, Any]:
         """
-        Format tools for the Gemini API.
+        Get a chat response from Gemini, streaming its text when an emitter is given.
+        
+        Args:
+            messages: Messages to send to the model
+            tools: Optional tool declarations
+            emitter: Optional emitter that forwards text chunks to the client
+            
+        Returns:
+            Response dict with 'text' and 'tool_calls'
+        """
+        gemini_client = get_gemini_client()
+        if emitter is None:
+            return await gemini_client.chat(messages=messages, tools=tools)
+        
+        response = {"text": "", "tool_calls": []}
+        async for event in gemini_client.chat_stream(messages=messages, tools=tools):
+            if event.get("done"):
+                response = event["response"]
+            else:
+                await emitter.chunk(event["text"])
+        return response
+
+    async def _process_query(self,
+                             session_id: str,
+                             query: str,
+                             emitter: Optional["StreamEmitter"] = None) -> Dict[str, Any]:
+        """
+        Answer a user query, running any tools the model requests.
+        
+        Args:
+            session_id: Client session ID
+            query: The user's query
+            emitter: Optional emitter that streams text and tool progress to the client
+            
+        Returns:
+            Final response message for the client
+        """
+        try:
+            # Format tools for Gemini API
+            gemini_tools = self._prepare_tools_for_gemini(query)
+            
+            # Add the user's message to the chat history
+            self.chat_history.add_message(session_id, "user", query)
+            
+            # Get the conversation history for this session
+            conversation_history = self.chat_history.get_history(session_id)
+            
+            logger.info(f"Using chat history for session {session_id} with {len(conversation_history)} messages")
+            # The turn as sent to the model, for continuing it with function responses
+            request_history = list(conversation_history)
+            
+            # Generate response from Gemini using chat with history
+            llm_response = await self._chat_with_model(
+                conversation_history,
+                tools=gemini_tools,
+                emitter=emitter
+            )
+            logger.debug(f"LLM response received: {llm_response}")
+            
+            # Add the assistant's response to chat history
+            if llm_response.get("text"):
+                self.chat_history.add_message(session_id, "assistant", llm_response.get("text"))
+            
+            # Check if the LLM requested any tool calls
+            tool_calls = llm_response.get("tool_calls")
+            if tool_calls:
+                known_calls = []
+                for tool_call in tool_calls:
+                    tool_name = tool_call.get("name")
+                    if tool_name in self.tools:
+                        logger.info(f"LLM requested tool call: {tool_name} with args: {tool_call.get('arguments', {})}")
+                        known_calls.append(tool_call)
+                    else:
+                        logger.warning(f"LLM requested unknown tool: {tool_name}")
+                
+                if not known_calls:
+                    # Instead of returning an error, use Gemini fallback
+                    response_message = await self._handle_generic_query_fallback(
+                        session_id,
+                        query
+                    )
+                    
+                    return response_message
+                
+                return await self._handle_tool_calls(session_id, query, known_calls, request_history, emitter)
+                    
+            else:
+                # No tool call, check if the response is empty or generic
+                response_text = llm_response.get("text", "").strip().lower()
+                generic_responses = [
+                    "i don't know", 
+                    "i don't have", 
+                    "no tool found", 
+                    "no data available",
+                    "i don't have access",
+                    "i cannot access",
+                    "i do not have the necessary",
+                    "there is no specific tool",
+                    "i'm unable to provide"
+                ]
+                
+                is_generic_response = not response_text or any(phrase in response_text for phrase in generic_responses)
+                
+                if is_generic_response:
+                    # Use Gemini fallback for generic responses
+                    response_message = await self._handle_generic_query_fallback(
+                        session_id,
+                        query
+                    )
+                    
+                    return response_message
+                else:
+                    # Regular non-empty, non-generic response
+                    response_message = {
+                        "type": "response",
+                        "query": query,
+                        "response": llm_response.get("text", ""),
+                        "session_id": session_id
+                    }
+                    
+                    # Log response before sending
+                    logger.debug(f"Sending response back via WebSocket: {response_message}")
+                    return response_message
+
+        except asyncio.TimeoutError:
+            logger.error(f"Request timed out for session {session_id}")
+            return self._format_error_response(session_id, "Request timed out. Please try again.")
+        except Exception as e:
+            logger.error(f"Error processing query: {e}")
+            return self._format_error_response(session_id, str(e))
+
+    def _prepare_tools_for_gemini(self, query: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get the tools to offer Gemini for a query.
+        
+        Declarations come from a cache built once per tool set. When routing is
+        enabled and a query is given, only the tools the router picks for it
+        are returned.
+        
+        Args:
+            query: Optional user query used to choose a subset of tools.
         
         Returns:
             List of tool objects formatted for Gemini.
         """
-        gemini_tools = []
+        if self._gemini_tool_declarations is None:
+            self._build_gemini_tool_declarations()
+        declarations = self._gemini_tool_declarations
+        
+        if query and self._tool_router is not None:
+            selected = self._tool_router.route(query)
+            if selected is not None:
+                logger.info(f"Offering {len(selected)} of {len(declarations)} tools for query: {', '.join(selected)}")
+                return [declarations[name] for name in selected]
+        
+        return list(declarations.values())
+    
+    def _build_gemini_tool_declarations(self) -> None:
+        """Format every tool for the Gemini API and build the tool router."""
+        start_time = time.monotonic()
+        declarations = {}
         for name, tool in self.tools.items():
             # Get the parameters and sanitize them for Gemini API
-            parameters = self._sanitize_schema_for_gemini(tool.get("parameters", {}))
+            parameters = self._sanitize_schema_for_gemini(copy.deepcopy(tool.get("parameters", {})))
             
             # Only add required properties that Gemini API expects
-            gemini_tools.append({
+            declarations[name] = {
                 "function_declarations": [{
                     "name": name,
                     "description": tool.get("description", ""),
@@ -479,9 +818,21 @@ class MCPServer:
                         "required": parameters.get("required", [])
                     }
                 }]
-            })
+            }
+        self._gemini_tool_declarations = declarations
         
-        return gemini_tools
+        routing_config = self.tool_executor.tool_config.get("tool_routing", {}) or {}
+        if routing_config.get("enabled", True):
+            self._tool_router = KeywordToolRouter(
+                self.tools,
+                max_tools=routing_config.get("max_tools", 8),
+                always_include=routing_config.get("always_include", [])
+            )
+        else:
+            self._tool_router = None
+        
+        logger.info(f"Built Gemini declarations for {len(declarations)} tools "
+                    f"in {(time.monotonic() - start_time) * 1000:.1f}ms")
     
     def register_tool(self, 
                      name: str, 
@@ -503,6 +854,10 @@ class MCPServer:
             "parameters": parameters
         }
         
+        # Rebuild the Gemini declarations on next use
+        self._gemini_tool_declarations = None
+        self._tool_router = None
+        
         logger.info(f"Registered tool: {name}")
     
     async def run(self) -> None:
@@ -516,7 +871,8 @@ class MCPServer:
             host=self.host,
             port=self.port,
             log_level="debug" if self.debug else "info",
-            reload=self.debug
+            reload=self.debug,
+            ws_per_message_deflate=self.per_message_deflate
         )
         
         # Create server
@@ -559,59 +915,136 @@ class MCPServer:
             
         return sanitized
 
-    async def _analyze_tool_result(self, session_id: str, tool_name: str, arguments: Dict[str, Any], tool_result: Dict[str, Any]) -> str:
+    async def _handle_tool_calls(self,
+                                 session_id: str,
+                                 query: str,
+                                 tool_calls: List[Dict[str, Any]],
+                                 request_history: List[Dict[str, Any]],
+                                 emitter: Optional["StreamEmitter"] = None) -> Dict[str, Any]:
         """
-        Send tool results back to Gemini for further analysis.
+        Run every tool call from a model turn concurrently and answer with one analysis.
+        
+        Args:
+            session_id: Client session ID
+            query: Original query
+            tool_calls: Tool calls requested by the model, each with 'name' and 'arguments'
+            request_history: Messages the model was given when it requested the calls
+            emitter: Optional emitter that reports tool progress and streams the analysis
+            
+        Returns:
+            Response message for the client
+        """
+        calls = [(tool_call.get("name"), tool_call.get("arguments", {}) or {}) for tool_call in tool_calls]
+        
+        on_complete = None
+        if emitter:
+            for index, (tool_name, arguments) in enumerate(calls):
+                await emitter.tool_progress(index, tool_name, "started", arguments=arguments)
+            
+            async def on_complete(index: int, result: Dict[str, Any]) -> None:
+                failed = isinstance(result, dict) and "error" in result
+                await emitter.tool_progress(index, calls[index][0], "failed" if failed else "completed")
+        
+        results = await self.tool_executor.execute_parallel(
+            calls,
+            use_cache=True,
+            cancel_event=self._disconnect_events.get(session_id),
+            on_complete=on_complete
+        )
+        
+        executed = []
+        for index, (tool_name, arguments) in enumerate(calls):
+            tool_result = results.get(index, {"error": "Tool call did not complete"})
+            if isinstance(tool_result, dict) and "error" in tool_result:
+                logger.warning(f"Tool {tool_name} returned an error: {tool_result['error']}")
+            else:
+                logger.info(f"Tool {tool_name} executed successfully.")
+            executed.append({"tool_name": tool_name, "arguments": arguments, "result": tool_result})
+        
+        successful = [call for call in executed
+                      if not (isinstance(call["result"], dict) and "error" in call["result"])]
+        if not successful:
+            # Every tool failed; use Gemini fallback, focusing on the first call's parameters
+            first = executed[0]
+            return await self._handle_tool_failure(
+                session_id,
+                first["tool_name"],
+                query,
+                first["arguments"],
+                first["result"]["error"]
+            )
+        
+        # One follow-up model call covering all results
+        analysis = await self._analyze_tool_results(session_id, request_history, executed, emitter)
+        logger.info(f"Generated analysis for {len(executed)} tool results")
+        
+        primary = successful[0]
+        return self._format_tool_response(
+            session_id,
+            primary["tool_name"],
+            primary["arguments"],
+            primary["result"],
+            analysis,
+            False,
+            tool_calls=executed if len(executed) > 1 else None,
+            result_ref=primary.get("ref")
+        )
+
+    async def _analyze_tool_results(self,
+                                    session_id: str,
+                                    request_history: List[Dict[str, Any]],
+                                    executed: List[Dict[str, Any]],
+                                    emitter: Optional["StreamEmitter"] = None) -> str:
+        """
+        Continue the model turn with the results of its tool calls.
+        
+        The calls and their projected results are sent as function call and
+        function response turns after the messages the model was given, so the
+        model answers in the same conversation instead of re-reading a JSON dump.
         
         Args:
             session_id: Unique identifier for the conversation session.
-            tool_name: The name of the tool that was executed.
-            arguments: The arguments used to call the tool.
-            tool_result: The raw result returned by the tool.
+            request_history: Messages ending with the turn that led to the calls.
+            executed: Executed calls, each with 'tool_name', 'arguments' and 'result'.
+            emitter: Optional emitter that streams the analysis text to the client.
             
         Returns:
             A string containing the AI's analysis of the tool results.
         """
         try:
-            # Get the Gemini client
-            gemini_client = get_gemini_client()
-            
-            # Format the analysis prompt
-            analysis_prompt = f"""Based on the results of the tool '{tool_name}', provide a detailed analysis and insights.
+            limits = self.tool_executor.tool_config.get("result_projection", {}) or {}
+            conversation = list(request_history)
+            conversation.append({
+                "role": "assistant",
+                "tool_calls": [{"name": call["tool_name"], "arguments": call["arguments"]} for call in executed]
+            })
             
-Tool: {tool_name}
-Arguments: {json.dumps(arguments, indent=2)}
-Result: {json.dumps(tool_result, indent=2)}
-
-Please analyze this data and provide relevant insights, trends, and explanations. Focus on:
-1. Key findings and patterns in the data
-2. Any noteworthy observations 
-3. Contextual information to help understand the results
-4. Potential implications or recommendations
-
-Your analysis:"""
-
-            # Add this interaction to chat history as system message
-            self.chat_history.add_message(
-                session_id, 
-                "system", 
-                f"Request for analysis of {tool_name} results with arguments {arguments}"
-            )
+            raw_chars = 0
+            projected_chars = 0
+            for call in executed:
+                projected = project_tool_result(
+                    call["tool_name"],
+                    call["result"],
+                    max_chars=limits.get("max_chars", DEFAULT_MAX_CHARS),
+                    max_list_items=limits.get("max_list_items", DEFAULT_MAX_LIST_ITEMS),
+                    max_string_chars=limits.get("max_string_chars", DEFAULT_MAX_STRING_CHARS)
+                )
+                raw_chars += serialized_size(call["result"])
+                projected_chars += serialized_size(projected)
+                conversation.append({"role": "tool", "name": call["tool_name"], "content": projected})
+                
+                # Keep a digest in chat history for later turns, with the full result by reference
+                call["ref"] = self.chat_history.add_tool_result(session_id, call["tool_name"], call["result"])
             
-            # Get conversation history
-            conversation_history = self.chat_history.get_history(session_id)
-            # Add the analysis prompt as the most recent message
-            conversation_history.append({
-                "role": "user",
-                "content": analysis_prompt
-            })
+            tool_names = ", ".join(call["tool_name"] for call in executed)
+            logger.info(f"Sending {len(executed)} function responses ({tool_names}) to Gemini: "
+                        f"{projected_chars} chars after projection, {raw_chars} raw")
             
             # Generate analysis from Gemini
-            logger.info(f"Requesting analysis of {tool_name} results from Gemini")
-            analysis_response = await gemini_client.chat(
-                messages=conversation_history,
-                # No tools for the analysis to keep it focused
-            )
+            start_time = time.monotonic()
+            # No tools for the analysis to keep it focused
+            analysis_response = await self._chat_with_model(conversation, emitter=emitter)
+            logger.info(f"Function response turn for {tool_names} completed in {time.monotonic() - start_time:.2f}s")
             
             analysis_text = analysis_response.get("text", "I couldn't generate an analysis of these results.")
             
@@ -624,6 +1057,38 @@ Your analysis:"""
             logger.error(f"Error analyzing tool results: {e}")
             return f"Error generating analysis: {str(e)}"
 
+    async def _summarize_history(self, previous_summary: str, messages: List[Dict[str, Any]]) -> str:
+        """
+        Fold older conversation messages into a session's running summary.
+        
+        Called by the chat history in a background task, off the request path.
+        
+        Args:
+            previous_summary: The session's current summary, possibly empty.
+            messages: Messages that no longer fit in the history, oldest first.
+            
+        Returns:
+            The updated summary text.
+        """
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        summary_words = max(50, self.chat_history.summary_max_tokens * 3 // 4)
+        prompt = f"""Update the running summary of a conversation between a user and a GIS assistant.
+Keep places, dates, figures, tool results and open questions; drop greetings and filler.
+Reply with the updated summary only, in at most {summary_words} words.
+
+Current summary:
+{previous_summary or "(none)"}
+
+Messages to add:
+{transcript}"""
+        
+        response = await get_gemini_client().generate_text(
+            prompt,
+            temperature=0.2,
+            max_tokens=self.chat_history.summary_max_tokens
+        )
+        return response.get("text", "").strip()
+
     async def _handle_tool_failure(self, 
                                 session_id: str, 
                                 tool_name: str, 
@@ -744,10 +1209,18 @@ Your analysis:"""
                             arguments: Dict[str, Any], 
                             result: Dict[str, Any], 
                             analysis: str,
-                            is_fallback: bool = False) -> Dict[str, Any]:
+                            is_fallback: bool = False,
+                            tool_calls: Optional[List[Dict[str, Any]]] = None,
+                            result_ref: Optional[str] = None) -> Dict[str, Any]:
         """
         Format a tool response in a consistent structure.
         
+        For clients that connected with result_refs=true, results with a
+        reference that are larger than max_inline_result_bytes are replaced
+        by the reference, their size and a compact preview; the client
+        fetches the full result with a fetch_result message or from
+        /results/{session_id}/{ref}.
+        
         Args:
             session_id: Client session ID
             tool_name: Name of the tool used
@@ -755,6 +1228,10 @@ Your analysis:"""
             result: Result from the tool execution
             analysis: Analysis of the results
             is_fallback: Whether this is a fallback response
+            tool_calls: All calls of the turn when the model requested several,
+                        each with 'tool_name', 'arguments', 'result' and, once
+                        stored in chat history, 'ref'
+            result_ref: Chat history reference of the result, if stored
             
         Returns:
             Formatted response message
@@ -763,7 +1240,7 @@ Your analysis:"""
             "type": "tool_result_with_analysis",
             "tool_name": tool_name,
             "arguments": arguments,
-            "result": result if not is_fallback else {
+            "result": self._inline_or_reference(session_id, tool_name, result, result_ref) if not is_fallback else {
                 "success": True,
                 "message": f"Analysis data for {arguments.get('area', arguments.get('region', 'requested information'))}",
                 "fallback_used": True
@@ -771,11 +1248,40 @@ Your analysis:"""
             "analysis": analysis,
             "session_id": session_id
         }
+        if tool_calls:
+            message["tool_calls"] = [
+                {**call, "result": self._inline_or_reference(session_id, call["tool_name"], call["result"], call.get("ref"))}
+                for call in tool_calls
+            ]
         
         # Log response before sending
         logger.debug(f"Sending response back via WebSocket: {message}")
         return message
 
+    def _inline_or_reference(self, session_id: str, tool_name: str, result: Any, ref: Optional[str]) -> Any:
+        """
+        Return a tool result to include in a response, or a reference to it if it is large.
+        
+        Args:
+            session_id: Client session ID; only clients that opted in get references.
+            tool_name: Name of the tool that produced the result.
+            result: The full result.
+            ref: Chat history reference of the result, if stored.
+            
+        Returns:
+            The result, or a dict with 'result_ref', 'size' and 'preview'.
+        """
+        if ref is None or session_id not in self._result_ref_sessions:
+            return result
+        size = serialized_size(result)
+        if size <= self.max_inline_result_bytes:
+            return result
+        return {
+            "result_ref": ref,
+            "size": size,
+            "preview": project_tool_result(tool_name, result)
+        }
+    
     def _format_error_response(self, session_id: str, error_message: str) -> Dict[str, Any]:
         """
         Format an error response consistently.
@@ -0,0 +1,131 @@
+"""
+Tool routing for the GIS AI Agent's MCP server.
+
+This module picks the tools whose declarations are sent to the model for a
+query. Each tool is indexed by the words in its name, description and
+parameters; a query is scored against that index and only the best matching
+tools are offered, which keeps the prompt and the model's choice small.
+"""
+
+import re
+import math
+import logging
+from typing import Dict, Any, List, Optional, Set
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Words too common in tool descriptions to tell tools apart
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "for", "from", "get",
+    "how", "i", "in", "is", "it", "me", "of", "on", "or", "show", "specific",
+    "that", "the", "this", "to", "use", "what", "when", "where", "which", "with",
+    "you", "your", "data", "information", "location", "name", "type", "value"
+}
+
+_TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase, singularised words without stopwords.
+
+    Args:
+        text: Text to tokenize; underscores count as word breaks.
+
+    Returns:
+        List of tokens.
+    """
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower().replace("_", " ")):
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        if token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+class KeywordToolRouter:
+    """
+    Chooses a subset of tools for a query by keyword overlap.
+
+    Tool words are weighted by inverse document frequency, so words that
+    appear in one tool's declaration count for more than words shared by
+    many tools.
+    """
+
+    def __init__(self,
+                 tools: Dict[str, Dict[str, Any]],
+                 max_tools: int = 8,
+                 always_include: Optional[List[str]] = None):
+        """
+        Build the keyword index.
+
+        Args:
+            tools: Dictionary of tools with 'description' and 'parameters'.
+            max_tools: Maximum number of tools returned for a query.
+            always_include: Tool names offered with every query.
+        """
+        self.max_tools = max_tools
+        self.always_include = [name for name in (always_include or []) if name in tools]
+        self.keywords: Dict[str, Set[str]] = {
+            name: self._tool_keywords(name, tool) for name, tool in tools.items()
+        }
+
+        document_counts: Dict[str, int] = {}
+        for words in self.keywords.values():
+            for word in words:
+                document_counts[word] = document_counts.get(word, 0) + 1
+        tool_count = max(1, len(self.keywords))
+        self.weights = {
+            word: math.log(1 + tool_count / count) for word, count in document_counts.items()
+        }
+
+    def _tool_keywords(self, name: str, tool: Dict[str, Any]) -> Set[str]:
+        """Collect the words of a tool's name, description and parameter schema."""
+        parts = [name, tool.get("description", "")]
+        properties = (tool.get("parameters") or {}).get("properties", {}) or {}
+        for prop_name, prop_schema in properties.items():
+            parts.append(prop_name)
+            if isinstance(prop_schema, dict):
+                parts.append(str(prop_schema.get("description", "")))
+                parts.extend(str(value) for value in prop_schema.get("enum", []) or [])
+        return set(tokenize(" ".join(parts)))
+
+    def score(self, query: str) -> Dict[str, float]:
+        """
+        Score every tool against a query.
+
+        Args:
+            query: The user's query.
+
+        Returns:
+            Dictionary of tool name to score; tools without a matching word are omitted.
+        """
+        query_words = set(tokenize(query))
+        scores = {}
+        for name, words in self.keywords.items():
+            score = sum(self.weights[word] for word in query_words & words)
+            if score > 0:
+                scores[name] = score
+        return scores
+
+    def route(self, query: str) -> Optional[List[str]]:
+        """
+        Pick the tools to offer for a query.
+
+        Args:
+            query: The user's query.
+
+        Returns:
+            Tool names in order of relevance, or None when nothing matched and
+            every tool should be offered.
+        """
+        scores = self.score(query)
+        if not scores:
+            return None
+
+        ranked = sorted(scores, key=lambda name: scores[name], reverse=True)
+        selected = [name for name in self.always_include if name not in ranked]
+        selected.extend(ranked[:max(0, self.max_tools - len(selected))])
+        return selected
@@ -212,9 +212,11 @@ async def calculate_environmental_risk(arguments: Dict[str, Any]) -> Dict[str, A
             # For weather-related risks, use OpenWeatherMap
             owm_client = get_openweathermap_client()
             
-            # Get weather data to assess risk
-            weather_data = await owm_client.get_current_weather(area)
-            forecast_data = await owm_client.get_forecast(area, days=5)
+            # Get weather data to assess risk; both requests share one location lookup
+            weather_data, forecast_data = await asyncio.gather(
+                owm_client.get_current_weather(area),
+                owm_client.get_forecast(area, days=5)
+            )
             
             # This is a placeholder implementation since OpenWeatherMap
             # doesn't directly provide risk assessment
@@ -12,27 +12,34 @@ from typing import Dict, Any, Optional, List, Callable, TypeVar, Type, Union
 logger = logging.getLogger(__name__)
 
 # Import utilities
-from .cache import get_cache, schedule_cache_maintenance
+from .cache import get_cache, get_async_cache, schedule_cache_maintenance
 from .connection_manager import get_connection_manager
 from .security import (
     get_query_rate_limiter,
     get_tool_call_rate_limiter,
     get_input_validator,
+    get_session_token_signer,
     QueryMessage,
     ToolCallMessage,
-    ClearHistoryMessage
+    ClearHistoryMessage,
+    FetchResultMessage
 )
 from .tool_executor import get_tool_executor
+from .session_snapshots import get_session_snapshot_store
 
 __all__ = [
     "get_cache",
+    "get_async_cache",
     "get_connection_manager",
     "get_query_rate_limiter",
     "get_tool_call_rate_limiter",
     "get_input_validator",
+    "get_session_token_signer",
     "get_tool_executor",
+    "get_session_snapshot_store",
     "schedule_cache_maintenance",
     "QueryMessage",
     "ToolCallMessage",
-    "ClearHistoryMessage"
+    "ClearHistoryMessage",
+    "FetchResultMessage"
 ] 
\ No newline at end of file
@@ -9,26 +9,370 @@ import os
 import json
 import time
 import logging
+import queue
+import atexit
+import asyncio
+import sqlite3
 import hashlib
 import threading
-from typing import Dict, Any, Optional, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Tuple, List
 from pathlib import Path
 import functools
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Defaults for the in-memory tier, overridable in server_config.yaml (data.memory_cache)
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_MEMORY_SHARDS = 16
+
+# Rough per-entry bookkeeping cost (key string, tuple, OrderedDict node)
+ENTRY_OVERHEAD_BYTES = 200
+
+_MISSING = object()
+
+
+class _LRUShard:
+    """One shard of the memory tier: an LRU ordered dict with its own lock and byte budget."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self.current_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.expirations = 0
+        self.rejected = 0
+
+    def get(self, key: str, now: float) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            value, expiry, size = entry
+            if expiry <= now:
+                del self.entries[key]
+                self.current_bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return _MISSING
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, expiry: float, size: int) -> bool:
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+
+            if size > self.max_bytes:
+                # Would evict the whole shard; leave it to the disk tier
+                self.rejected += 1
+                return False
+
+            self.entries[key] = (value, expiry, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+                self.evicted_bytes += evicted_size
+            return True
+
+    def delete(self, key: str) -> bool:
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return False
+            self.current_bytes -= entry[2]
+            return True
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def clean_expired(self, now: float) -> int:
+        with self.lock:
+            expired = [key for key, (_, expiry, _) in self.entries.items() if expiry <= now]
+            for key in expired:
+                self.current_bytes -= self.entries.pop(key)[2]
+            self.expirations += len(expired)
+            return len(expired)
+
+
+class ShardedLRUCache:
+    """
+    Size-bounded in-memory LRU split into independently locked shards.
+
+    Keys are assigned to shards by hash, so concurrent gets and sets for
+    different keys rarely contend on the same lock. Each shard enforces an
+    equal share of the total byte budget and evicts least recently used
+    entries when it goes over.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_MEMORY_BYTES, num_shards: int = DEFAULT_MEMORY_SHARDS):
+        """
+        Initialize the memory tier.
+
+        Args:
+            max_bytes: Total byte budget across all shards.
+            num_shards: Number of independently locked shards.
+        """
+        self.num_shards = max(1, num_shards)
+        self.max_bytes = max_bytes
+        shard_bytes = max(1, max_bytes // self.num_shards)
+        self.shards: List[_LRUShard] = [_LRUShard(shard_bytes) for _ in range(self.num_shards)]
+
+    def _shard_for(self, key: str) -> _LRUShard:
+        # Keys are md5 hex digests, so their prefix is uniformly distributed
+        try:
+            index = int(key[:8], 16)
+        except ValueError:
+            index = hash(key)
+        return self.shards[index % self.num_shards]
+
+    def get(self, key: str, now: Optional[float] = None) -> Any:
+        """Return the cached value, or the module-level _MISSING sentinel."""
+        return self._shard_for(key).get(key, time.time() if now is None else now)
+
+    def set(self, key: str, value: Any, expiry: float, size: int) -> bool:
+        """Store a value with its absolute expiry and estimated size in bytes."""
+        return self._shard_for(key).set(key, value, expiry, size + ENTRY_OVERHEAD_BYTES)
+
+    def delete(self, key: str) -> bool:
+        return self._shard_for(key).delete(key)
+
+    def clear(self) -> None:
+        for shard in self.shards:
+            shard.clear()
+
+    def clean_expired(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        return sum(shard.clean_expired(now) for shard in self.shards)
+
+    def __len__(self) -> int:
+        return sum(len(shard.entries) for shard in self.shards)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not _MISSING
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get memory tier statistics.
+
+        Returns:
+            Dictionary with entry counts, byte usage and hit/miss/eviction counters.
+        """
+        stats = {
+            "entries": 0,
+            "bytes": 0,
+            "max_bytes": self.max_bytes,
+            "shards": self.num_shards,
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "evicted_bytes": 0,
+            "expirations": 0,
+            "rejected": 0
+        }
+        for shard in self.shards:
+            with shard.lock:
+                stats["entries"] += len(shard.entries)
+                stats["bytes"] += shard.current_bytes
+                stats["hits"] += shard.hits
+                stats["misses"] += shard.misses
+                stats["evictions"] += shard.evictions
+                stats["evicted_bytes"] += shard.evicted_bytes
+                stats["expirations"] += shard.expirations
+                stats["rejected"] += shard.rejected
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+class SQLiteDiskStore:
+    """
+    Disk tier backed by a single SQLite database in WAL mode.
+
+    Entries are stored as serialised JSON values with their absolute expiry.
+    An index on the expiry column lets cleanup delete expired rows without
+    scanning live ones. Each thread gets its own connection, so readers run
+    concurrently with the single writer.
+    """
+
+    def __init__(self, db_path: Path):
+        """
+        Initialize the store, creating the database if needed.
+
+        Args:
+            db_path: Path of the SQLite database file.
+        """
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, "
+            "value TEXT NOT NULL, "
+            "expiry REAL NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_expiry ON cache_entries (expiry)")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            # WAL makes NORMAL durable against application crashes, which is enough for a cache
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """
+        Get an unexpired entry.
+
+        Args:
+            key: Cache key.
+            now: Current time, defaults to time.time().
+
+        Returns:
+            Tuple of (serialised value, expiry), or None if missing or expired.
+        """
+        now = time.time() if now is None else now
+        row = self._connection().execute(
+            "SELECT value, expiry FROM cache_entries WHERE key = ? AND expiry > ?", (key, now)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set_many(self, rows: List[Tuple[str, str, float, float]]) -> None:
+        """
+        Insert or replace entries in a single transaction.
+
+        Args:
+            rows: Tuples of (key, serialised value, expiry, created_at).
+        """
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expiry, created_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def set(self, key: str, payload: str, expiry: float, created_at: Optional[float] = None) -> None:
+        """Insert or replace a single entry."""
+        self.set_many([(key, payload, expiry, time.time() if created_at is None else created_at)])
+
+    def delete(self, key: str) -> bool:
+        conn = self._connection()
+        with conn:
+            return conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,)).rowcount > 0
+
+    def clear(self) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM cache_entries")
+
+    def delete_expired(self, now: Optional[float] = None) -> int:
+        """
+        Delete expired entries using the expiry index.
+
+        Returns:
+            Number of rows removed.
+        """
+        now = time.time() if now is None else now
+        conn = self._connection()
+        with conn:
+            return conn.execute("DELETE FROM cache_entries WHERE expiry <= ?", (now,)).rowcount
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+
+def migrate_json_files(store: SQLiteDiskStore, cache_dir: Path, batch_size: int = 500) -> int:
+    """
+    Import legacy one-file-per-entry {md5}.json cache files into a disk tier and remove them.
+
+    Expired and unreadable files are deleted without being imported.
+
+    Args:
+        store: Disk tier to import into: a SQLiteDiskStore or a shared state backend.
+        cache_dir: Directory holding the legacy JSON files.
+        batch_size: Number of rows inserted per transaction.
+
+    Returns:
+        Number of entries imported.
+    """
+    now = time.time()
+    imported = 0
+    batch = []
+    migrated_files = []
+    
+    def flush():
+        store.set_many(batch)
+        for path in migrated_files:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Failed to remove migrated cache file {path}: {e}")
+        batch.clear()
+        migrated_files.clear()
+    
+    for cache_file in Path(cache_dir).glob("*.json"):
+        try:
+            with open(cache_file, "r") as f:
+                cache_data = json.load(f)
+            expiry = float(cache_data.get("expiry", 0))
+            if expiry > now:
+                batch.append((
+                    cache_file.stem,
+                    json.dumps(cache_data["value"]),
+                    expiry,
+                    float(cache_data.get("created_at", now))
+                ))
+                imported += 1
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError, OSError) as e:
+            logger.warning(f"Skipping unreadable cache file {cache_file}: {e}")
+        migrated_files.append(cache_file)
+        
+        if len(migrated_files) >= batch_size:
+            flush()
+    flush()
+    
+    if imported:
+        logger.info(f"Migrated {imported} cache entries from JSON files into {type(store).__name__}")
+    return imported
+
+
 class Cache:
-    """A thread-safe cache implementation with TTL support."""
+    """A thread-safe cache with a bounded in-memory LRU tier over a SQLite disk tier, with TTL support."""
 
-    def __init__(self, cache_dir: Optional[str] = None, default_ttl: int = 3600):
+    def __init__(self, cache_dir: Optional[str] = None, default_ttl: int = 3600,
+                 max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES,
+                 memory_shards: int = DEFAULT_MEMORY_SHARDS,
+                 disk_store: Optional[SQLiteDiskStore] = None):
         """
         Initialize the cache.
 
         Args:
-            cache_dir: Directory to store cache files. If not provided,
+            cache_dir: Directory to store the cache database. If not provided,
                       a default directory will be used.
             default_ttl: Default time-to-live for cache entries in seconds (1 hour default).
+            max_memory_bytes: Byte budget of the in-memory tier.
+            memory_shards: Number of independently locked shards in the in-memory tier.
+            disk_store: Second tier to use instead of the cache directory's database, such
+                        as a shared state backend seen by every worker process.
         """
         if cache_dir is None:
             # Use the default cache directory in the project
@@ -39,16 +383,19 @@ class Cache:
         # Create cache directory if it doesn't exist
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
-        # In-memory cache for faster access
-        self.memory_cache: Dict[str, Tuple[Any, float]] = {}
+        # Bounded in-memory tier for faster access
+        self.memory_cache = ShardedLRUCache(max_memory_bytes, memory_shards)
+        
+        # Indexed disk tier, unless a shared one is given
+        self.disk_cache = disk_store if disk_store is not None else SQLiteDiskStore(self.cache_dir / "cache.db")
+        # Import entries left by the old JSON file layout
+        migrate_json_files(self.disk_cache, self.cache_dir)
         
         # Default time-to-live for cache entries (seconds)
         self.default_ttl = default_ttl
         
-        # Lock for thread safety
-        self.lock = threading.RLock()
-        
-        logger.info(f"Cache initialized with directory: {self.cache_dir}")
+        logger.info(f"Cache initialized with directory: {self.cache_dir}, "
+                    f"memory budget: {max_memory_bytes} bytes in {self.memory_cache.num_shards} shards")
 
     def _generate_key(self, key_parts: Any) -> str:
         """
@@ -81,40 +428,37 @@ class Cache:
             The cached value, or None if not found or expired.
         """
         key = self._generate_key(key_parts)
+        now = time.time()
         
-        with self.lock:
-            # Try memory cache first
-            if key in self.memory_cache:
-                value, expiry = self.memory_cache[key]
-                if expiry > time.time():
-                    return value
-                else:
-                    # Remove expired entry
-                    del self.memory_cache[key]
-            
-            # Check file cache
-            cache_file = self.cache_dir / f"{key}.json"
-            if cache_file.exists():
-                try:
-                    with open(cache_file, "r") as f:
-                        cache_data = json.load(f)
-                    
-                    # Check if the entry has expired
-                    if cache_data.get("expiry", 0) > time.time():
-                        # Update memory cache
-                        self.memory_cache[key] = (cache_data["value"], cache_data["expiry"])
-                        return cache_data["value"]
-                    else:
-                        # Remove expired cache file
-                        try:
-                            os.remove(cache_file)
-                        except OSError as e:
-                            logger.warning(f"Failed to remove expired cache file {cache_file}: {e}")
-                except (json.JSONDecodeError, KeyError, OSError) as e:
-                    logger.warning(f"Failed to read cache file {cache_file}: {e}")
+        # Try memory cache first
+        value = self.memory_cache.get(key, now)
+        if value is not _MISSING:
+            return value
+        
+        value = self._get_from_disk(key, now)
+        return None if value is _MISSING else value
+
+    def _get_from_disk(self, key: str, now: float) -> Any:
+        """
+        Read an entry from the disk tier and promote it into the memory tier.
+
+        Returns:
+            The cached value, or the _MISSING sentinel.
+        """
+        try:
+            entry = self.disk_cache.get(key, now)
+            if entry is None:
+                return _MISSING
+            payload, expiry = entry
+            value = json.loads(payload)
+        except Exception as e:
+            # Includes connection errors of a shared state backend
+            logger.warning(f"Failed to read cache entry {key}: {e}")
+            return _MISSING
         
-        # Not found or expired
-        return None
+        # Promote into the memory tier
+        self.memory_cache.set(key, value, expiry, len(payload))
+        return value
 
     def set(self, key_parts: Any, value: Any, ttl: Optional[int] = None) -> bool:
         """
@@ -131,23 +475,17 @@ class Cache:
         try:
             key = self._generate_key(key_parts)
             ttl = ttl if ttl is not None else self.default_ttl
-            expiry = time.time() + ttl
+            now = time.time()
+            expiry = now + ttl
             
-            with self.lock:
-                # Update memory cache
-                self.memory_cache[key] = (value, expiry)
-                
-                # Prepare data for file cache
-                cache_data = {
-                    "value": value,
-                    "expiry": expiry,
-                    "created_at": time.time()
-                }
-                
-                # Save to file
-                cache_file = self.cache_dir / f"{key}.json"
-                with open(cache_file, "w") as f:
-                    json.dump(cache_data, f)
+            # The serialised size doubles as the memory tier's byte estimate
+            payload = json.dumps(value)
+            
+            # Update memory cache
+            self.memory_cache.set(key, value, expiry, len(payload))
+            
+            # Save to disk
+            self.disk_cache.set(key, payload, expiry, now)
             
             return True
         except Exception as e:
@@ -167,15 +505,11 @@ class Cache:
         try:
             key = self._generate_key(key_parts)
             
-            with self.lock:
-                # Remove from memory cache
-                if key in self.memory_cache:
-                    del self.memory_cache[key]
-                
-                # Remove from file cache
-                cache_file = self.cache_dir / f"{key}.json"
-                if cache_file.exists():
-                    os.remove(cache_file)
+            # Remove from memory cache
+            self.memory_cache.delete(key)
+            
+            # Remove from disk cache
+            self.disk_cache.delete(key)
             
             return True
         except Exception as e:
@@ -190,17 +524,8 @@ class Cache:
             True if the cache was successfully cleared, False otherwise.
         """
         try:
-            with self.lock:
-                # Clear memory cache
-                self.memory_cache.clear()
-                
-                # Clear file cache
-                for cache_file in self.cache_dir.glob("*.json"):
-                    try:
-                        os.remove(cache_file)
-                    except OSError as e:
-                        logger.warning(f"Failed to remove cache file {cache_file}: {e}")
-            
+            self.memory_cache.clear()
+            self.disk_cache.clear()
             return True
         except Exception as e:
             logger.error(f"Failed to clear cache: {e}")
@@ -217,36 +542,33 @@ class Cache:
         current_time = time.time()
         
         try:
-            with self.lock:
-                # Clean memory cache
-                keys_to_remove = [key for key, (_, expiry) in self.memory_cache.items() 
-                                if expiry <= current_time]
-                for key in keys_to_remove:
-                    del self.memory_cache[key]
-                removed_count += len(keys_to_remove)
-                
-                # Clean file cache
-                for cache_file in self.cache_dir.glob("*.json"):
-                    try:
-                        with open(cache_file, "r") as f:
-                            cache_data = json.load(f)
-                        
-                        if cache_data.get("expiry", 0) <= current_time:
-                            os.remove(cache_file)
-                            removed_count += 1
-                    except (json.JSONDecodeError, KeyError, OSError) as e:
-                        logger.warning(f"Failed to check/remove cache file {cache_file}: {e}")
-                        try:
-                            # Remove invalid cache file
-                            os.remove(cache_file)
-                            removed_count += 1
-                        except OSError:
-                            pass
+            removed_count += self.memory_cache.clean_expired(current_time)
+            removed_count += self.disk_cache.delete_expired(current_time)
         except Exception as e:
             logger.error(f"Error cleaning expired cache entries: {e}")
         
         return removed_count
 
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with memory tier usage, hit rate and eviction counts,
+            and the number of disk tier entries.
+        """
+        try:
+            disk_entries = self.disk_cache.count()
+        except Exception as e:
+            logger.warning(f"Failed to count disk cache entries: {e}")
+            disk_entries = None
+        
+        return {
+            "memory": self.memory_cache.get_stats(),
+            "disk": {"entries": disk_entries,
+                     "path": str(getattr(self.disk_cache, "db_path", None) or getattr(self.disk_cache, "url", ""))}
+        }
+
     def cached(self, ttl: Optional[int] = None):
         """
         Decorator to cache function results.
@@ -282,6 +604,221 @@ class Cache:
         return decorator
 
 
+class AsyncCache:
+    """
+    Non-blocking front end to a Cache for coroutines.
+
+    Memory tier hits are served inline. Disk reads run on a small dedicated
+    thread pool, and writes are handed to a write-behind thread that
+    serialises values and commits them to the disk tier in batches. Values
+    waiting to be written are visible to readers immediately. When the write
+    backlog is full, the writing coroutine waits for a synchronous write on
+    the I/O pool instead of growing the queue further.
+    """
+
+    def __init__(self, cache: Cache, io_workers: int = 2, max_pending_writes: int = 1000,
+                 write_batch_size: int = 64):
+        """
+        Initialize the async cache front end.
+
+        Args:
+            cache: The Cache to wrap.
+            io_workers: Threads used for disk reads and overflow writes.
+            max_pending_writes: Maximum number of queued, unwritten entries.
+            write_batch_size: Maximum number of entries committed per transaction.
+        """
+        self.cache = cache
+        self.write_batch_size = write_batch_size
+        self._io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="cache-io")
+        self._write_queue: "queue.Queue[Tuple[str, Tuple[Any, float, float]]]" = queue.Queue(maxsize=max_pending_writes)
+        
+        # Entries queued but not yet committed, keyed by cache key
+        self._pending: Dict[str, Tuple[Any, float, float]] = {}
+        self._pending_lock = threading.Lock()
+        
+        # Held by the writer while committing a batch so deletes cannot be overtaken
+        self._write_lock = threading.Lock()
+        
+        self.stats = {
+            "memory_hits": 0,
+            "pending_hits": 0,
+            "disk_reads": 0,
+            "writes_queued": 0,
+            "writes_overflowed": 0,
+            "batches_written": 0,
+            "write_errors": 0
+        }
+        
+        self._writer = threading.Thread(target=self._write_loop, name="cache-write-behind", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    async def get(self, key_parts: Any) -> Optional[Any]:
+        """
+        Get a value from the cache without blocking the event loop.
+
+        Args:
+            key_parts: Parts to include in the key generation.
+
+        Returns:
+            The cached value, or None if not found or expired.
+        """
+        key = self.cache._generate_key(key_parts)
+        now = time.time()
+        
+        with self._pending_lock:
+            pending = self._pending.get(key)
+        if pending is not None and pending[1] > now:
+            self.stats["pending_hits"] += 1
+            return pending[0]
+        
+        value = self.cache.memory_cache.get(key, now)
+        if value is not _MISSING:
+            self.stats["memory_hits"] += 1
+            return value
+        
+        self.stats["disk_reads"] += 1
+        loop = asyncio.get_running_loop()
+        value = await loop.run_in_executor(self._io_pool, self.cache._get_from_disk, key, now)
+        return None if value is _MISSING else value
+
+    async def set(self, key_parts: Any, value: Any, ttl: Optional[int] = None) -> bool:
+        """
+        Queue a value for the write-behind thread.
+
+        Args:
+            key_parts: Parts to include in the key generation.
+            value: Value to cache.
+            ttl: Time-to-live in seconds. If None, the default TTL is used.
+
+        Returns:
+            True if the value was queued or written, False otherwise.
+        """
+        key = self.cache._generate_key(key_parts)
+        ttl = ttl if ttl is not None else self.cache.default_ttl
+        now = time.time()
+        entry = (value, now + ttl, now)
+        
+        with self._pending_lock:
+            self._pending[key] = entry
+        try:
+            self._write_queue.put_nowait((key, entry))
+            self.stats["writes_queued"] += 1
+            return True
+        except queue.Full:
+            pass
+        
+        # Backlog is full: apply backpressure by writing synchronously off the loop
+        with self._pending_lock:
+            if self._pending.get(key) is entry:
+                del self._pending[key]
+        self.stats["writes_overflowed"] += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io_pool, self.cache.set, key_parts, value, ttl)
+
+    async def delete(self, key_parts: Any) -> bool:
+        """
+        Delete a value from the cache, including any queued write for it.
+
+        Args:
+            key_parts: Parts to include in the key generation.
+
+        Returns:
+            True if the value was successfully deleted, False otherwise.
+        """
+        key = self.cache._generate_key(key_parts)
+        with self._pending_lock:
+            self._pending.pop(key, None)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._io_pool, self._delete_committed, key)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to delete cache value: {e}")
+            return False
+
+    def _delete_committed(self, key: str) -> None:
+        with self._write_lock:
+            self.cache.memory_cache.delete(key)
+            self.cache.disk_cache.delete(key)
+
+    def _write_loop(self) -> None:
+        """Drain the write queue, committing entries to the disk tier in batches."""
+        while True:
+            batch = [self._write_queue.get()]
+            while len(batch) < self.write_batch_size:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                with self._write_lock:
+                    self._write_batch(batch)
+            except Exception as e:
+                self.stats["write_errors"] += 1
+                logger.error(f"Failed to write cache batch of {len(batch)} entries: {e}")
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+
+    def _write_batch(self, batch: List[Tuple[str, Tuple[Any, float, float]]]) -> None:
+        rows = []
+        written = []
+        for key, entry in batch:
+            with self._pending_lock:
+                # Skip entries superseded by a newer set or removed by delete
+                if self._pending.get(key) is not entry:
+                    continue
+            value, expiry, created_at = entry
+            try:
+                payload = json.dumps(value)
+            except (TypeError, ValueError) as e:
+                logger.error(f"Failed to serialise cache value for {key}: {e}")
+                written.append((key, entry))
+                continue
+            self.cache.memory_cache.set(key, value, expiry, len(payload))
+            rows.append((key, payload, expiry, created_at))
+            written.append((key, entry))
+        
+        try:
+            if rows:
+                self.cache.disk_cache.set_many(rows)
+                self.stats["batches_written"] += 1
+        finally:
+            with self._pending_lock:
+                for key, entry in written:
+                    if self._pending.get(key) is entry:
+                        del self._pending[key]
+
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        """
+        Wait until all queued writes are committed.
+
+        Args:
+            timeout: Maximum seconds to wait, or None to wait indefinitely.
+
+        Returns:
+            True if the queue drained in time.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while self._write_queue.unfinished_tasks:
+            if deadline is not None and time.time() > deadline:
+                logger.warning(f"Cache flush timed out with {self._write_queue.unfinished_tasks} pending writes")
+                return False
+            time.sleep(0.01)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get async front end statistics.
+
+        Returns:
+            Dictionary with read path counters and the write-behind backlog.
+        """
+        return dict(self.stats, pending_writes=self._write_queue.qsize())
+
+
 # Singleton instance
 _cache = None
 
@@ -300,11 +837,30 @@ def get_cache(cache_dir: Optional[str] = None, default_ttl: int = 3600) -> Cache
     global _cache
     
     if _cache is None:
-        _cache = Cache(cache_dir, default_ttl)
+        memory_config = _get_memory_cache_config()
+        # Imported here because the shared state backends build on SQLiteDiskStore
+        from .shared_state import get_shared_state_backend
+        _cache = Cache(
+            cache_dir,
+            default_ttl,
+            max_memory_bytes=int(memory_config.get("max_size_mb", DEFAULT_MAX_MEMORY_BYTES / (1024 * 1024)) * 1024 * 1024),
+            memory_shards=memory_config.get("shards", DEFAULT_MEMORY_SHARDS),
+            disk_store=get_shared_state_backend()
+        )
     
     return _cache
 
 
+def _get_memory_cache_config() -> Dict[str, Any]:
+    """Read the memory tier settings from server_config.yaml (data.memory_cache)."""
+    try:
+        from ..config import get_config
+        return get_config().get_server_config().get("data", {}).get("memory_cache", {}) or {}
+    except Exception as e:
+        logger.warning(f"Could not read memory cache configuration, using defaults: {e}")
+        return {}
+
+
 def get_tool_result_cache(cache_dir: Optional[str] = None, default_ttl: int = 3600) -> Cache:
     """
     Get the cache instance specifically for tool results.
@@ -321,6 +877,23 @@ def get_tool_result_cache(cache_dir: Optional[str] = None, default_ttl: int = 36
     return get_cache(cache_dir, default_ttl)
 
 
+_async_cache = None
+
+def get_async_cache() -> AsyncCache:
+    """
+    Get the non-blocking front end to the shared cache instance.
+
+    Returns:
+        The AsyncCache instance.
+    """
+    global _async_cache
+    
+    if _async_cache is None:
+        _async_cache = AsyncCache(get_cache())
+    
+    return _async_cache
+
+
 def async_cached(ttl: Optional[int] = None):
     """
     Decorator for caching results of async functions.
@@ -334,7 +907,7 @@ def async_cached(ttl: Optional[int] = None):
     def decorator(func):
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
-            cache = get_cache()
+            cache = get_async_cache()
             
             # Generate cache key
             key_parts = {
@@ -344,7 +917,7 @@ def async_cached(ttl: Optional[int] = None):
             }
             
             # Try to get from cache
-            cached_result = cache.get(key_parts)
+            cached_result = await cache.get(key_parts)
             if cached_result is not None:
                 logger.debug(f"Async cache hit for {func.__name__}")
                 return cached_result
@@ -352,7 +925,7 @@ def async_cached(ttl: Optional[int] = None):
             # Execute function and cache result
             logger.debug(f"Async cache miss for {func.__name__}")
             result = await func(*args, **kwargs)
-            cache.set(key_parts, result, ttl)
+            await cache.set(key_parts, result, ttl)
             
             return result
         return wrapper
@@ -370,7 +943,10 @@ def schedule_cache_maintenance(interval: int = 3600) -> None:
         try:
             cache = get_cache()
             removed = cache.clean_expired()
-            logger.info(f"Cache maintenance completed: {removed} expired entries removed")
+            memory_stats = cache.get_stats()["memory"]
+            logger.info(f"Cache maintenance completed: {removed} expired entries removed, "
+                        f"memory tier {memory_stats['entries']} entries / {memory_stats['bytes']} bytes, "
+                        f"{memory_stats['evictions']} evictions ({memory_stats['evicted_bytes']} bytes)")
             
             # Schedule next run
             threading.Timer(interval, maintenance_task).start()
@@ -3,18 +3,75 @@ Connection manager module for the GIS AI Agent.
 
 This module provides functionality for managing WebSocket connections and sessions,
 including connection pooling, session hibernation, and reconnection.
+
+Messages are not written to a socket by the caller. Each connection has a
+bounded outbound queue drained by its own writer task, so a slow client only
+fills its own queue and never delays messages to the others. Messages are
+encoded in the connection's wire format (JSON text or MessagePack binary
+frames), and large ones are split into chunk frames.
 """
 
 import asyncio
 import logging
-from typing import Dict, Set, Optional, List, Any, Callable, Awaitable
+from typing import Dict, Set, Optional, List, Any, Callable, Awaitable, Tuple
 import time
 import uuid
 from fastapi import WebSocket, WebSocketDisconnect
 
+from ..config import get_config
+from .wire_format import JSON, DEFAULT_MAX_FRAME_BYTES, Frame, frame_message, frame_size
+from .security import SessionTokenSigner, get_session_token_signer
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# What happens to a client whose outbound queue is full
+SLOW_CLIENT_POLICIES = ("drop", "hibernate")
+
+
+class _ClientChannel:
+    """Outbound queue, writer task and send statistics of one connection."""
+
+    __slots__ = ("websocket", "encoding", "chunked", "queue", "writer", "sending_since", "sent", "dropped",
+                 "bytes_sent", "total_latency", "max_latency", "max_depth")
+
+    def __init__(self, websocket: WebSocket, queue_size: int, encoding: str = JSON, chunked: bool = False):
+        self.websocket = websocket
+        self.encoding = encoding
+        # Whether the client joins chunk frames, so large messages may be split
+        self.chunked = chunked
+        # Entries are (frames of one message, time queued)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        # Start of the socket write in progress, None between writes
+        self.sending_since: Optional[float] = None
+        self.sent = 0
+        self.dropped = 0
+        self.bytes_sent = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.max_depth = 0
+
+    def put_nowait(self, frames: List[Frame]) -> None:
+        """Queue an encoded message, raising asyncio.QueueFull if there is no room."""
+        self.queue.put_nowait((frames, time.monotonic()))
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and send latency of the connection."""
+        return {
+            "encoding": self.encoding,
+            "chunked": self.chunked,
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "bytes_sent": self.bytes_sent,
+            "avg_send_latency_ms": round(self.total_latency / self.sent * 1000, 3) if self.sent else 0.0,
+            "max_send_latency_ms": round(self.max_latency * 1000, 3)
+        }
+
+
 class ConnectionManager:
     """
     Manages WebSocket connections and sessions for the MCP server.
@@ -24,12 +81,22 @@ class ConnectionManager:
     - Tracking session activity and hibernation
     - Broadcasting messages to connected clients
     - Managing connection limits and timeouts
+    - Queueing outbound messages per client and handling slow clients
+    
+    A client is slow when its outbound queue is full. Under the "drop"
+    policy the messages that do not fit are dropped for that client; under
+    "hibernate" the client is disconnected and its session hibernated.
     """
     
     def __init__(self, 
                 inactive_timeout: int = 1800,  # 30 minutes
                 max_connections: int = 100,
-                hibernation_timeout: int = 7200):  # 2 hours
+                hibernation_timeout: int = 7200,  # 2 hours
+                send_queue_size: int = 64,
+                slow_client_policy: str = "hibernate",
+                send_timeout: float = 10.0,
+                max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES,
+                token_signer: Optional[SessionTokenSigner] = None):
         """
         Initialize the connection manager.
         
@@ -37,16 +104,45 @@ class ConnectionManager:
             inactive_timeout: Time in seconds after which a session is considered inactive.
             max_connections: Maximum number of active connections allowed.
             hibernation_timeout: Time in seconds after which a hibernated session is removed.
+            send_queue_size: Maximum number of outbound messages queued per connection.
+            slow_client_policy: "drop" or "hibernate", applied when a client's queue is full.
+            send_timeout: Seconds a direct message waits for queue space, and a single
+                          socket write may take before the client is hibernated.
+            max_frame_bytes: Encoded size above which a message is sent as chunk frames
+                             to clients that accept them.
+            token_signer: Signer of the resume tokens proving a client owns a session.
+                          Defaults to the configured one.
         """
+        if slow_client_policy not in SLOW_CLIENT_POLICIES:
+            raise ValueError(f"Unknown slow client policy: {slow_client_policy}")
+        
         self.active_connections: Dict[str, WebSocket] = {}  # session_id -> WebSocket
         self.connection_times: Dict[str, float] = {}  # session_id -> last_activity_time
         self.hibernated_sessions: Dict[str, float] = {}  # session_id -> hibernation_time
+        self._channels: Dict[str, _ClientChannel] = {}  # session_id -> outbound queue
         
         self.inactive_timeout = inactive_timeout
         self.max_connections = max_connections
         self.hibernation_timeout = hibernation_timeout
+        self.send_queue_size = max(1, send_queue_size)
+        self.slow_client_policy = slow_client_policy
+        self.send_timeout = send_timeout
+        self.max_frame_bytes = max_frame_bytes
+        self.token_signer = token_signer or get_session_token_signer()
         self._monitor_task = None
         
+        self.stats = {
+            "messages_sent": 0,
+            "bytes_sent": 0,
+            "chunked_messages": 0,
+            "encode_errors": 0,
+            "messages_dropped": 0,
+            "send_errors": 0,
+            "slow_clients_hibernated": 0,
+            "broadcasts": 0,
+            "resumed_sessions": 0
+        }
+        
         logger.info(f"ConnectionManager initialized with {max_connections} max connections")
     
     def start_monitoring(self) -> None:
@@ -62,12 +158,22 @@ class ConnectionManager:
                 logger.warning(f"Cannot start session monitoring: {e}")
                 logger.warning("Session monitoring will be started on first connection")
     
-    async def connect(self, websocket: WebSocket) -> str:
+    async def connect(self, websocket: WebSocket, session_id: Optional[str] = None,
+                      encoding: str = JSON, resume_token: Optional[str] = None,
+                      chunked: bool = False) -> str:
         """
         Register a new WebSocket connection.
         
         Args:
             websocket: The WebSocket connection to register.
+            session_id: Session ID the client wants to resume. It is reused if
+                        resume_token was issued for it and no other connection
+                        is using it; otherwise a new one is assigned.
+            encoding: Wire format of the messages sent to the client, from
+                      wire_format.negotiate_encoding.
+            resume_token: Token from the session_info message of the session.
+            chunked: Whether the client joins chunk frames; if not, every
+                     message is sent as a single frame.
             
         Returns:
             The session ID assigned to this connection.
@@ -88,22 +194,52 @@ class ConnectionManager:
                 await websocket.close(code=1008, reason="Server at capacity")
                 raise ValueError("Maximum connections reached")
         
-        # Generate a session ID
-        session_id = str(uuid.uuid4())
+        # Resume the requested session if possible, otherwise generate a session ID
+        if self._can_resume(session_id, resume_token):
+            self.hibernated_sessions.pop(session_id, None)
+            self.stats["resumed_sessions"] += 1
+            logger.info(f"Resuming session {session_id}")
+        else:
+            session_id = str(uuid.uuid4())
         
         # Accept the connection
         await websocket.accept()
         
-        # Check for hibernated session (future enhancement)
-        # We could restore session data here if the client provides a previous session ID
-        
-        # Register the connection
+        # Register the connection and start its writer
         self.active_connections[session_id] = websocket
         self.connection_times[session_id] = time.time()
+        channel = _ClientChannel(websocket, self.send_queue_size, encoding, chunked)
+        channel.writer = asyncio.create_task(self._write_messages(session_id, channel))
+        self._channels[session_id] = channel
         
         logger.info(f"Client connected with session ID: {session_id}")
         return session_id
     
+    def _can_resume(self, session_id: Optional[str], resume_token: Optional[str]) -> bool:
+        """
+        Check whether a client may resume a session ID.
+        
+        The client must present the session's resume token, and the session
+        must not be connected. IDs whose hibernation has expired are still
+        accepted, since their state may be stored elsewhere.
+        
+        Args:
+            session_id: The session ID the client asked for.
+            resume_token: The token the client presented for it.
+            
+        Returns:
+            True if the session can be resumed.
+        """
+        if not session_id or session_id in self.active_connections:
+            return False
+        if not self.token_signer.verify(session_id, resume_token):
+            logger.warning(f"Refused to resume session {session_id}: invalid resume token")
+            return False
+        try:
+            return str(uuid.UUID(session_id)) == session_id
+        except ValueError:
+            return False
+    
     async def disconnect(self, session_id: str) -> None:
         """
         Unregister a WebSocket connection.
@@ -120,6 +256,11 @@ class ConnectionManager:
             
             if session_id in self.connection_times:
                 del self.connection_times[session_id]
+            
+            # Stop the writer; messages still queued are discarded with the socket
+            channel = self._channels.pop(session_id, None)
+            if channel is not None and channel.writer is not asyncio.current_task():
+                channel.writer.cancel()
                 
             logger.info(f"Client disconnected, session hibernated: {session_id}")
     
@@ -137,52 +278,165 @@ class ConnectionManager:
     
     async def send_json(self, session_id: str, message: Any) -> bool:
         """
-        Send a JSON message to a specific client.
+        Queue a message for a specific client.
+        
+        The message is encoded immediately in the client's wire format and
+        written by the connection's writer task. If the client's queue is full, this waits up to
+        send_timeout for room before applying the slow client policy.
         
         Args:
             session_id: The session ID to send the message to.
             message: The message object to send.
             
         Returns:
-            True if the message was sent, False if the session is not connected.
+            True if the message was queued, False if the session is not
+            connected, the message could not be encoded or it was dropped.
         """
-        if session_id not in self.active_connections:
+        channel = self._channels.get(session_id)
+        if channel is None:
             return False
         
+        # Update last activity time
+        self.connection_times[session_id] = time.time()
+        
+        frames = self._encode(message, channel)
+        if frames is None:
+            return False
         try:
-            # Update last activity time
-            self.connection_times[session_id] = time.time()
-            
-            # Send the message
-            await self.active_connections[session_id].send_json(message)
+            channel.put_nowait(frames)
             return True
-        except Exception as e:
-            logger.error(f"Error sending message to session {session_id}: {e}")
-            await self._handle_connection_error(session_id)
+        except asyncio.QueueFull:
+            pass
+        
+        try:
+            await asyncio.wait_for(channel.queue.put((frames, time.monotonic())), self.send_timeout)
+            channel.max_depth = max(channel.max_depth, channel.queue.qsize())
+            return True
+        except asyncio.TimeoutError:
+            await self._handle_slow_client(session_id, channel)
             return False
     
-    async def broadcast_json(self, message: Any, exclude: Optional[List[str]] = None) -> None:
+    async def broadcast_json(self, message: Any, exclude: Optional[List[str]] = None) -> int:
         """
-        Broadcast a JSON message to all connected clients.
+        Broadcast a message to all connected clients.
+        
+        The message is encoded once per wire format and queued for every client without
+        waiting on any socket, so the writers deliver it concurrently. Clients
+        whose queues are full are handled by the slow client policy.
         
         Args:
             message: The message object to broadcast.
             exclude: List of session IDs to exclude from the broadcast.
+            
+        Returns:
+            Number of clients the message was queued for.
         """
-        exclude = exclude or []
-        failed_sessions = []
+        exclude = set(exclude or [])
+        encoded: Dict[Tuple[str, bool], Optional[List[Frame]]] = {}
+        slow_clients = []
+        queued = 0
         
-        for session_id, websocket in self.active_connections.items():
-            if session_id not in exclude:
-                try:
-                    await websocket.send_json(message)
-                except Exception as e:
-                    logger.error(f"Error broadcasting to session {session_id}: {e}")
-                    failed_sessions.append(session_id)
+        for session_id, channel in self._channels.items():
+            if session_id in exclude:
+                continue
+            key = (channel.encoding, channel.chunked)
+            if key not in encoded:
+                encoded[key] = self._encode(message, channel)
+            frames = encoded[key]
+            if frames is None:
+                continue
+            try:
+                channel.put_nowait(frames)
+                queued += 1
+            except asyncio.QueueFull:
+                slow_clients.append((session_id, channel))
+        
+        self.stats["broadcasts"] += 1
+        if slow_clients:
+            await asyncio.gather(*(self._handle_slow_client(session_id, channel)
+                                   for session_id, channel in slow_clients))
+        return queued
+    
+    def _encode(self, message: Any, channel: _ClientChannel) -> Optional[List[Frame]]:
+        """
+        Encode a message as the frames to send to a client.
+        
+        Large messages are chunked for clients that accept chunk frames.
+        
+        Returns:
+            The frames, or None if the message cannot be encoded.
+        """
+        try:
+            frames = frame_message(message, channel.encoding, self.max_frame_bytes if channel.chunked else None)
+        except Exception as e:
+            logger.error(f"Error encoding message as {channel.encoding}: {e}")
+            self.stats["encode_errors"] += 1
+            return None
+        if len(frames) > 1:
+            self.stats["chunked_messages"] += 1
+        return frames
+    
+    async def _write_messages(self, session_id: str, channel: _ClientChannel) -> None:
+        """
+        Drain a connection's outbound queue onto its socket.
+        
+        Args:
+            session_id: The session ID of the connection.
+            channel: The connection's outbound queue.
+        """
+        while True:
+            frames, queued_at = await channel.queue.get()
+            channel.sending_since = time.monotonic()
+            try:
+                for frame in frames:
+                    if isinstance(frame, bytes):
+                        await channel.websocket.send_bytes(frame)
+                    else:
+                        await channel.websocket.send_text(frame)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error sending message to session {session_id}: {e or type(e).__name__}")
+                self.stats["send_errors"] += 1
+                await self._handle_connection_error(session_id)
+                return
+            
+            channel.sending_since = None
+            latency = time.monotonic() - queued_at
+            size = sum(frame_size(frame) for frame in frames)
+            channel.bytes_sent += size
+            self.stats["bytes_sent"] += size
+            channel.sent += 1
+            channel.total_latency += latency
+            channel.max_latency = max(channel.max_latency, latency)
+            self.stats["messages_sent"] += 1
+    
+    async def _handle_slow_client(self, session_id: str, channel: _ClientChannel) -> None:
+        """
+        Apply the slow client policy to a client whose queue is full.
+        
+        A client whose current socket write has taken longer than
+        send_timeout is hibernated whatever the policy, since it is most
+        likely gone.
+        
+        Args:
+            session_id: The session ID of the slow client.
+            channel: The client's outbound queue.
+        """
+        channel.dropped += 1
+        self.stats["messages_dropped"] += 1
+        if session_id not in self._channels:
+            return
+        
+        stalled = (channel.sending_since is not None
+                   and time.monotonic() - channel.sending_since > self.send_timeout)
+        if self.slow_client_policy == "drop" and not stalled:
+            return
         
-        # Clean up failed connections
-        for session_id in failed_sessions:
-            await self._handle_connection_error(session_id)
+        logger.warning(f"Session {session_id} is not reading its messages "
+                       f"({channel.queue.qsize()} queued), hibernating it")
+        self.stats["slow_clients_hibernated"] += 1
+        await self._close_connection(session_id, code=1013, reason="Client too slow")
     
     async def _handle_connection_error(self, session_id: str) -> None:
         """
@@ -191,15 +445,60 @@ class ConnectionManager:
         Args:
             session_id: The session ID that experienced an error.
         """
+        await self._close_connection(session_id, code=1011, reason="Internal server error")
+    
+    async def _close_connection(self, session_id: str, code: int, reason: str) -> None:
+        """
+        Close a connection and move its session to the hibernated state.
+        
+        Args:
+            session_id: The session ID to close.
+            code: WebSocket close code.
+            reason: Close reason sent to the client.
+        """
+        websocket = self.active_connections.get(session_id)
+        
+        # Hibernate first, which stops the writer before the socket is closed
+        await self.disconnect(session_id)
+        if websocket is None:
+            return
+        
         try:
-            # Try to close the connection cleanly
-            websocket = self.active_connections[session_id]
-            await websocket.close(code=1011, reason="Internal server error")
+            # A client that stopped reading may never acknowledge the close
+            await asyncio.wait_for(websocket.close(code=code, reason=reason), self.send_timeout)
         except Exception:
             pass  # Connection might already be closed
+    
+    def get_client_stats(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the outbound queue statistics of a connection.
         
-        # Move the session to hibernated state
-        await self.disconnect(session_id)
+        Args:
+            session_id: The session ID to report on.
+            
+        Returns:
+            Queue depth, message counts and send latency, or None if the
+            session is not connected.
+        """
+        channel = self._channels.get(session_id)
+        return channel.get_stats() if channel else None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get connection and delivery statistics.
+        
+        Returns:
+            Totals for the manager and per-client queue statistics.
+        """
+        stats = dict(self.stats)
+        stats.update({
+            "active_connections": len(self.active_connections),
+            "hibernated_sessions": len(self.hibernated_sessions),
+            "slow_client_policy": self.slow_client_policy,
+            "send_queue_size": self.send_queue_size,
+            "clients": {session_id: channel.get_stats() for session_id, channel in self._channels.items()}
+        })
+        return stats
     
     def update_activity(self, session_id: str) -> None:
         """
@@ -228,9 +527,8 @@ class ConnectionManager:
         for session_id in inactive_sessions:
             if session_id in self.active_connections:
                 try:
-                    websocket = self.active_connections[session_id]
-                    await websocket.close(code=1000, reason="Session hibernated due to inactivity")
-                    await self.disconnect(session_id)
+                    await self._close_connection(session_id, code=1000,
+                                                 reason="Session hibernated due to inactivity")
                     count += 1
                 except Exception as e:
                     logger.error(f"Error hibernating session {session_id}: {e}")
@@ -273,9 +571,19 @@ class ConnectionManager:
             await asyncio.sleep(300)  # Run every 5 minutes
 
 
-# Create a singleton instance
-_connection_manager = ConnectionManager()
+# Singleton instance, created on first use from server_config.yaml
+_connection_manager = None
 
 def get_connection_manager() -> ConnectionManager:
     """Get the connection manager instance."""
+    global _connection_manager
+    if _connection_manager is None:
+        server_config = get_config().get_server_config().get("server", {}) or {}
+        websocket_config = server_config.get("websocket", {}) or {}
+        _connection_manager = ConnectionManager(
+            send_queue_size=websocket_config.get("send_queue_size", 64),
+            slow_client_policy=websocket_config.get("slow_client_policy", "hibernate"),
+            send_timeout=websocket_config.get("send_timeout", 10.0),
+            max_frame_bytes=websocket_config.get("max_frame_bytes", DEFAULT_MAX_FRAME_BYTES)
+        )
     return _connection_manager 
\ No newline at end of file
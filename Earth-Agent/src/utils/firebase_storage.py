@@ -3,6 +3,10 @@ Firebase storage module for the GIS AI Agent.
 
 This module provides functionality for persisting chat history and session data
 in Firebase Realtime Database, including encryption for sensitive data.
+
+Chat history is stored append-only: each message is encrypted on its own under
+a sequence key, so a save only sends the messages added since the last one.
+Saves arriving close together for a session are coalesced into a single PATCH.
 """
 
 import json
@@ -10,8 +14,9 @@ import logging
 import asyncio
 import time
 import base64
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Union, Mapping
 from datetime import datetime
+from urllib.parse import urlparse
 import os
 import aiohttp
 from cryptography.fernet import Fernet
@@ -24,6 +29,21 @@ logger = logging.getLogger(__name__)
 # Constants
 MAX_RETRIES = 3
 RETRY_DELAY = 0.5  # seconds
+WRITE_DELAY = 0.05  # seconds to gather a burst of chat writes into one request
+MESSAGE_KEY_PREFIX = "m"  # keeps sequence keys from being read back as an array
+MESSAGE_KEY_DIGITS = 10
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+def _is_local_url(url: str) -> bool:
+    """Check whether a database URL points at a local emulator or stand-in."""
+    return urlparse(url).hostname in LOCAL_HOSTS
+
+
+def _message_key(index: int) -> str:
+    """Build the sortable database key for the message at a position in a session."""
+    return f"{MESSAGE_KEY_PREFIX}{index:0{MESSAGE_KEY_DIGITS}d}"
+
 
 class FirebaseStorage:
     """
@@ -40,7 +60,8 @@ class FirebaseStorage:
                 database_url: Optional[str] = None,
                 api_key: Optional[str] = None,
                 encryption_key: Optional[str] = None,
-                disabled: bool = False):
+                disabled: bool = False,
+                write_delay: float = WRITE_DELAY):
         """
         Initialize the Firebase storage.
         
@@ -52,7 +73,20 @@ class FirebaseStorage:
             encryption_key: Key used to encrypt sensitive data.
                             If None, uses FIREBASE_ENCRYPTION_KEY environment variable.
             disabled: If True, Firebase storage will be disabled and all operations will be no-ops.
+            write_delay: Seconds to wait for more chat writes to a session before sending them.
         """
+        # Write-behind state for chat history: messages known to be stored per
+        # session, encrypted messages waiting to be sent and the pending flushes
+        self.write_delay = write_delay
+        self._message_counts: Dict[str, int] = {}
+        self._pending_messages: Dict[str, Dict[str, str]] = {}
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            "messages_written": 0,
+            "bytes_written": 0,
+            "patches": 0
+        }
+        
         # Check if Firebase is explicitly disabled
         self.disabled = disabled or os.environ.get("DISABLE_FIREBASE", "").lower() == "true"
         
@@ -69,8 +103,8 @@ class FirebaseStorage:
         self.database_url = database_url or os.environ.get("FIREBASE_DB_URL")
         self.api_key = api_key or os.environ.get("FIREBASE_API_KEY")
         
-        # Fix the database URL format if needed
-        if self.database_url:
+        # Fix the database URL format if needed; local emulators are used as given
+        if self.database_url and not _is_local_url(self.database_url):
             # Remove trailing slash
             if self.database_url.endswith('/'):
                 self.database_url = self.database_url[:-1]
@@ -167,7 +201,8 @@ class FirebaseStorage:
         return self._session
     
     async def close(self) -> None:
-        """Close resources."""
+        """Close resources, sending any chat writes still waiting."""
+        await self.flush()
         if self._session and not self._session.closed:
             await self._session.close()
             self._session = None
@@ -248,7 +283,7 @@ class FirebaseStorage:
             
         # Ensure the database URL is properly formatted
         base_url = self.database_url
-        if not base_url.endswith('.firebaseio.com'):
+        if not base_url.endswith('.firebaseio.com') and not _is_local_url(base_url):
             # Check if we need to add the default RTD suffix
             if not 'firebaseio.com' in base_url:
                 if not base_url.endswith('.'):
@@ -434,10 +469,14 @@ class FirebaseStorage:
         # _firebase_request will set self._database_exists
         return self._database_exists or False
     
-    async def save_chat_history(self, session_id: str, messages: List[Dict[str, Any]]) -> bool:
+    async def save_chat_history(self, session_id: str, messages: List[Mapping[str, Any]]) -> bool:
         """
         Save chat history for a session to Firebase.
         
+        Only the messages beyond those already stored for the session are
+        written, each encrypted on its own. A history shorter than what is
+        stored replaces it.
+        
         Args:
             session_id: The session ID.
             messages: List of message dictionaries.
@@ -458,38 +497,203 @@ class FirebaseStorage:
             return True  # Pretend success to avoid errors
         
         try:
-            # Encrypt the messages
-            encrypted_data = self._encrypt_data(messages)
+            stored = self._message_counts.get(session_id, 0)
+            if len(messages) < stored:
+                return await self._replace_chat_history(session_id, messages)
             
-            # Create the payload
-            payload = {
-                "updated_at": datetime.now().isoformat(),
-                "messages": encrypted_data
-            }
+            for index in range(stored, len(messages)):
+                self._queue_message(session_id, index, messages[index])
+            return await self._schedule_flush(session_id)
+        
+        except Exception as e:
+            logger.error(f"Error saving chat history to Firebase: {e}")
+            return False
+    
+    async def append_chat_message(self, session_id: str, message: Mapping[str, Any]) -> bool:
+        """
+        Append a single message to a session's stored chat history.
+        
+        Args:
+            session_id: The session ID.
+            message: Message dictionary.
             
-            # Save to Firebase using the helper method
-            result = await self._firebase_request('put', f"/chat_history/{session_id}", payload)
+        Returns:
+            True if saved successfully, False otherwise.
+        """
+        if self.disabled or not self.is_configured or self._database_exists is False:
+            return True  # Pretend success, as for save_chat_history
+        
+        try:
+            # Find where the stored history ends before appending to it
+            if session_id not in self._message_counts:
+                history = await self.load_chat_history(session_id)
+                if history and session_id not in self._message_counts:
+                    # Stored as one encrypted list, which a per-message write would
+                    # replace; rewrite it as per-message keys in the same PATCH
+                    for index, stored in enumerate(history):
+                        self._queue_message(session_id, index, stored)
+            self._queue_message(session_id, self._message_counts.get(session_id, 0), message)
+            return await self._schedule_flush(session_id)
+        
+        except Exception as e:
+            logger.error(f"Error appending chat message to Firebase: {e}")
+            return False
+    
+    async def replace_chat_history(self, session_id: str, messages: List[Mapping[str, Any]]) -> bool:
+        """
+        Replace a session's stored chat history with the given messages.
+        
+        Use this instead of save_chat_history for a window of the history
+        that may have dropped older messages, since save_chat_history only
+        writes messages beyond the stored count.
+        
+        Args:
+            session_id: The session ID.
+            messages: List of message dictionaries.
             
-            if result is not None:
-                logger.debug(f"Saved chat history for session {session_id} to Firebase")
-                return True
-            else:
-                # If database doesn't exist, log once but don't treat as error
-                if self._database_exists is False:
-                    logger.debug(f"Skipped saving chat history (database doesn't exist)")
-                    return True
-                else:
-                    logger.error(f"Failed to save chat history for session {session_id}")
-                    return False
+        Returns:
+            True if saved successfully, False otherwise.
+        """
+        if self.disabled or not self.is_configured or self._database_exists is False:
+            return True  # Pretend success, as for save_chat_history
         
+        try:
+            return await self._replace_chat_history(session_id, messages)
         except Exception as e:
-            logger.error(f"Error saving chat history to Firebase: {e}")
+            logger.error(f"Error replacing chat history in Firebase: {e}")
             return False
     
+    def _queue_message(self, session_id: str, index: int, message: Mapping[str, Any]) -> None:
+        """Encrypt a message and hold it for the session's next write."""
+        self._pending_messages.setdefault(session_id, {})[_message_key(index)] = self._encrypt_data(dict(message))
+        self._message_counts[session_id] = index + 1
+    
+    async def _schedule_flush(self, session_id: str) -> bool:
+        """
+        Wait for the session's queued messages to be written.
+        
+        Callers arriving before the write starts share it, so a burst of saves
+        becomes a single PATCH.
+        
+        Args:
+            session_id: The session ID.
+            
+        Returns:
+            True if the write succeeded, False otherwise.
+        """
+        task = self._flush_tasks.get(session_id)
+        if task is None:
+            task = asyncio.create_task(self._flush_after_delay(session_id))
+            self._flush_tasks[session_id] = task
+        # Shield the shared write from a single caller being cancelled
+        return await asyncio.shield(task)
+    
+    async def _flush_after_delay(self, session_id: str) -> bool:
+        """Gather writes for the write delay, then send everything queued for the session."""
+        try:
+            await asyncio.sleep(self.write_delay)
+        finally:
+            # Later saves start a new write rather than joining this one
+            self._flush_tasks.pop(session_id, None)
+        return await self._write_messages(session_id, self._pending_messages.pop(session_id, {}))
+    
+    async def _write_messages(self, session_id: str, pending: Dict[str, str]) -> bool:
+        """
+        Write encrypted messages into a session's stored history with one PATCH.
+        
+        Args:
+            session_id: The session ID.
+            pending: Encrypted messages by message key.
+            
+        Returns:
+            True if written successfully, False otherwise.
+        """
+        if not pending:
+            return True
+        
+        payload: Dict[str, Any] = {f"messages/{key}": value for key, value in pending.items()}
+        payload["updated_at"] = datetime.now().isoformat()
+        
+        result = await self._firebase_request('patch', f"/chat_history/{session_id}", payload)
+        
+        if result is not None:
+            self.stats["patches"] += 1
+            self.stats["messages_written"] += len(pending)
+            self.stats["bytes_written"] += sum(len(value) for value in pending.values())
+            logger.debug(f"Appended {len(pending)} messages to chat history for session {session_id}")
+            return True
+        
+        # If database doesn't exist, log once but don't treat as error
+        if self._database_exists is False:
+            logger.debug(f"Skipped saving chat history (database doesn't exist)")
+            return True
+        
+        # Keep the lost messages queued so the session's next write resends them,
+        # without overriding anything queued for the same keys since
+        queued = self._pending_messages.setdefault(session_id, {})
+        for key, value in pending.items():
+            queued.setdefault(key, value)
+        logger.error(f"Failed to save chat history for session {session_id}")
+        return False
+    
+    async def _replace_chat_history(self, session_id: str, messages: List[Mapping[str, Any]]) -> bool:
+        """
+        Overwrite a session's stored history with the given messages.
+        
+        Args:
+            session_id: The session ID.
+            messages: List of message dictionaries.
+            
+        Returns:
+            True if saved successfully, False otherwise.
+        """
+        # The full write supersedes anything still queued for the session
+        self._pending_messages.pop(session_id, None)
+        self._message_counts.pop(session_id, None)
+        
+        payload = {
+            "updated_at": datetime.now().isoformat(),
+            "messages": {_message_key(index): self._encrypt_data(dict(message))
+                         for index, message in enumerate(messages)}
+        }
+        
+        result = await self._firebase_request('put', f"/chat_history/{session_id}", payload)
+        
+        if result is not None or self._database_exists is False:
+            self._message_counts[session_id] = len(messages)
+            logger.debug(f"Replaced chat history for session {session_id} in Firebase")
+            return True
+        
+        logger.error(f"Failed to replace chat history for session {session_id}")
+        return False
+    
+    async def flush(self, session_id: Optional[str] = None) -> bool:
+        """
+        Send queued chat writes without waiting out the write delay.
+        
+        Args:
+            session_id: Session to flush, or None for all sessions.
+            
+        Returns:
+            True if every write succeeded, False otherwise.
+        """
+        session_ids = [session_id] if session_id is not None else list(self._pending_messages)
+        results = [await self._write_messages(sid, self._pending_messages.pop(sid, {}))
+                   for sid in session_ids]
+        
+        # Let writes already in flight finish too
+        tasks = [task for sid, task in self._flush_tasks.items() if session_id is None or sid == session_id]
+        if tasks:
+            results.extend(await asyncio.gather(*tasks, return_exceptions=True))
+        return all(result is True for result in results)
+    
     async def load_chat_history(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
         """
         Load chat history for a session from Firebase.
         
+        The session's messages are decrypted one by one and reassembled in
+        order. Histories stored as a single encrypted list are still read.
+        
         Args:
             session_id: The session ID.
             
@@ -504,6 +708,10 @@ class FirebaseStorage:
             return None
         
         try:
+            # Writes still waiting would be missing from what is read back
+            if session_id in self._pending_messages or session_id in self._flush_tasks:
+                await self.flush(session_id)
+            
             # Load from Firebase using the helper method
             data = await self._firebase_request('get', f"/chat_history/{session_id}")
             
@@ -513,7 +721,13 @@ class FirebaseStorage:
             
             # Decrypt the messages
             try:
-                messages = self._decrypt_data(data["messages"])
+                stored = data["messages"]
+                if isinstance(stored, str):
+                    messages = self._decrypt_data(stored)
+                else:
+                    messages = [self._decrypt_data(stored[key]) for key in sorted(stored)]
+                    # Appends queued while loading already count past the stored messages
+                    self._message_counts[session_id] = max(self._message_counts.get(session_id, 0), len(messages))
                 logger.debug(f"Loaded chat history for session {session_id} from Firebase")
                 return messages
             except Exception as e:
@@ -547,6 +761,10 @@ class FirebaseStorage:
             return True  # Pretend success to avoid errors
         
         try:
+            # Drop queued writes so they do not recreate the history
+            self._pending_messages.pop(session_id, None)
+            self._message_counts.pop(session_id, None)
+            
             # Delete from Firebase using the helper method
             result = await self._firebase_request('delete', f"/chat_history/{session_id}")
             
@@ -0,0 +1,190 @@
+"""
+Tool result projection for the GIS AI Agent.
+
+This module reduces tool results to the compact structures that are sent back
+to the model as function responses. Tools with bulky outputs register a
+projection that keeps the fields the model needs; every result is then
+compacted generically so long lists, long strings and deep nesting cannot
+blow up the prompt.
+"""
+
+import json
+import logging
+from collections import Counter
+from typing import Dict, Any, Callable
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Default limits, overridable through tools.tool_config.result_projection
+DEFAULT_MAX_CHARS = 4000
+DEFAULT_MAX_LIST_ITEMS = 12
+DEFAULT_MAX_STRING_CHARS = 400
+MAX_DEPTH = 6
+
+# Per-tool projection functions, keyed by tool name
+_projections: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+
+
+def register_projection(tool_name: str, projection: Callable[[Dict[str, Any]], Dict[str, Any]]) -> None:
+    """
+    Register a projection for a tool's results.
+
+    Args:
+        tool_name: Name of the tool.
+        projection: Function mapping the raw result dict to a smaller dict.
+    """
+    _projections[tool_name] = projection
+
+
+def compact_value(value: Any,
+                  max_list_items: int = DEFAULT_MAX_LIST_ITEMS,
+                  max_string_chars: int = DEFAULT_MAX_STRING_CHARS,
+                  depth: int = 0) -> Any:
+    """
+    Shorten lists and strings and drop empty values, recursively.
+
+    Args:
+        value: JSON-compatible value.
+        max_list_items: Items kept from each list; the number omitted is recorded.
+        max_string_chars: Characters kept from each string.
+        depth: Current nesting depth.
+
+    Returns:
+        The compacted value.
+    """
+    if isinstance(value, str):
+        if len(value) > max_string_chars:
+            return value[:max_string_chars] + f"... [{len(value) - max_string_chars} more chars]"
+        return value
+
+    if depth >= MAX_DEPTH and isinstance(value, (dict, list)):
+        return f"[{type(value).__name__} with {len(value)} items omitted]"
+
+    if isinstance(value, dict):
+        return {
+            key: compact_value(item, max_list_items, max_string_chars, depth + 1)
+            for key, item in value.items()
+            if item is not None and item != "" and item != [] and item != {}
+        }
+
+    if isinstance(value, list):
+        items = [compact_value(item, max_list_items, max_string_chars, depth + 1)
+                 for item in value[:max_list_items]]
+        if len(value) > max_list_items:
+            items.append(f"... {len(value) - max_list_items} more items omitted")
+        return items
+
+    return value
+
+
+def _project_weather_forecast(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Collapse 3-hourly forecast entries into one summary per day."""
+    data = result.get("result", result)
+    if not isinstance(data, dict) or not isinstance(data.get("forecast"), list):
+        return result
+
+    days: Dict[str, Dict[str, Any]] = {}
+    for entry in data["forecast"]:
+        date = str(entry.get("date_time", ""))[:10] or "unknown"
+        temperature = entry.get("temperature", {})
+        day = days.setdefault(date, {
+            "date": date,
+            "temp_min": temperature.get("min"),
+            "temp_max": temperature.get("max"),
+            "unit": temperature.get("unit"),
+            "precipitation_probability_max": 0,
+            "humidity_max": 0,
+            "wind_speed_max": 0,
+            "_conditions": Counter()
+        })
+        if temperature.get("min") is not None:
+            day["temp_min"] = min(day["temp_min"], temperature["min"]) if day["temp_min"] is not None else temperature["min"]
+        if temperature.get("max") is not None:
+            day["temp_max"] = max(day["temp_max"], temperature["max"]) if day["temp_max"] is not None else temperature["max"]
+        day["precipitation_probability_max"] = max(day["precipitation_probability_max"],
+                                                   entry.get("precipitation", {}).get("probability", 0) or 0)
+        day["humidity_max"] = max(day["humidity_max"], entry.get("humidity", {}).get("value", 0) or 0)
+        day["wind_speed_max"] = max(day["wind_speed_max"], entry.get("wind", {}).get("speed", 0) or 0)
+        description = entry.get("weather", {}).get("description")
+        if description:
+            day["_conditions"][description] += 1
+
+    daily = []
+    for day in days.values():
+        conditions = day.pop("_conditions")
+        day["conditions"] = [description for description, _ in conditions.most_common(2)]
+        daily.append(day)
+
+    return {"location": data.get("location"), "daily": daily}
+
+
+def _project_air_quality(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten pollutant readings to plain values."""
+    data = result.get("result", result)
+    if not isinstance(data, dict) or not isinstance(data.get("pollutants"), dict):
+        return result
+
+    projected = {key: value for key, value in data.items() if key != "pollutants"}
+    projected["pollutants_ug_m3"] = {
+        name: reading.get("value") if isinstance(reading, dict) else reading
+        for name, reading in data["pollutants"].items()
+    }
+    return projected
+
+
+register_projection("get_weather_forecast", _project_weather_forecast)
+register_projection("get_air_quality", _project_air_quality)
+
+
+def project_tool_result(tool_name: str,
+                        result: Any,
+                        max_chars: int = DEFAULT_MAX_CHARS,
+                        max_list_items: int = DEFAULT_MAX_LIST_ITEMS,
+                        max_string_chars: int = DEFAULT_MAX_STRING_CHARS) -> Dict[str, Any]:
+    """
+    Reduce a tool result to a compact dict for a function response.
+
+    Args:
+        tool_name: Name of the tool that produced the result.
+        result: The raw tool result.
+        max_chars: Upper bound on the serialized size of the projection.
+        max_list_items: Items kept from each list.
+        max_string_chars: Characters kept from each string.
+
+    Returns:
+        A JSON-compatible dict no larger than max_chars when serialized.
+    """
+    # Round-trip through JSON so the projection only sees plain types
+    try:
+        value = json.loads(json.dumps(result, default=str))
+    except (TypeError, ValueError):
+        value = str(result)
+    if not isinstance(value, dict):
+        value = {"result": value}
+
+    projection = _projections.get(tool_name)
+    if projection and "error" not in value:
+        try:
+            value = projection(value)
+        except Exception as e:
+            logger.warning(f"Projection for {tool_name} failed, using generic compaction: {e}")
+
+    # Tighten the list limit until the result fits
+    list_items = max_list_items
+    while True:
+        projected = compact_value(value, list_items, max_string_chars)
+        serialized = json.dumps(projected, separators=(",", ":"))
+        if len(serialized) <= max_chars or list_items <= 1:
+            break
+        list_items //= 2
+
+    if len(serialized) > max_chars:
+        projected = {"truncated": True, "preview": serialized[:max_chars]}
+
+    return projected
+
+
+def serialized_size(value: Any) -> int:
+    """Return the length of a value serialized as compact JSON."""
+    return len(json.dumps(value, separators=(",", ":"), default=str))
@@ -5,13 +5,20 @@ This module provides security features such as input validation, rate limiting,
 and protection against common security vulnerabilities.
 """
 
+import os
+import hmac
 import time
+import hashlib
 import logging
 import asyncio
-from typing import Dict, Any, Optional, Callable, TypeVar, cast, List, Type
+import secrets
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional, Callable, TypeVar, cast, List, Type, Deque, Tuple
 from pydantic import BaseModel, ValidationError
 import json
 
+from .shared_state import SharedStateBackend, get_shared_state_backend
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -19,10 +26,42 @@ logger = logging.getLogger(__name__)
 T = TypeVar('T')
 
 
+class _Bucket:
+    """Token bucket state for one client."""
+    
+    __slots__ = ("tokens", "updated", "waiters")
+    
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+        # FIFO of waiting coroutines, created on first wait
+        self.waiters: Optional[Deque[asyncio.Event]] = None
+
+
 class RateLimiter:
-    """Rate limiter with token bucket algorithm for API protection."""
+    """
+    Rate limiter with token bucket algorithm for API protection.
+    
+    Buckets are kept in least-recently-used order and swept periodically:
+    once a client has been idle long enough for its bucket to refill
+    completely, the bucket is indistinguishable from a new one and is
+    dropped, so memory follows the number of recently active clients.
+    Clients waiting in wait_for_token are served in arrival order.
     
-    def __init__(self, rate: float, per: float, burst: int = 1):
+    With a shared state backend, tokens are taken from buckets shared by
+    all worker processes, so the limit holds across the whole deployment.
+    The local buckets then only order waiters and stand in for the shared
+    ones if the backend fails. Backend calls block, so code running on the
+    event loop uses acquire, which makes them in a worker thread; sweeps
+    delete this limiter's idle shared buckets the same way.
+    """
+    
+    def __init__(self, rate: float, per: float, burst: int = 1,
+                 idle_ttl: Optional[float] = None,
+                 sweep_interval: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 backend: Optional[SharedStateBackend] = None,
+                 name: str = "default"):
         """
         Initialize the rate limiter.
         
@@ -30,43 +69,137 @@ class RateLimiter:
             rate: Number of requests allowed in the time period.
             per: Time period in seconds.
             burst: Maximum token bucket size (bursts allowed).
+            idle_ttl: Seconds of inactivity after which a client's bucket is dropped.
+                      Never less than the time a bucket takes to refill completely.
+            sweep_interval: Seconds between sweeps for idle buckets. Defaults to a quarter of idle_ttl.
+            clock: Monotonic time source in seconds.
+            backend: Shared state holding the buckets of all processes. If None, buckets are per process.
+            name: Name that keeps this limiter's shared buckets apart from other limiters'.
         """
         self.rate = rate
         self.per = per
         self.burst = burst
-        self.tokens: Dict[str, float] = {}  # client_id -> tokens
-        self.last_refill: Dict[str, float] = {}  # client_id -> last_refill_time
+        self.fill_rate = rate / per  # tokens per second
+        
+        refill_time = burst / self.fill_rate
+        self.idle_ttl = max(idle_ttl or 0.0, refill_time)
+        self.sweep_interval = sweep_interval if sweep_interval is not None else self.idle_ttl / 4
+        self.clock = clock
+        self.backend = backend
+        self.name = name
+        
+        # client_id -> bucket, least recently used first
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self._next_sweep = clock() + self.sweep_interval
+        
+        self.stats = {
+            "allowed": 0,
+            "limited": 0,
+            "expired_clients": 0,
+            "backend_errors": 0
+        }
+    
+    def __len__(self) -> int:
+        """Number of clients currently tracked."""
+        return len(self._buckets)
     
-    def _refill_tokens(self, client_id: str) -> None:
+    def _get_bucket(self, client_id: str, now: float) -> _Bucket:
         """
-        Refill tokens based on time elapsed since last refill.
+        Get a client's bucket refilled up to now, creating it if needed.
         
         Args:
             client_id: The client identifier.
+            now: Current clock time.
+            
+        Returns:
+            The client's bucket.
         """
-        now = time.time()
+        if now >= self._next_sweep:
+            self._sweep(now)
         
-        # If client not seen before, initialize tokens
-        if client_id not in self.tokens:
-            self.tokens[client_id] = self.burst
-            self.last_refill[client_id] = now
-            return
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = _Bucket(self.burst, now)
+            self._buckets[client_id] = bucket
+            return bucket
         
-        # Calculate time since last refill
-        last_time = self.last_refill[client_id]
-        time_passed = now - last_time
+        self._buckets.move_to_end(client_id)
+        self._refill(bucket, now)
+        return bucket
+    
+    def _refill(self, bucket: _Bucket, now: float) -> None:
+        """Add the tokens earned since the bucket was last updated."""
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.fill_rate)
+        bucket.updated = now
+    
+    def _sweep(self, now: float) -> None:
+        """Drop the buckets of clients idle for longer than idle_ttl."""
+        self._next_sweep = now + self.sweep_interval
+        cutoff = now - self.idle_ttl
         
-        # Calculate tokens to add
-        new_tokens = time_passed * (self.rate / self.per)
+        # Buckets are in last-use order, so stop at the first recent one
+        while self._buckets:
+            client_id, bucket = next(iter(self._buckets.items()))
+            if bucket.updated > cutoff:
+                break
+            if bucket.waiters:
+                # Clients with waiting requests stay; treat the sweep as a use
+                self._refill(bucket, now)
+                self._buckets.move_to_end(client_id)
+                continue
+            del self._buckets[client_id]
+            self.stats["expired_clients"] += 1
         
-        # Update tokens (capped at burst limit)
-        self.tokens[client_id] = min(self.burst, self.tokens[client_id] + new_tokens)
-        self.last_refill[client_id] = now
+        if self.backend is not None:
+            self._sweep_backend()
+    
+    def _sweep_backend(self) -> None:
+        """Delete this limiter's idle shared buckets, off the event loop when one is running."""
+        def delete_idle() -> None:
+            try:
+                self.backend.delete_idle_buckets(self.idle_ttl, prefix=f"{self.name}:")
+            except Exception as e:
+                self.stats["backend_errors"] += 1
+                logger.warning(f"Could not delete idle shared rate limit buckets: {e}")
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            delete_idle()
+        else:
+            loop.run_in_executor(None, delete_idle)
     
     def can_request(self, client_id: str, tokens: float = 1.0) -> bool:
         """
         Check if a client can make a request.
         
+        Requests are refused while other requests of the client are waiting
+        in wait_for_token, so waiters are not overtaken.
+        
+        Args:
+            client_id: The client identifier.
+            tokens: Number of tokens to consume for this request.
+            
+        Returns:
+            True if the request is allowed, False otherwise.
+        """
+        bucket = self._get_bucket(client_id, self.clock())
+        
+        if not bucket.waiters and self._take(client_id, bucket, tokens)[0]:
+            self.stats["allowed"] += 1
+            return True
+        
+        self.stats["limited"] += 1
+        return False
+    
+    async def acquire(self, client_id: str, tokens: float = 1.0) -> bool:
+        """
+        Check if a client can make a request, without blocking the event loop.
+        
+        Behaves like can_request, but the shared state backend is called in
+        a worker thread, so a contended lock or a slow server delays only
+        this request.
+        
         Args:
             client_id: The client identifier.
             tokens: Number of tokens to consume for this request.
@@ -74,43 +207,119 @@ class RateLimiter:
         Returns:
             True if the request is allowed, False otherwise.
         """
-        self._refill_tokens(client_id)
+        bucket = self._get_bucket(client_id, self.clock())
         
-        if self.tokens[client_id] >= tokens:
-            self.tokens[client_id] -= tokens
+        if not bucket.waiters and (await self._take_async(client_id, bucket, tokens))[0]:
+            self.stats["allowed"] += 1
             return True
         
+        self.stats["limited"] += 1
         return False
     
+    def _take(self, client_id: str, bucket: _Bucket, tokens: float) -> Tuple[bool, float]:
+        """
+        Take tokens from the shared bucket, or from the local one without a backend.
+        
+        Args:
+            client_id: The client identifier.
+            bucket: The client's local bucket, refilled up to now.
+            tokens: Number of tokens to take.
+            
+        Returns:
+            Tuple of (taken, seconds until enough tokens are available).
+        """
+        if self.backend is not None:
+            try:
+                return self.backend.take_tokens(f"{self.name}:{client_id}", self.fill_rate, self.burst, tokens)
+            except Exception as e:
+                self._backend_failed(e)
+        return self._take_local(bucket, tokens)
+    
+    async def _take_async(self, client_id: str, bucket: _Bucket, tokens: float) -> Tuple[bool, float]:
+        """Like _take, with the shared state backend called in a worker thread."""
+        if self.backend is not None:
+            try:
+                return await asyncio.to_thread(
+                    self.backend.take_tokens, f"{self.name}:{client_id}", self.fill_rate, self.burst, tokens
+                )
+            except Exception as e:
+                self._backend_failed(e)
+        return self._take_local(bucket, tokens)
+    
+    def _backend_failed(self, error: Exception) -> None:
+        """Count a failed backend call; the per-process bucket is used instead."""
+        self.stats["backend_errors"] += 1
+        logger.warning(f"Shared rate limit unavailable, using the per-process limit: {error}")
+    
+    def _take_local(self, bucket: _Bucket, tokens: float) -> Tuple[bool, float]:
+        """Take tokens from the client's per-process bucket."""
+        if bucket.tokens >= tokens:
+            bucket.tokens -= tokens
+            return True, 0.0
+        return False, (tokens - bucket.tokens) / self.fill_rate
+    
     async def wait_for_token(self, client_id: str, tokens: float = 1.0) -> bool:
         """
         Wait until a token is available for the client.
         
+        Waiting requests of a client are granted in the order they arrived.
+        
         Args:
             client_id: The client identifier.
             tokens: Number of tokens needed.
             
         Returns:
-            True if a token became available, False on error.
+            True if a token became available, False on error or if the
+            request needs more tokens than the bucket can hold.
         """
         # Check if we can request immediately
-        if self.can_request(client_id, tokens):
+        if await self.acquire(client_id, tokens):
             return True
         
-        # If not, calculate how long to wait until enough tokens are available
-        current_tokens = self.tokens[client_id]
-        tokens_needed = tokens - current_tokens
-        seconds_to_wait = tokens_needed / (self.rate / self.per)
+        if tokens > self.burst:
+            logger.warning(f"Request for {tokens} tokens exceeds the burst size of {self.burst}")
+            return False
+        
+        bucket = self._get_bucket(client_id, self.clock())
+        if bucket.waiters is None:
+            bucket.waiters = deque()
+        turn = asyncio.Event()
+        bucket.waiters.append(turn)
         
         try:
-            logger.debug(f"Rate limit hit for {client_id}, waiting {seconds_to_wait:.2f}s")
-            await asyncio.sleep(seconds_to_wait)
-            
-            # Verify we can now request
-            return self.can_request(client_id, tokens)
+            while True:
+                # Wait until every earlier request has been served
+                if bucket.waiters[0] is not turn:
+                    await turn.wait()
+                    turn.clear()
+                    continue
+                
+                bucket = self._get_bucket(client_id, self.clock())
+                taken, seconds_to_wait = await self._take_async(client_id, bucket, tokens)
+                if taken:
+                    self.stats["allowed"] += 1
+                    return True
+                
+                logger.debug(f"Rate limit hit for {client_id}, waiting {seconds_to_wait:.2f}s")
+                await asyncio.sleep(seconds_to_wait)
         except Exception as e:
             logger.error(f"Error waiting for rate limit: {e}")
             return False
+        finally:
+            # Leave the queue and hand the turn to the next waiter
+            bucket.waiters.remove(turn)
+            if bucket.waiters:
+                bucket.waiters[0].set()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get rate limiter statistics.
+        
+        Returns:
+            Dictionary with allowed and limited request counts, expired
+            clients and the number of clients currently tracked.
+        """
+        return dict(self.stats, clients=len(self._buckets))
 
 
 class InputValidator:
@@ -164,12 +373,59 @@ class InputValidator:
             return None
 
 
+class SessionTokenSigner:
+    """
+    Issues and checks the tokens that prove a client owns a session ID.
+    
+    A token is an HMAC of the session ID under a server secret, so nothing
+    is stored per session and every worker configured with the same secret
+    accepts the tokens of the others.
+    """
+    
+    def __init__(self, secret: bytes):
+        """
+        Initialize the signer.
+        
+        Args:
+            secret: Key of the HMAC.
+        """
+        self._secret = secret
+    
+    def issue(self, session_id: str) -> str:
+        """
+        Create the token of a session.
+        
+        Args:
+            session_id: The session ID.
+            
+        Returns:
+            The token, as hex.
+        """
+        return hmac.new(self._secret, session_id.encode("utf-8"), hashlib.sha256).hexdigest()
+    
+    def verify(self, session_id: Optional[str], token: Optional[str]) -> bool:
+        """
+        Check a token presented for a session.
+        
+        Args:
+            session_id: The session ID.
+            token: The token the client sent.
+            
+        Returns:
+            True if the token was issued for the session.
+        """
+        if not session_id or not token:
+            return False
+        return hmac.compare_digest(self.issue(session_id), token)
+
+
 # Message models for validation
 class QueryMessage(BaseModel):
     """Model for query messages."""
     type: str = "query"
     query: str
     session_id: Optional[str] = None
+    stream: bool = False
 
 
 class ToolCallMessage(BaseModel):
@@ -178,6 +434,7 @@ class ToolCallMessage(BaseModel):
     tool_name: str
     arguments: Dict[str, Any]
     session_id: Optional[str] = None
+    stream: bool = False
 
 
 class ClearHistoryMessage(BaseModel):
@@ -186,21 +443,67 @@ class ClearHistoryMessage(BaseModel):
     session_id: Optional[str] = None
 
 
-# Create rate limiter instances for different operations
-_query_rate_limiter = RateLimiter(rate=10, per=60, burst=15)  # 10 queries per minute, burst of 15
-_tool_call_rate_limiter = RateLimiter(rate=20, per=60, burst=25)  # 20 tool calls per minute, burst of 25
+class FetchResultMessage(BaseModel):
+    """Model for messages fetching a tool result sent by reference."""
+    type: str = "fetch_result"
+    ref: str
+    session_id: Optional[str] = None
+
+
+# Rate limiter instances for different operations, created on first use
+# so they pick up the configured shared state backend
+_query_rate_limiter = None
+_tool_call_rate_limiter = None
 
 
 def get_query_rate_limiter() -> RateLimiter:
     """Get the query rate limiter instance."""
+    global _query_rate_limiter
+    if _query_rate_limiter is None:
+        # 10 queries per minute, burst of 15
+        _query_rate_limiter = RateLimiter(rate=10, per=60, burst=15,
+                                          backend=get_shared_state_backend(), name="query")
     return _query_rate_limiter
 
 
 def get_tool_call_rate_limiter() -> RateLimiter:
     """Get the tool call rate limiter instance."""
+    global _tool_call_rate_limiter
+    if _tool_call_rate_limiter is None:
+        # 20 tool calls per minute, burst of 25
+        _tool_call_rate_limiter = RateLimiter(rate=20, per=60, burst=25,
+                                              backend=get_shared_state_backend(), name="tool_call")
     return _tool_call_rate_limiter
 
 
+_session_token_signer = None
+
+
+def get_session_token_signer() -> SessionTokenSigner:
+    """
+    Get the session token signer instance.
+    
+    The secret comes from the SESSION_TOKEN_SECRET environment variable or
+    server.security.session_token_secret. Without one a random secret is
+    used, and sessions can then only be resumed on the same worker.
+    """
+    global _session_token_signer
+    if _session_token_signer is None:
+        secret = os.environ.get("SESSION_TOKEN_SECRET")
+        if not secret:
+            try:
+                from ..config import get_config
+                server_config = get_config().get_server_config().get("server", {}) or {}
+                secret = (server_config.get("security", {}) or {}).get("session_token_secret")
+            except Exception as e:
+                logger.warning(f"Could not load the session token secret: {e}")
+        if not secret:
+            logger.warning("No session token secret configured, sessions can only be resumed on this worker")
+            secret = secrets.token_hex(32)
+        _session_token_signer = SessionTokenSigner(secret.encode("utf-8"))
+    return _session_token_signer
+
+
 # Validator instance
 input_validator = InputValidator()
 
@@ -0,0 +1,158 @@
+"""
+Session snapshots for the GIS AI Agent.
+
+When a WebSocket session hibernates, its chat history, running summary and
+recent tool results are saved as a snapshot so a client reconnecting with
+the same session ID continues where it left off, instead of the model
+re-deriving the context and re-running tools. Snapshots are kept in the
+cache (shared between workers when a shared state backend is configured)
+for as long as hibernated sessions are kept, and chat messages are also
+written to Firebase when it is configured, which outlives the cache.
+"""
+
+import json
+import logging
+from typing import Dict, Any, Optional
+
+from ..config import get_config
+from .cache import AsyncCache, get_async_cache
+from .firebase_storage import FirebaseStorage, get_firebase_storage
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Seconds a snapshot is kept when not configured; matches the hibernation timeout
+DEFAULT_SNAPSHOT_TTL = 7200
+
+
+class SessionSnapshotStore:
+    """
+    Saves and loads session snapshots.
+
+    Loading tries the cache first and falls back to the chat history stored
+    in Firebase, which holds messages only.
+    """
+
+    def __init__(self,
+                 cache: AsyncCache,
+                 ttl: int = DEFAULT_SNAPSHOT_TTL,
+                 firebase: Optional[FirebaseStorage] = None):
+        """
+        Initialize the snapshot store.
+
+        Args:
+            cache: Cache that holds the snapshots.
+            ttl: Seconds a snapshot is kept.
+            firebase: Optional Firebase storage used as the fallback.
+        """
+        self.cache = cache
+        self.ttl = ttl
+        self.firebase = firebase
+
+        self.stats = {
+            "saved": 0,
+            "cache_hits": 0,
+            "firebase_hits": 0,
+            "misses": 0
+        }
+
+    def _key(self, session_id: str) -> Dict[str, str]:
+        return {"session_snapshot": session_id}
+
+    def _firebase_enabled(self) -> bool:
+        return self.firebase is not None and not self.firebase.disabled
+
+    async def save(self, session_id: str, snapshot: Optional[Dict[str, Any]]) -> bool:
+        """
+        Save a session snapshot.
+
+        Args:
+            session_id: The session ID.
+            snapshot: Snapshot from ChatHistory.export_session; None is ignored.
+
+        Returns:
+            True if the snapshot was saved.
+        """
+        if not snapshot:
+            return False
+
+        # Tool results may hold values JSON cannot encode; store them as text
+        snapshot = json.loads(json.dumps(snapshot, default=str))
+        saved = await self.cache.set(self._key(session_id), snapshot, ttl=self.ttl)
+
+        if self._firebase_enabled():
+            # The messages are the token budget window, not an append-only log, so replace the stored copy
+            await self.firebase.replace_chat_history(session_id, snapshot["messages"])
+
+        if saved:
+            self.stats["saved"] += 1
+        return saved
+
+    async def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a session snapshot.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The snapshot, a snapshot holding only the messages stored in
+            Firebase, or None if the session is unknown.
+        """
+        snapshot = await self.cache.get(self._key(session_id))
+        if snapshot is not None:
+            self.stats["cache_hits"] += 1
+            return snapshot
+
+        if self._firebase_enabled():
+            messages = await self.firebase.load_chat_history(session_id)
+            if messages:
+                self.stats["firebase_hits"] += 1
+                return {"messages": messages}
+
+        self.stats["misses"] += 1
+        return None
+
+    async def delete(self, session_id: str) -> None:
+        """
+        Delete a session's snapshot, so a cleared conversation is not restored.
+
+        Args:
+            session_id: The session ID.
+        """
+        await self.cache.delete(self._key(session_id))
+        if self._firebase_enabled():
+            await self.firebase.delete_chat_history(session_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get snapshot statistics.
+
+        Returns:
+            Counts of saved snapshots and of loads by source.
+        """
+        return dict(self.stats)
+
+
+_session_snapshot_store = None
+
+
+def get_session_snapshot_store() -> SessionSnapshotStore:
+    """
+    Get the session snapshot store instance.
+
+    Snapshots are kept for server.websocket.snapshot_ttl seconds.
+    """
+    global _session_snapshot_store
+
+    if _session_snapshot_store is None:
+        try:
+            server_config = get_config().get_server_config().get("server", {}) or {}
+            ttl = (server_config.get("websocket", {}) or {}).get("snapshot_ttl", DEFAULT_SNAPSHOT_TTL)
+        except Exception as e:
+            logger.warning(f"Could not load session snapshot configuration, using defaults: {e}")
+            ttl = DEFAULT_SNAPSHOT_TTL
+
+        _session_snapshot_store = SessionSnapshotStore(get_async_cache(), ttl=ttl, firebase=get_firebase_storage())
+
+    return _session_snapshot_store
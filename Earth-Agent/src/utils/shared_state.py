@@ -0,0 +1,357 @@
+"""
+Shared state backends for the GIS AI Agent.
+
+Rate limiters and caches are per process by default, so running several
+workers multiplies the limits and splits the caches. A shared state backend
+holds rate limit buckets and cache entries where every worker sees them:
+
+- SQLiteStateBackend: a SQLite database file shared by the workers of one host.
+- RedisStateBackend: a Redis server shared by every host.
+
+Both expose the disk tier interface of SQLiteDiskStore, so either can serve
+as the second tier of a Cache, plus an atomic token bucket for RateLimiter.
+The backend is chosen in server_config.yaml (shared_state).
+
+Backend calls are blocking; callers on the event loop run them in a thread.
+"""
+
+import json
+import time
+import logging
+import sqlite3
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, List
+
+from .cache import SQLiteDiskStore
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Namespace of all keys written to a shared server
+DEFAULT_KEY_PREFIX = "earth-agent:"
+
+# Attempts at an optimistic bucket update before giving up on a contended key
+MAX_BUCKET_RETRIES = 16
+
+# Directory that relative shared_state paths are resolved against
+AGENT_DIR = Path(__file__).parent.parent.parent
+
+
+def refill_bucket(tokens: float, updated: float, now: float,
+                  fill_rate: float, burst: float) -> float:
+    """
+    Compute the tokens in a bucket after refilling it up to now.
+
+    Args:
+        tokens: Tokens at the last update.
+        updated: Time of the last update.
+        now: Current time.
+        fill_rate: Tokens earned per second.
+        burst: Bucket capacity.
+
+    Returns:
+        The current number of tokens.
+    """
+    return min(burst, tokens + max(0.0, now - updated) * fill_rate)
+
+
+class SharedStateBackend(ABC):
+    """
+    Interface of a shared state backend.
+
+    Cache entries are (serialised value, absolute expiry) pairs as in
+    SQLiteDiskStore. Token buckets are identified by key and updated
+    atomically across all processes using the backend.
+    """
+
+    @abstractmethod
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """Get an unexpired cache entry as (serialised value, expiry)."""
+
+    @abstractmethod
+    def set_many(self, rows: List[Tuple[str, str, float, float]]) -> None:
+        """Insert or replace cache entries given as (key, serialised value, expiry, created_at)."""
+
+    def set(self, key: str, payload: str, expiry: float, created_at: Optional[float] = None) -> None:
+        """Insert or replace a single cache entry."""
+        self.set_many([(key, payload, expiry, time.time() if created_at is None else created_at)])
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """Delete a cache entry."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Delete all cache entries."""
+
+    @abstractmethod
+    def delete_expired(self, now: Optional[float] = None) -> int:
+        """Delete expired cache entries and return how many were removed."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of cache entries."""
+
+    @abstractmethod
+    def take_tokens(self, key: str, fill_rate: float, burst: float,
+                    tokens: float = 1.0, now: Optional[float] = None) -> Tuple[bool, float]:
+        """
+        Take tokens from a shared token bucket.
+
+        Args:
+            key: Bucket identifier.
+            fill_rate: Tokens earned per second.
+            burst: Bucket capacity; a new bucket starts full.
+            tokens: Tokens to take.
+            now: Current time, defaults to time.time().
+
+        Returns:
+            Tuple of (taken, retry_after): whether the tokens were taken and,
+            if not, the seconds until enough tokens are available.
+        """
+
+    def delete_idle_buckets(self, idle_seconds: float, prefix: str = "", now: Optional[float] = None) -> int:
+        """
+        Delete token buckets untouched for idle_seconds; a bucket that old has refilled completely.
+
+        Backends whose buckets expire by themselves keep this default.
+
+        Args:
+            idle_seconds: Seconds since the last update after which a bucket is deleted.
+            prefix: Only buckets whose key starts with this prefix are deleted.
+            now: Current time, defaults to time.time().
+
+        Returns:
+            Number of buckets removed.
+        """
+        return 0
+
+    def close(self) -> None:
+        """Release connections."""
+
+
+class SQLiteStateBackend(SQLiteDiskStore, SharedStateBackend):
+    """
+    Shared state in a SQLite database used by all workers on one host.
+
+    Cache entries use the SQLiteDiskStore table. Token buckets live in a
+    second table and are updated inside an immediate transaction, which
+    holds SQLite's write lock so concurrent workers serialise on it.
+    """
+
+    def __init__(self, db_path: Path):
+        """
+        Initialize the backend, creating the database if needed.
+
+        Args:
+            db_path: Path of the SQLite database file.
+        """
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(db_path)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            "key TEXT PRIMARY KEY, "
+            "tokens REAL NOT NULL, "
+            "updated REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def take_tokens(self, key: str, fill_rate: float, burst: float,
+                    tokens: float = 1.0, now: Optional[float] = None) -> Tuple[bool, float]:
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            available = burst if row is None else refill_bucket(row[0], row[1], now, fill_rate, burst)
+
+            taken = available >= tokens
+            if taken:
+                available -= tokens
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, available, now)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        return taken, 0.0 if taken else (tokens - available) / fill_rate
+
+    def delete_idle_buckets(self, idle_seconds: float, prefix: str = "", now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        conn = self._connection()
+        with conn:
+            return conn.execute(
+                "DELETE FROM rate_buckets WHERE updated <= ? AND substr(key, 1, ?) = ?",
+                (now - idle_seconds, len(prefix), prefix)
+            ).rowcount
+
+
+class RedisStateBackend(SharedStateBackend):
+    """
+    Shared state on a Redis server, for workers on several hosts.
+
+    Cache entries are strings holding the expiry and the serialised value,
+    written with a matching Redis expiry so the server drops them itself.
+    Token buckets are read and written in a WATCH/MULTI/EXEC transaction
+    and retried if another worker changed the bucket in between. Buckets
+    expire once they would have refilled completely.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", key_prefix: str = DEFAULT_KEY_PREFIX,
+                 socket_timeout: float = 2.0):
+        """
+        Initialize the backend.
+
+        Args:
+            url: Redis connection URL.
+            key_prefix: Prefix of every key written by the agent.
+            socket_timeout: Seconds to wait for the server on each call.
+        """
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The redis package is required for the Redis shared state backend") from e
+
+        self._watch_error = redis.WatchError
+        # RESP2 is understood by every Redis version and compatible server
+        self.client = redis.Redis.from_url(url, protocol=2, socket_timeout=socket_timeout,
+                                           socket_connect_timeout=socket_timeout)
+        self.key_prefix = key_prefix
+        self.url = url
+
+    def _cache_key(self, key: str) -> str:
+        return f"{self.key_prefix}cache:{key}"
+
+    def _bucket_key(self, key: str) -> str:
+        return f"{self.key_prefix}bucket:{key}"
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        now = time.time() if now is None else now
+        raw = self.client.get(self._cache_key(key))
+        if raw is None:
+            return None
+
+        expiry, _, payload = raw.decode().partition("\n")
+        if float(expiry) <= now:
+            return None
+        return payload, float(expiry)
+
+    def set_many(self, rows: List[Tuple[str, str, float, float]]) -> None:
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        for key, payload, expiry, _ in rows:
+            ttl_ms = int((expiry - now) * 1000)
+            if ttl_ms <= 0:
+                continue
+            pipe.set(self._cache_key(key), f"{expiry}\n{payload}", px=ttl_ms)
+        pipe.execute()
+
+    def delete(self, key: str) -> bool:
+        return self.client.delete(self._cache_key(key)) > 0
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=f"{self._cache_key('')}*", count=500))
+        for start in range(0, len(keys), 500):
+            self.client.delete(*keys[start:start + 500])
+
+    def delete_expired(self, now: Optional[float] = None) -> int:
+        # Redis removes expired keys itself
+        return 0
+
+    def count(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=f"{self._cache_key('')}*", count=500))
+
+    def take_tokens(self, key: str, fill_rate: float, burst: float,
+                    tokens: float = 1.0, now: Optional[float] = None) -> Tuple[bool, float]:
+        bucket_key = self._bucket_key(key)
+        # An untouched bucket is full again after this long, so it can expire
+        ttl_ms = max(1, int(burst / fill_rate * 1000))
+
+        with self.client.pipeline() as pipe:
+            for _ in range(MAX_BUCKET_RETRIES):
+                current = time.time() if now is None else now
+                try:
+                    pipe.watch(bucket_key)
+                    raw = pipe.get(bucket_key)
+                    if raw is None:
+                        available = burst
+                    else:
+                        stored_tokens, updated = map(float, raw.decode().split(":"))
+                        available = refill_bucket(stored_tokens, updated, current, fill_rate, burst)
+
+                    if available < tokens:
+                        # Nothing to write when the request is refused
+                        pipe.unwatch()
+                        return False, (tokens - available) / fill_rate
+
+                    pipe.multi()
+                    pipe.set(bucket_key, f"{available - tokens}:{current}", px=ttl_ms)
+                    pipe.execute()
+                    return True, 0.0
+                except self._watch_error:
+                    continue
+
+        logger.warning(f"Rate limit bucket {key} stayed contended for {MAX_BUCKET_RETRIES} attempts")
+        return False, 1.0 / fill_rate
+
+    def close(self) -> None:
+        self.client.close()
+
+
+_shared_state_backend: Optional[SharedStateBackend] = None
+_shared_state_loaded = False
+
+
+def create_shared_state_backend(settings: Dict[str, Any]) -> Optional[SharedStateBackend]:
+    """
+    Create a shared state backend from configuration.
+
+    Args:
+        settings: The shared_state section of server_config.yaml.
+
+    Returns:
+        The backend, or None for per-process state ("local").
+    """
+    backend = (settings.get("backend") or "local").lower()
+    if backend == "local":
+        return None
+    if backend == "sqlite":
+        # Relative paths are resolved against the Earth-Agent directory, not the working directory
+        path = Path(settings.get("path") or "data/shared_state.db")
+        return SQLiteStateBackend(path if path.is_absolute() else AGENT_DIR / path)
+    if backend == "redis":
+        return RedisStateBackend(
+            settings.get("url", "redis://localhost:6379/0"),
+            key_prefix=settings.get("key_prefix", DEFAULT_KEY_PREFIX),
+            socket_timeout=float(settings.get("socket_timeout", 2.0))
+        )
+    raise ValueError(f"Unknown shared state backend: {backend}")
+
+
+def get_shared_state_backend() -> Optional[SharedStateBackend]:
+    """
+    Get the configured shared state backend.
+
+    Returns:
+        The backend, or None when state is kept per process.
+    """
+    global _shared_state_backend, _shared_state_loaded
+
+    if not _shared_state_loaded:
+        _shared_state_loaded = True
+        try:
+            from ..config import get_config
+            settings = get_config().get_server_config().get("shared_state", {}) or {}
+            _shared_state_backend = create_shared_state_backend(settings)
+        except Exception as e:
+            logger.error(f"Could not set up shared state, keeping state per process: {e}")
+            _shared_state_backend = None
+        if _shared_state_backend is not None:
+            logger.info(f"Using shared state backend: {type(_shared_state_backend).__name__}")
+
+    return _shared_state_backend
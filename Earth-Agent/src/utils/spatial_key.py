@@ -0,0 +1,165 @@
+"""
+Spatial cache-key normalisation for the GIS AI Agent.
+
+Results of location-based tools such as weather and air quality barely change
+over a few hundred metres, so cache keys built from exact argument values miss
+whenever a map is panned or a nearby point is clicked. This module rewrites
+location arguments into canonical forms before they are hashed: coordinates
+snap to the cell of a geohash at a given precision, and place names are
+reduced to one spelling.
+"""
+
+import re
+import logging
+import unicodedata
+from typing import Dict, Any, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Geohash precision used when a tool is configured without one (~1.2 km x 0.6 km cells)
+DEFAULT_PRECISION = 6
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Argument names that hold a location as text ("lat,lon" or a place name)
+LOCATION_KEYS = ("location", "area", "place", "city")
+
+# Argument name pairs that hold a location as separate numbers
+COORDINATE_PAIRS = (("latitude", "longitude"), ("lat", "lon"), ("lat", "lng"))
+
+_COORDINATES_PATTERN = re.compile(r"^\s*([-+]?\d+(?:\.\d+)?)\s*,\s*([-+]?\d+(?:\.\d+)?)\s*$")
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = DEFAULT_PRECISION) -> str:
+    """
+    Encode coordinates as a geohash.
+
+    Args:
+        latitude: Latitude in degrees.
+        longitude: Longitude in degrees.
+        precision: Number of characters; each adds about 2.5 bits per axis.
+
+    Returns:
+        The geohash of the cell containing the point.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude, longitude first
+        value, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            bounds[0] = mid
+        else:
+            bits <<= 1
+            bounds[1] = mid
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def parse_coordinates(text: str) -> Optional[Tuple[float, float]]:
+    """
+    Parse a "lat,lon" string.
+
+    Args:
+        text: Text that may hold coordinates.
+
+    Returns:
+        (latitude, longitude), or None if the text is not valid coordinates.
+    """
+    match = _COORDINATES_PATTERN.match(text)
+    if not match:
+        return None
+
+    latitude, longitude = float(match.group(1)), float(match.group(2))
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+def canonical_place_name(name: str) -> str:
+    """
+    Reduce a place name to one spelling.
+
+    Case, Unicode form, surrounding and repeated whitespace and the spacing
+    around commas are normalised, so "  Paris ,France" and "paris, france"
+    match.
+
+    Args:
+        name: Place name.
+
+    Returns:
+        The canonical name.
+    """
+    name = unicodedata.normalize("NFKC", name).casefold()
+    parts = (" ".join(part.split()) for part in name.split(","))
+    return ", ".join(part for part in parts if part)
+
+
+def normalize_location(value: str, precision: int = DEFAULT_PRECISION) -> str:
+    """
+    Normalise a location argument given as text.
+
+    Args:
+        value: "lat,lon" coordinates or a place name.
+        precision: Geohash precision for coordinates.
+
+    Returns:
+        "geohash:<cell>" for coordinates, otherwise "place:<canonical name>".
+    """
+    coordinates = parse_coordinates(value)
+    if coordinates is not None:
+        return f"geohash:{geohash_encode(coordinates[0], coordinates[1], precision)}"
+    return f"place:{canonical_place_name(value)}"
+
+
+def normalize_arguments(arguments: Dict[str, Any], precision: int = DEFAULT_PRECISION) -> Dict[str, Any]:
+    """
+    Rewrite the location arguments of a tool call for use in a cache key.
+
+    Text locations are normalised with normalize_location, and numeric
+    latitude/longitude pairs are replaced by a single geohash. Nested
+    dictionaries are handled the same way. The input is not modified.
+
+    Args:
+        arguments: Arguments of the tool call.
+        precision: Geohash precision for coordinates.
+
+    Returns:
+        A new argument dictionary suitable for hashing.
+    """
+    normalized = dict(arguments)
+
+    for lat_key, lon_key in COORDINATE_PAIRS:
+        latitude, longitude = normalized.get(lat_key), normalized.get(lon_key)
+        if _is_number(latitude) and _is_number(longitude):
+            del normalized[lat_key], normalized[lon_key]
+            normalized["geohash"] = geohash_encode(float(latitude), float(longitude), precision)
+            break
+
+    for key, value in normalized.items():
+        if key in LOCATION_KEYS and isinstance(value, str):
+            normalized[key] = normalize_location(value, precision)
+        elif isinstance(value, dict):
+            normalized[key] = normalize_arguments(value, precision)
+
+    return normalized
+
+
+def _is_number(value: Any) -> bool:
+    """Check for an int or float that is not a bool."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
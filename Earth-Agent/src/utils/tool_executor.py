@@ -10,9 +10,11 @@ import asyncio
 import time
 import json
 import copy
-from typing import Dict, Any, List, Optional, Callable, Tuple, Union, Set
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple, Union, Set
 
-from .cache import get_tool_result_cache, async_cached
+from .cache import get_async_cache
+from .spatial_key import normalize_arguments
+from ..config import get_config
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -36,7 +38,47 @@ class ToolExecutor:
             tools: Dictionary of available tools.
         """
         self.tools = tools
-        self.cache = get_tool_result_cache()
+        # Non-blocking front end: memory hits inline, disk I/O off the event loop
+        self.cache = get_async_cache()
+        
+        # Single-flight: identical concurrent calls share one running task
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+        
+        # Stale-while-revalidate refreshes started without a waiting caller
+        self._background_refreshes: Set[asyncio.Future] = set()
+        self.tool_config = self._load_tool_config()
+        self.cache_policy = self.tool_config.get("cache_policy", {}) or {}
+        
+        # Keys whose last background refresh failed, and when; retried after the interval
+        self._failed_refreshes: Dict[str, float] = {}
+        self.refresh_retry_interval = float(self.tool_config.get("refresh_retry_interval", 30))
+        
+        # Geohash precision per tool whose location arguments are snapped in cache keys
+        self.spatial_precision = self.tool_config.get("spatial_cache", {}) or {}
+        
+        # Maximum number of independent pipeline steps running at once
+        self.pipeline_concurrency = int(self.tool_config.get("max_pipeline_concurrency", 4))
+        
+        # Limits and deadlines for execute_parallel
+        self.default_timeout = float(self.tool_config.get("max_execution_time", 120))
+        self.tool_timeouts = self.tool_config.get("tool_timeouts", {}) or {}
+        self.max_concurrent_per_tool = int(self.tool_config.get("max_concurrent_per_tool", 4))
+        self._global_semaphore = asyncio.Semaphore(int(self.tool_config.get("max_concurrent_calls", 16)))
+        self._tool_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.parallel_metrics: Dict[str, Dict[str, float]] = {}
+        
+        self.stats = {
+            "executions": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "stale_hits": 0,
+            "background_refreshes": 0,
+            "failed_refreshes": 0,
+            "coalesced_calls": 0,
+            "coalesced_errors": 0,
+            "cancelled_executions": 0
+        }
         
         logger.info(f"ToolExecutor initialized with {len(tools)} tools")
     
@@ -62,19 +104,71 @@ class ToolExecutor:
             return {"error": f"Tool not found: {tool_name}"}
         
         tool = self.tools[tool_name]
+        cache_key = self._generate_cache_key(tool_name, arguments)
         
         # Check cache if requested
         if use_cache and not force_refresh:
-            cache_key = self._generate_cache_key(tool_name, arguments)
-            cached_result = self.cache.get(cache_key)
+            cached_entry = await self.cache.get(cache_key)
             
-            if cached_result is not None:
-                logger.info(f"Using cached result for tool: {tool_name}")
+            if cached_entry is not None:
+                cached_result, fresh = self._unwrap_cached(cached_entry)
+                self.stats["cache_hits"] += 1
+                if fresh:
+                    logger.info(f"Using cached result for tool: {tool_name}")
+                else:
+                    # Past the soft TTL: answer now, refresh for the next caller
+                    logger.info(f"Using stale cached result for tool: {tool_name}, refreshing in background")
+                    self.stats["stale_hits"] += 1
+                    self._schedule_refresh(tool_name, tool, arguments, cache_key)
                 return cached_result
+            self.stats["cache_misses"] += 1
+        
+        if not use_cache:
+            return await self._run_tool(tool_name, tool, arguments, cache_key, use_cache)
+        
+        # Join an identical call that is already running instead of starting another
+        task = self._in_flight.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(self._run_tool(tool_name, tool, arguments, cache_key, use_cache))
+            self._in_flight[cache_key] = task
+            task.add_done_callback(lambda t, key=cache_key: self._release_in_flight(key, t))
+            coalesced = False
+        else:
+            logger.info(f"Coalescing call to tool {tool_name} with an in-flight identical call")
+            self.stats["coalesced_calls"] += 1
+            coalesced = True
         
-        # Execute the tool
+        result = await self._await_shared(cache_key, task)
+        if coalesced and isinstance(result, dict) and "error" in result:
+            self.stats["coalesced_errors"] += 1
+        return result
+    
+    async def _run_tool(self,
+                      tool_name: str,
+                      tool: Dict[str, Any],
+                      arguments: Dict[str, Any],
+                      cache_key: str,
+                      use_cache: bool,
+                      background: bool = False) -> Dict[str, Any]:
+        """
+        Run a tool function and cache its result.
+        
+        Args:
+            tool_name: Name of the tool to execute.
+            tool: The tool definition.
+            arguments: Arguments to pass to the tool.
+            cache_key: Cache key of the call.
+            use_cache: Whether to cache the result.
+            background: Whether this is a background refresh of a stale entry.
+                An error from a refresh is not cached, so the stale entry
+                keeps being served until a later refresh succeeds.
+            
+        Returns:
+            The tool result, or an error dictionary if the tool raised.
+        """
         try:
             start_time = time.time()
+            self.stats["executions"] += 1
             
             # Get the function from the tool
             tool_function = tool["function"]
@@ -85,103 +179,443 @@ class ToolExecutor:
             end_time = time.time()
             logger.info(f"Tool {tool_name} executed in {end_time - start_time:.2f}s")
             
+            if background:
+                if isinstance(result, dict) and "error" in result:
+                    self._record_failed_refresh(tool_name, cache_key, result["error"])
+                    return result
+                self._failed_refreshes.pop(cache_key, None)
+            
             # Cache the result if required
             if use_cache:
-                cache_key = self._generate_cache_key(tool_name, arguments)
-                # Determine TTL based on tool type
-                ttl = self._determine_cache_ttl(tool_name, result)
-                self.cache.set(cache_key, result, ttl)
+                # Fresh until the soft TTL, served stale until the hard TTL
+                soft_ttl, hard_ttl = self._determine_cache_policy(tool_name, result)
+                if hard_ttl > 0:
+                    entry = {"result": result, "fresh_until": time.time() + soft_ttl, "swr": True}
+                    await self.cache.set(cache_key, entry, hard_ttl)
             
             return result
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"Error executing tool {tool_name}: {e}")
+            if background:
+                self._record_failed_refresh(tool_name, cache_key, str(e))
             return {"error": str(e)}
     
+    def _record_failed_refresh(self, tool_name: str, cache_key: str, error: str) -> None:
+        """Remember a failed background refresh so it is retried only after the retry interval."""
+        logger.warning(f"Background refresh of {tool_name} failed, keeping the stale result: {error}")
+        self._failed_refreshes[cache_key] = time.monotonic()
+        self.stats["failed_refreshes"] += 1
+    
+    async def _await_shared(self, cache_key: str, task: asyncio.Future) -> Dict[str, Any]:
+        """
+        Wait for a shared tool task on behalf of one caller.
+        
+        A cancelled caller only stops waiting; the task keeps running for the
+        other callers and is cancelled once its last caller has gone.
+        
+        Args:
+            cache_key: Cache key the task is registered under.
+            task: The shared task.
+            
+        Returns:
+            The tool result.
+        """
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(task, 0) <= 1 and task not in self._background_refreshes:
+                # Nobody else is waiting; stop the work and let new calls start afresh
+                self._release_in_flight(cache_key, task)
+                task.cancel()
+                self.stats["cancelled_executions"] += 1
+            raise
+        finally:
+            remaining = self._waiters.get(task, 0) - 1
+            if remaining > 0:
+                self._waiters[task] = remaining
+            else:
+                self._waiters.pop(task, None)
+    
+    def _schedule_refresh(self,
+                          tool_name: str,
+                          tool: Dict[str, Any],
+                          arguments: Dict[str, Any],
+                          cache_key: str) -> None:
+        """
+        Re-run a tool in the background to replace a stale cache entry.
+        
+        Only one refresh runs per key; if a call for the key is already in
+        flight, its result will refresh the entry instead. After a failed
+        refresh the key is not refreshed again until the retry interval has
+        passed.
+        
+        Args:
+            tool_name: Name of the tool.
+            tool: The tool definition.
+            arguments: Arguments of the call.
+            cache_key: Cache key of the call.
+        """
+        if cache_key in self._in_flight:
+            return
+        
+        failed_at = self._failed_refreshes.get(cache_key)
+        if failed_at is not None and time.monotonic() - failed_at < self.refresh_retry_interval:
+            return
+        
+        task = asyncio.ensure_future(
+            self._run_tool(tool_name, tool, copy.deepcopy(arguments), cache_key, True, background=True)
+        )
+        self._in_flight[cache_key] = task
+        self._background_refreshes.add(task)
+        self.stats["background_refreshes"] += 1
+        task.add_done_callback(lambda t, key=cache_key: self._release_in_flight(key, t))
+    
+    def _release_in_flight(self, cache_key: str, task: asyncio.Future) -> None:
+        """Forget a finished or abandoned shared task."""
+        if self._in_flight.get(cache_key) is task:
+            del self._in_flight[cache_key]
+        if task.done():
+            self._waiters.pop(task, None)
+            self._background_refreshes.discard(task)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get execution statistics.
+        
+        Returns:
+            Dictionary with execution, cache hit and coalescing counters, the
+            cache hit rate, and per-tool queue wait and execution times from
+            execute_parallel.
+        """
+        parallel = {}
+        for tool_name, metrics in self.parallel_metrics.items():
+            calls = metrics["calls"] or 1
+            parallel[tool_name] = dict(
+                metrics,
+                queue_wait_avg=metrics["queue_wait_total"] / calls,
+                execution_avg=metrics["execution_total"] / calls
+            )
+        lookups = self.stats["cache_hits"] + self.stats["cache_misses"]
+        hit_rate = self.stats["cache_hits"] / lookups if lookups else 0.0
+        return dict(self.stats, cache_hit_rate=hit_rate, in_flight=len(self._in_flight), parallel=parallel)
+    
     async def execute_parallel(self, 
                              tools: List[Tuple[str, Dict[str, Any]]],
-                             use_cache: bool = True) -> Dict[str, Dict[str, Any]]:
+                             use_cache: bool = True,
+                             cancel_event: Optional[asyncio.Event] = None,
+                             on_complete: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None
+                             ) -> Dict[int, Dict[str, Any]]:
         """
         Execute multiple tools in parallel.
         
+        Calls are bounded by a global and a per-tool semaphore and each one
+        is given the tool's timeout. If cancel_event is set (for example when
+        the client disconnects) or the caller is cancelled, outstanding calls
+        are cancelled.
+        
         Args:
             tools: List of (tool_name, arguments) tuples.
             use_cache: Whether to use cached results if available.
+            cancel_event: Optional event that cancels outstanding calls when set.
+            on_complete: Optional coroutine called with (index, result) as each call finishes.
             
         Returns:
-            Dictionary mapping tool names to results.
+            Dictionary mapping each call's index in tools to its result.
         """
-        tasks = []
-        
-        # Create a task for each tool
-        for tool_name, arguments in tools:
-            task = asyncio.create_task(
-                self.execute_tool(tool_name, arguments, use_cache)
-            )
-            tasks.append((tool_name, task))
+        tasks = [
+            asyncio.create_task(self._execute_bounded(tool_name, arguments, use_cache))
+            for tool_name, arguments in tools
+        ]
+        if not tasks:
+            return {}
         
-        # Wait for all tasks to complete
         results = {}
-        for tool_name, task in tasks:
-            try:
-                result = await task
-                results[tool_name] = result
-            except Exception as e:
-                logger.error(f"Error in parallel execution of {tool_name}: {e}")
-                results[tool_name] = {"error": str(e)}
-        
-        return results
+        cancel_waiter = asyncio.create_task(cancel_event.wait()) if cancel_event is not None else None
+        try:
+            pending = set(tasks)
+            while pending:
+                waiting_on = pending | {cancel_waiter} if cancel_waiter else pending
+                done, _ = await asyncio.wait(waiting_on, return_when=asyncio.FIRST_COMPLETED)
+                if cancel_waiter in done:
+                    logger.info(f"Cancelling {len(pending)} outstanding tool calls")
+                    break
+                pending -= done
+                for task in done:
+                    index = tasks.index(task)
+                    results[index] = self._task_result(task, tools[index][0])
+                    if on_complete is not None:
+                        try:
+                            await on_complete(index, results[index])
+                        except Exception as e:
+                            logger.warning(f"Completion callback for {tools[index][0]} failed: {e}")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            if cancel_waiter is not None:
+                cancel_waiter.cancel()
+        
+        for index, (task, (tool_name, _)) in enumerate(zip(tasks, tools)):
+            if index not in results:
+                results[index] = self._task_result(task, tool_name)
+        
+        return dict(sorted(results.items()))
+    
+    def _task_result(self, task: asyncio.Task, tool_name: str) -> Dict[str, Any]:
+        """
+        Get the result of a parallel call's task.
+        
+        Args:
+            task: The task running the call.
+            tool_name: Name of the tool, for error messages.
+            
+        Returns:
+            The tool result, or an error dictionary if the task failed or was cancelled.
+        """
+        if task.cancelled() or not task.done():
+            return {"error": f"Tool call {tool_name} was cancelled"}
+        try:
+            return task.result()
+        except Exception as e:
+            logger.error(f"Error in parallel execution of {tool_name}: {e}")
+            return {"error": str(e)}
+    
+    async def _execute_bounded(self,
+                               tool_name: str,
+                               arguments: Dict[str, Any],
+                               use_cache: bool) -> Dict[str, Any]:
+        """
+        Execute one tool call under the concurrency limits and its timeout.
+        
+        Args:
+            tool_name: Name of the tool to execute.
+            arguments: Arguments to pass to the tool.
+            use_cache: Whether to use cached results if available.
+            
+        Returns:
+            The tool result, or an error dictionary on timeout.
+        """
+        tool_semaphore = self._tool_semaphores.get(tool_name)
+        if tool_semaphore is None:
+            tool_semaphore = self._tool_semaphores[tool_name] = asyncio.Semaphore(self.max_concurrent_per_tool)
+        
+        timeout = float(self.tool_timeouts.get(tool_name, self.default_timeout))
+        queued_at = time.monotonic()
+        
+        # Wait for the tool's own limit first so calls queued behind a busy
+        # tool do not hold global slots that other tools could use
+        async with tool_semaphore:
+            async with self._global_semaphore:
+                started_at = time.monotonic()
+                timed_out = False
+                try:
+                    return await asyncio.wait_for(
+                        self.execute_tool(tool_name, arguments, use_cache),
+                        timeout
+                    )
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    logger.warning(f"Tool {tool_name} timed out after {timeout:.0f}s")
+                    return {"error": f"Tool {tool_name} timed out after {timeout:.0f}s"}
+                finally:
+                    self._record_parallel_metrics(
+                        tool_name, started_at - queued_at, time.monotonic() - started_at, timed_out
+                    )
+    
+    def _record_parallel_metrics(self, tool_name: str, queue_wait: float, execution_time: float, timed_out: bool) -> None:
+        """Accumulate queue wait and execution time for a tool."""
+        metrics = self.parallel_metrics.setdefault(tool_name, {
+            "calls": 0,
+            "timeouts": 0,
+            "queue_wait_total": 0.0,
+            "queue_wait_max": 0.0,
+            "execution_total": 0.0,
+            "execution_max": 0.0
+        })
+        metrics["calls"] += 1
+        metrics["timeouts"] += int(timed_out)
+        metrics["queue_wait_total"] += queue_wait
+        metrics["queue_wait_max"] = max(metrics["queue_wait_max"], queue_wait)
+        metrics["execution_total"] += execution_time
+        metrics["execution_max"] = max(metrics["execution_max"], execution_time)
     
     async def execute_pipeline(self, 
                              pipeline: List[Dict[str, Any]],
-                             use_cache: bool = True) -> List[Dict[str, Any]]:
+                             use_cache: bool = True,
+                             max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
         """
-        Execute a pipeline of tools in sequence, where the output of one tool
-        can be used as input to the next.
+        Execute a pipeline of tools, where the output of one tool can be used
+        as input to later ones.
+        
+        Steps only wait for the earlier steps whose output_mapping produces a
+        ${...} placeholder in their arguments, so independent steps run
+        concurrently. If a required step fails, no later step is started,
+        later steps that are already running are cancelled, and the results
+        stop at the failed step, exactly as if the steps had run in order.
         
         Args:
             pipeline: List of pipeline steps, each with 'tool', 'arguments', and
                       optional 'output_mapping' for next steps.
             use_cache: Whether to use cached results if available.
+            max_concurrency: Maximum number of steps running at once. Defaults
+                             to tools.tool_config.max_pipeline_concurrency.
             
         Returns:
-            List of results from each step.
+            List of results from each step, in pipeline order.
         """
-        results = []
-        context = {}  # For sharing data between steps
+        max_concurrency = max(1, max_concurrency or self.pipeline_concurrency)
+        producers = self._build_pipeline_dependencies(pipeline)
         
-        for step in pipeline:
-            tool_name = step["tool"]
-            arguments = copy.deepcopy(step["arguments"])  # Copy to avoid modifying original
-            
-            # Replace placeholder arguments with values from the context
-            self._apply_context_to_arguments(arguments, context)
-            
-            # Execute the tool
-            result = await self.execute_tool(tool_name, arguments, use_cache)
+        outputs: Dict[int, Dict[str, Any]] = {}
+        results: Dict[int, Dict[str, Any]] = {}
+        running: Dict[asyncio.Task, int] = {}
+        waiting = list(range(len(pipeline)))
+        stop_index = len(pipeline)
+        start_time = time.time()
+        
+        try:
+            while True:
+                # Start ready steps in pipeline order, up to the concurrency cap
+                for index in list(waiting):
+                    if len(running) >= max_concurrency:
+                        break
+                    if index >= stop_index:
+                        waiting.remove(index)
+                        continue
+                    if all(producer in results for producer in producers[index].values()):
+                        waiting.remove(index)
+                        context = {key: outputs[producer].get(key) for key, producer in producers[index].items()}
+                        task = asyncio.create_task(
+                            self._execute_pipeline_step(pipeline[index], context, use_cache)
+                        )
+                        running[task] = index
+                
+                if not running:
+                    break
+                
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = running.pop(task)
+                    if task.cancelled():
+                        continue
+                    
+                    step = pipeline[index]
+                    step_result = task.result()
+                    results[index] = step_result
+                    result = step_result["result"]
+                    
+                    # Record this step's outputs for the steps that depend on it
+                    outputs[index] = {}
+                    if "output_mapping" in step and isinstance(step["output_mapping"], dict):
+                        for context_key, result_path in step["output_mapping"].items():
+                            outputs[index][context_key] = self._get_nested_value(result, result_path)
+                    
+                    # If this step failed and it's marked as required, stop the pipeline
+                    if "error" in result and step.get("required", True) and index < stop_index:
+                        logger.warning(f"Pipeline stopped at required step {step['tool']} due to error")
+                        stop_index = index
+                        for other, other_index in running.items():
+                            if other_index > index:
+                                other.cancel()
+        finally:
+            for task in running:
+                task.cancel()
+        
+        logger.info(f"Pipeline of {len(pipeline)} steps finished in {time.time() - start_time:.2f}s")
+        return [results[index] for index in sorted(results) if index <= stop_index]
+    
+    async def _execute_pipeline_step(self,
+                                     step: Dict[str, Any],
+                                     context: Dict[str, Any],
+                                     use_cache: bool) -> Dict[str, Any]:
+        """
+        Execute one pipeline step with its placeholders resolved.
+        
+        Args:
+            step: The pipeline step.
+            context: Values of the context keys the step depends on.
+            use_cache: Whether to use cached results if available.
             
-            # Update the context with the result based on output_mapping
-            if "output_mapping" in step and isinstance(step["output_mapping"], dict):
-                for context_key, result_path in step["output_mapping"].items():
-                    context[context_key] = self._get_nested_value(result, result_path)
+        Returns:
+            Dictionary with the tool name, resolved arguments and result.
+        """
+        tool_name = step["tool"]
+        arguments = copy.deepcopy(step["arguments"])  # Copy to avoid modifying original
+        
+        # Replace placeholder arguments with values from the context
+        self._apply_context_to_arguments(arguments, context)
+        
+        result = await self.execute_tool(tool_name, arguments, use_cache)
+        return {
+            "tool": tool_name,
+            "arguments": arguments,
+            "result": result
+        }
+    
+    def _build_pipeline_dependencies(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, int]]:
+        """
+        Infer which earlier step provides each context key a step uses.
+        
+        A placeholder resolves to the value of the most recent earlier step
+        whose output_mapping defines that key, matching in-order execution.
+        Placeholders with no earlier producer are left unresolved.
+        
+        Args:
+            pipeline: List of pipeline steps.
             
-            # Add the result to the list
-            results.append({
-                "tool": tool_name,
-                "arguments": arguments,
-                "result": result
-            })
+        Returns:
+            For each step, a mapping of context key to the index of the producing step.
+        """
+        latest_producer: Dict[str, int] = {}
+        producers = []
+        
+        for index, step in enumerate(pipeline):
+            referenced = self._collect_context_keys(step.get("arguments", {}))
+            producers.append({key: latest_producer[key] for key in referenced if key in latest_producer})
             
-            # If this step failed and it's marked as required, stop the pipeline
-            if "error" in result and step.get("required", True):
-                logger.warning(f"Pipeline stopped at required step {tool_name} due to error")
-                break
+            output_mapping = step.get("output_mapping")
+            if isinstance(output_mapping, dict):
+                for context_key in output_mapping:
+                    latest_producer[context_key] = index
         
-        return results
+        return producers
+    
+    def _collect_context_keys(self, arguments: Dict[str, Any]) -> Set[str]:
+        """
+        Find the context keys referenced by ${...} placeholders in arguments.
+        
+        Mirrors the placements _apply_context_to_arguments resolves.
+        
+        Args:
+            arguments: Step arguments.
+            
+        Returns:
+            Set of referenced context keys.
+        """
+        keys = set()
+        for value in arguments.values():
+            if isinstance(value, str) and value.startswith("${") and value.endswith("}"):
+                keys.add(value[2:-1])
+            elif isinstance(value, dict):
+                keys |= self._collect_context_keys(value)
+            elif isinstance(value, list):
+                for item in value:
+                    if isinstance(item, dict):
+                        keys |= self._collect_context_keys(item)
+                    elif isinstance(item, str) and item.startswith("${") and item.endswith("}"):
+                        keys.add(item[2:-1])
+        return keys
     
     def _generate_cache_key(self, tool_name: str, arguments: Dict[str, Any]) -> str:
         """
         Generate a cache key for a tool call.
         
+        For tools with a spatial cache precision, nearby coordinates and
+        different spellings of a place name produce the same key.
+        
         Args:
             tool_name: Name of the tool.
             arguments: Arguments to the tool.
@@ -189,6 +623,10 @@ class ToolExecutor:
         Returns:
             A string cache key.
         """
+        precision = self.spatial_precision.get(tool_name)
+        if precision and isinstance(arguments, dict):
+            arguments = normalize_arguments(arguments, int(precision))
+        
         try:
             # Sort the arguments for consistent keys
             sorted_args = json.dumps(arguments, sort_keys=True)
@@ -197,6 +635,66 @@ class ToolExecutor:
             # Fall back to string representation if JSON serialization fails
             return f"tool:{tool_name}:{str(arguments)}"
     
+    def _load_tool_config(self) -> Dict[str, Any]:
+        """
+        Read the tool execution settings.
+        
+        Returns:
+            The tools.tool_config section of server_config.yaml, or an empty dict.
+        """
+        try:
+            return get_config().get_tool_config().get("tool_config", {}) or {}
+        except Exception as e:
+            logger.warning(f"Could not load tool configuration, using defaults: {e}")
+            return {}
+    
+    def _unwrap_cached(self, entry: Any) -> Tuple[Any, bool]:
+        """
+        Split a cache entry into the tool result and its freshness.
+        
+        Args:
+            entry: Value read from the cache.
+            
+        Returns:
+            Tuple of (result, is_fresh). Entries written before soft TTLs
+            existed are treated as fresh.
+        """
+        if isinstance(entry, dict) and entry.get("swr") and "result" in entry:
+            return entry["result"], entry.get("fresh_until", 0) > time.time()
+        return entry, True
+    
+    def _determine_cache_policy(self, tool_name: str, result: Dict[str, Any]) -> Tuple[int, int]:
+        """
+        Determine the soft and hard TTL for a tool result.
+        
+        Until the soft TTL the result is served as fresh. Between the soft and
+        hard TTL it is served stale while a background refresh runs. After the
+        hard TTL it is gone.
+        
+        Args:
+            tool_name: Name of the tool.
+            result: Result of the tool execution.
+            
+        Returns:
+            Tuple of (soft_ttl, hard_ttl) in seconds.
+        """
+        soft_ttl = self._determine_cache_ttl(tool_name, result)
+        if soft_ttl <= 0:
+            return 0, 0
+        
+        # Errors are never served stale
+        if isinstance(result, dict) and "error" in result:
+            return soft_ttl, soft_ttl
+        
+        default_policy = self.cache_policy.get("default", {}) or {}
+        tool_policy = self.cache_policy.get(tool_name, {}) or {}
+        
+        soft_ttl = tool_policy.get("soft_ttl", soft_ttl)
+        stale_factor = tool_policy.get("stale_factor", default_policy.get("stale_factor", 2))
+        hard_ttl = tool_policy.get("hard_ttl", int(soft_ttl * stale_factor))
+        
+        return soft_ttl, max(soft_ttl, hard_ttl)
+    
     def _determine_cache_ttl(self, tool_name: str, result: Dict[str, Any]) -> int:
         """
         Determine an appropriate TTL for a tool result based on the tool name and result.
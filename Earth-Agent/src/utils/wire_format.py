@@ -0,0 +1,197 @@
+"""
+WebSocket wire formats for the GIS AI Agent.
+
+Messages are sent as JSON text frames by default. Clients that ask for it
+with /ws?encoding=msgpack get MessagePack binary frames instead, which are
+much cheaper to encode and decode for the nested numeric results of the
+analysis tools. They are not necessarily smaller, since floats take nine
+bytes; the size on the wire is reduced by permessage-deflate, which applies
+to both encodings. MessagePack support needs the optional msgpack package;
+without it every client gets JSON.
+
+Clients that opt in with /ws?chunked=true get a message larger than the
+frame limit split into "chunk" messages, each no larger than the limit in
+bytes, which the client joins in order before decoding:
+
+    {"type": "chunk", "message_id": "...", "index": 0, "count": 3, "data": ...}
+
+For JSON, data is a slice of the message's JSON text; for MessagePack, a
+slice of its packed bytes. Other clients get every message as one frame.
+
+Values neither format supports natively, such as datetimes or numpy
+scalars in raw tool results, are encoded as their plain Python value or
+their text.
+"""
+
+import json
+import uuid
+import logging
+from typing import Dict, Any, Optional, List, Union
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+# Largest frame sent without chunking, in bytes of encoded message
+DEFAULT_MAX_FRAME_BYTES = 64 * 1024
+
+# Bytes of each chunk frame kept for the envelope around its data
+CHUNK_ENVELOPE_BYTES = 128
+
+Frame = Union[str, bytes]
+
+
+def available_encodings() -> List[str]:
+    """List the encodings this server can send."""
+    return [JSON, MSGPACK] if msgpack is not None else [JSON]
+
+
+def negotiate_encoding(requested: Optional[str]) -> str:
+    """
+    Choose the encoding for a connection.
+
+    Args:
+        requested: Encoding asked for by the client, if any.
+
+    Returns:
+        The requested encoding if it is available, otherwise "json".
+    """
+    requested = (requested or JSON).lower()
+    if requested in available_encodings():
+        return requested
+    logger.info(f"Encoding {requested!r} is not available, using JSON")
+    return JSON
+
+
+def _encode_default(value: Any) -> Any:
+    """Convert a value neither JSON nor MessagePack can encode."""
+    if hasattr(value, "item"):
+        # numpy scalars
+        return value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return str(value)
+
+
+def encode_message(message: Any, encoding: str = JSON) -> Frame:
+    """
+    Encode a message as a single frame.
+
+    Args:
+        message: The message object.
+        encoding: "json" for a text frame or "msgpack" for a binary frame.
+
+    Returns:
+        The JSON text, encoded as WebSocket.send_json does, or the packed bytes.
+    """
+    if encoding == MSGPACK:
+        return msgpack.packb(message, use_bin_type=True, default=_encode_default)
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=_encode_default)
+
+
+def decode_message(frame: Frame) -> Any:
+    """
+    Decode a frame received from a client: text frames are JSON, binary frames MessagePack.
+
+    Args:
+        frame: The received text or bytes.
+
+    Returns:
+        The message object.
+    """
+    if isinstance(frame, bytes):
+        if msgpack is None:
+            raise ValueError("Binary messages need the msgpack package")
+        return msgpack.unpackb(frame, raw=False)
+    return json.loads(frame)
+
+
+def frame_message(message: Any,
+                  encoding: str = JSON,
+                  max_frame_bytes: Optional[int] = DEFAULT_MAX_FRAME_BYTES) -> List[Frame]:
+    """
+    Encode a message as one frame, or as chunk frames if it is too large.
+
+    Args:
+        message: The message object.
+        encoding: "json" or "msgpack".
+        max_frame_bytes: Largest frame in bytes; None never chunks.
+
+    Returns:
+        Frames to send in order.
+    """
+    payload = encode_message(message, encoding)
+    if max_frame_bytes is None or frame_size(payload) <= max_frame_bytes:
+        return [payload]
+
+    message_id = uuid.uuid4().hex[:12]
+    parts = _split_payload(payload, max(max_frame_bytes - CHUNK_ENVELOPE_BYTES, 16))
+    return [
+        encode_message({
+            "type": "chunk",
+            "message_id": message_id,
+            "index": index,
+            "count": len(parts),
+            "data": part
+        }, encoding)
+        for index, part in enumerate(parts)
+    ]
+
+
+def _split_payload(payload: Frame, limit: int) -> List[Frame]:
+    """
+    Split an encoded message into chunk data of at most limit bytes once encoded.
+
+    Packed bytes are sliced directly. JSON text is sliced on UTF-8 character
+    boundaries, and each slice is shrunk until it fits once escaped as a
+    JSON string.
+    """
+    if isinstance(payload, bytes):
+        return [payload[start:start + limit] for start in range(0, len(payload), limit)]
+
+    data = payload.encode("utf-8")
+    parts = []
+    start = 0
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while True:
+            # Never split inside a multi-byte character
+            while end < len(data) and end > start + 1 and data[end] & 0xC0 == 0x80:
+                end -= 1
+            part = data[start:end].decode("utf-8")
+            size = len(json.dumps(part, ensure_ascii=False).encode("utf-8"))
+            if size <= limit or end - start <= 4:
+                break
+            end = start + max(4, (end - start) * limit // size)
+        parts.append(part)
+        start = end
+    return parts
+
+
+def frame_size(frame: Frame) -> int:
+    """Size of a frame's payload in bytes."""
+    return len(frame) if isinstance(frame, bytes) else len(frame.encode("utf-8"))
+
+
+def join_chunks(chunks: List[Dict[str, Any]]) -> Any:
+    """
+    Reassemble a message from its decoded chunk messages, as a client does.
+
+    Args:
+        chunks: The chunk messages of one message_id, in any order.
+
+    Returns:
+        The original message object.
+    """
+    parts = [chunk["data"] for chunk in sorted(chunks, key=lambda chunk: chunk["index"])]
+    payload = b"".join(parts) if isinstance(parts[0], bytes) else "".join(parts)
+    return decode_message(payload)
@@ -0,0 +1,171 @@
+"""
+Tests for the cache implementation.
+
+This module contains unit tests for the tiered tool result cache.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to the path to allow importing from the src module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.cache import Cache, AsyncCache, ShardedLRUCache, ENTRY_OVERHEAD_BYTES
+
+
+class TestShardedLRUCache(unittest.TestCase):
+    """Test cases for the bounded memory tier."""
+
+    def test_evicts_least_recently_used_within_budget(self):
+        """Entries beyond the byte budget evict the least recently used ones."""
+        entry_size = 100
+        lru = ShardedLRUCache(max_bytes=3 * (entry_size + ENTRY_OVERHEAD_BYTES), num_shards=1)
+        expiry = time.time() + 60
+
+        for key in ("a", "b", "c"):
+            lru.set(key, key.upper(), expiry, entry_size)
+        # Touch "a" so "b" becomes the oldest entry
+        self.assertEqual(lru.get("a"), "A")
+        lru.set("d", "D", expiry, entry_size)
+
+        self.assertNotIn("b", lru)
+        self.assertIn("a", lru)
+        self.assertIn("d", lru)
+
+        stats = lru.get_stats()
+        self.assertEqual(stats["entries"], 3)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["evicted_bytes"], entry_size + ENTRY_OVERHEAD_BYTES)
+        self.assertLessEqual(stats["bytes"], stats["max_bytes"])
+
+    def test_oversized_entries_are_rejected(self):
+        """An entry larger than a shard budget is not kept in memory."""
+        lru = ShardedLRUCache(max_bytes=1000, num_shards=2)
+        self.assertFalse(lru.set("big", "x", time.time() + 60, 2000))
+        self.assertEqual(len(lru), 0)
+        self.assertEqual(lru.get_stats()["rejected"], 1)
+
+    def test_expired_entries_are_dropped(self):
+        """Expired entries are removed on read and by clean_expired."""
+        lru = ShardedLRUCache(max_bytes=10000, num_shards=4)
+        now = time.time()
+        lru.set("old", 1, now - 1, 10)
+        lru.set("stale", 2, now - 1, 10)
+        lru.set("fresh", 3, now + 60, 10)
+
+        self.assertNotIn("old", lru)
+        self.assertEqual(lru.clean_expired(), 1)
+        self.assertEqual(len(lru), 1)
+        self.assertEqual(lru.get_stats()["expirations"], 2)
+
+
+class TestCache(unittest.TestCase):
+    """Test cases for the tiered cache."""
+
+    def setUp(self):
+        """Set up a cache in a temporary directory."""
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = Cache(self.cache_dir, default_ttl=60, max_memory_bytes=64 * 1024, memory_shards=4)
+
+    def tearDown(self):
+        """Remove the temporary cache directory."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_round_trip_and_disk_fallback(self):
+        """Values evicted from memory are still served from the file tier."""
+        self.assertTrue(self.cache.set({"tool": "t", "x": 1}, {"result": 42}))
+        self.assertEqual(self.cache.get({"tool": "t", "x": 1}), {"result": 42})
+
+        self.cache.memory_cache.clear()
+        self.assertEqual(self.cache.get({"tool": "t", "x": 1}), {"result": 42})
+        # The file hit was promoted back into memory
+        self.assertEqual(self.cache.get_stats()["memory"]["entries"], 1)
+
+    def test_delete_and_expiry(self):
+        """Deleted and expired entries are not returned."""
+        self.cache.set("gone", 1)
+        self.cache.delete("gone")
+        self.assertIsNone(self.cache.get("gone"))
+
+        self.cache.set("short", 1, ttl=-1)
+        self.assertIsNone(self.cache.get("short"))
+
+    def test_clean_expired_only_removes_expired_rows(self):
+        """Cleanup deletes expired disk rows and keeps live ones."""
+        self.cache.set("live", 1)
+        self.cache.set("dead", 2, ttl=-1)
+        self.assertEqual(self.cache.disk_cache.count(), 2)
+
+        self.cache.clean_expired()
+        self.assertEqual(self.cache.disk_cache.count(), 1)
+        self.assertEqual(self.cache.get("live"), 1)
+
+    def test_migrates_legacy_json_files(self):
+        """Unexpired {md5}.json files are imported into the disk tier and removed."""
+        legacy_dir = tempfile.mkdtemp()
+        try:
+            now = time.time()
+            with open(os.path.join(legacy_dir, "abc.json"), "w") as f:
+                json.dump({"value": {"temp": 21}, "expiry": now + 60, "created_at": now}, f)
+            with open(os.path.join(legacy_dir, "old.json"), "w") as f:
+                json.dump({"value": 1, "expiry": now - 60, "created_at": now - 120}, f)
+
+            cache = Cache(legacy_dir)
+            self.assertEqual(cache.disk_cache.get("abc")[0], json.dumps({"temp": 21}))
+            self.assertIsNone(cache.disk_cache.get("old"))
+            self.assertEqual([name for name in os.listdir(legacy_dir) if name.endswith(".json")], [])
+        finally:
+            shutil.rmtree(legacy_dir, ignore_errors=True)
+
+
+class TestAsyncCache(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the non-blocking cache front end."""
+
+    def setUp(self):
+        """Set up an async cache over a temporary directory."""
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = Cache(self.cache_dir, default_ttl=60)
+        self.async_cache = AsyncCache(self.cache, max_pending_writes=2, write_batch_size=8)
+
+    def tearDown(self):
+        """Remove the temporary cache directory."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    async def test_write_behind_is_visible_and_persisted(self):
+        """Queued writes are readable at once and reach the disk tier after a flush."""
+        self.assertTrue(await self.async_cache.set("key", {"value": 1}))
+        self.assertEqual(await self.async_cache.get("key"), {"value": 1})
+
+        self.assertTrue(self.async_cache.flush())
+        self.cache.memory_cache.clear()
+        self.assertEqual(await self.async_cache.get("key"), {"value": 1})
+        self.assertEqual(self.cache.get("key"), {"value": 1})
+
+    async def test_full_backlog_writes_through(self):
+        """Writes beyond the backlog bound are written synchronously off the loop."""
+        for i in range(20):
+            self.assertTrue(await self.async_cache.set(f"key-{i}", i))
+        self.assertTrue(self.async_cache.flush())
+
+        for i in range(20):
+            self.assertEqual(self.cache.get(f"key-{i}"), i)
+        stats = self.async_cache.get_stats()
+        self.assertEqual(stats["writes_queued"] + stats["writes_overflowed"], 20)
+        self.assertEqual(stats["pending_writes"], 0)
+
+    async def test_delete_cancels_queued_write(self):
+        """Deleting a key drops its queued write."""
+        await self.async_cache.set("key", 1)
+        await self.async_cache.delete("key")
+        self.async_cache.flush()
+        self.assertIsNone(await self.async_cache.get("key"))
+        self.assertIsNone(self.cache.get("key"))
+
+
+if __name__ == '__main__':
+    unittest.main()
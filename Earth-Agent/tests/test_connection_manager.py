@@ -0,0 +1,169 @@
+"""
+Tests for the connection manager.
+
+This module checks that each connection's outbound queue isolates slow
+clients: broadcasts reach fast clients while another client is stuck, and
+the slow client policy drops or hibernates the stuck one.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import unittest
+
+# Add the parent directory to the path to allow importing from the src module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.connection_manager import ConnectionManager
+from src.utils.security import SessionTokenSigner
+
+
+class FakeWebSocket:
+    """In-memory stand-in for a WebSocket; a stuck socket never finishes a send."""
+
+    def __init__(self, delay: float = 0.0, stuck: bool = False):
+        self.delay = delay
+        self.stuck = stuck
+        self.sent = []
+        self.closed = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.stuck:
+            await asyncio.Event().wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000, reason=None):
+        self.closed = code
+
+
+class TestConnectionManager(unittest.IsolatedAsyncioTestCase):
+    """Test cases for per-client send queues."""
+
+    async def _connect(self, manager, *websockets):
+        return [await manager.connect(websocket) for websocket in websockets]
+
+    async def test_stuck_client_does_not_delay_broadcasts(self):
+        """Fast clients receive every broadcast; the stuck client's overflow is dropped until it times out."""
+        manager = ConnectionManager(send_queue_size=4, slow_client_policy="drop", send_timeout=0.1)
+        fast = [FakeWebSocket() for _ in range(3)]
+        stuck = FakeWebSocket(stuck=True)
+        sessions = await self._connect(manager, *fast, stuck)
+
+        for i in range(10):
+            await manager.broadcast_json({"n": i})
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.05)
+
+        for websocket in fast:
+            self.assertEqual([m["n"] for m in websocket.sent], list(range(10)))
+        # One message is held by the stuck writer and four fill its queue
+        stuck_stats = manager.get_client_stats(sessions[3])
+        self.assertEqual(stuck_stats["queue_depth"], 4)
+        self.assertEqual(stuck_stats["dropped"], 5)
+        self.assertTrue(manager.is_connected(sessions[3]))
+
+        # Once its write has stalled for send_timeout the client is hibernated anyway
+        await asyncio.sleep(0.1)
+        await manager.broadcast_json({"n": 10})
+        self.assertFalse(manager.is_connected(sessions[3]))
+
+    async def test_hibernate_policy_disconnects_slow_client(self):
+        """Under the hibernate policy a client with a full queue is closed and hibernated."""
+        manager = ConnectionManager(send_queue_size=2, slow_client_policy="hibernate")
+        fast, stuck = FakeWebSocket(), FakeWebSocket(stuck=True)
+        fast_session, stuck_session = await self._connect(manager, fast, stuck)
+
+        for i in range(5):
+            await manager.broadcast_json({"n": i})
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(len(fast.sent), 5)
+        self.assertFalse(manager.is_connected(stuck_session))
+        self.assertIn(stuck_session, manager.hibernated_sessions)
+        self.assertEqual(stuck.closed, 1013)
+        self.assertEqual(manager.get_stats()["slow_clients_hibernated"], 1)
+        # Later broadcasts only go to the remaining client
+        self.assertEqual(await manager.broadcast_json({"n": 5}), 1)
+
+    async def test_direct_send_waits_for_queue_space(self):
+        """A direct message waits for room in a full queue instead of being dropped."""
+        manager = ConnectionManager(send_queue_size=1, slow_client_policy="drop", send_timeout=1.0)
+        websocket = FakeWebSocket(delay=0.02)
+        session_id, = await self._connect(manager, websocket)
+
+        results = [await manager.send_json(session_id, {"n": i}) for i in range(5)]
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(results, [True] * 5)
+        self.assertEqual([m["n"] for m in websocket.sent], list(range(5)))
+        stats = manager.get_client_stats(session_id)
+        self.assertEqual(stats["dropped"], 0)
+        self.assertEqual(stats["max_queue_depth"], 1)
+        self.assertGreaterEqual(stats["max_send_latency_ms"], 20)
+
+    async def test_direct_send_times_out_on_stuck_client(self):
+        """A direct message to a stuck client gives up after send_timeout."""
+        manager = ConnectionManager(send_queue_size=1, slow_client_policy="hibernate", send_timeout=0.05)
+        session_id, = await self._connect(manager, FakeWebSocket(stuck=True))
+
+        results = [await manager.send_json(session_id, {"n": i}) for i in range(3)]
+
+        self.assertEqual(results, [True, True, False])
+        self.assertFalse(manager.is_connected(session_id))
+        self.assertFalse(await manager.send_json(session_id, {"n": 3}))
+
+    async def test_session_can_be_resumed_with_its_token(self):
+        """A hibernated session is reused on reconnect with its token; without it, or while connected, it is not."""
+        manager = ConnectionManager(token_signer=SessionTokenSigner(b"secret"))
+        session_id, = await self._connect(manager, FakeWebSocket())
+        await manager.disconnect(session_id)
+        token = manager.token_signer.issue(session_id)
+
+        # Knowing the session ID is not enough
+        self.assertNotEqual(await manager.connect(FakeWebSocket(), session_id), session_id)
+        self.assertNotEqual(await manager.connect(FakeWebSocket(), session_id, resume_token="0" * 64), session_id)
+
+        self.assertEqual(await manager.connect(FakeWebSocket(), session_id, resume_token=token), session_id)
+        self.assertNotIn(session_id, manager.hibernated_sessions)
+        self.assertEqual(manager.get_stats()["resumed_sessions"], 1)
+
+        # The ID is in use now
+        self.assertNotEqual(await manager.connect(FakeWebSocket(), session_id, resume_token=token), session_id)
+        # IDs whose hibernation expired may still have a stored snapshot
+        expired = str(uuid.uuid4())
+        self.assertEqual(await manager.connect(FakeWebSocket(), expired, resume_token=manager.token_signer.issue(expired)),
+                         expired)
+
+    async def test_broadcast_benchmark(self):
+        """Benchmark: one slow client does not add its send time to broadcasts to the others."""
+        # The test case runs the loop in debug mode, whose bookkeeping would dominate the timing
+        asyncio.get_running_loop().set_debug(False)
+        manager = ConnectionManager(max_connections=200, send_queue_size=64, slow_client_policy="drop")
+        fast = [FakeWebSocket() for _ in range(100)]
+        slow = FakeWebSocket(delay=0.02)
+        await self._connect(manager, slow, *fast)
+
+        start = time.perf_counter()
+        for i in range(20):
+            await manager.broadcast_json({"n": i})
+            await asyncio.sleep(0)
+        while any(len(websocket.sent) < 20 for websocket in fast):
+            await asyncio.sleep(0.001)
+        elapsed = time.perf_counter() - start
+
+        # Sending in sequence would take at least 20 x 20 ms
+        self.assertLess(elapsed, 0.2)
+        self.assertEqual(manager.get_stats()["messages_dropped"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
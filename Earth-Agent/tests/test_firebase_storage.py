@@ -0,0 +1,183 @@
+"""
+Tests for the Firebase chat history storage.
+
+This module runs FirebaseStorage against a local stand-in for the Realtime
+Database REST API to check append-only writes and write coalescing.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from aiohttp import web
+from cryptography.fernet import Fernet
+
+# Add the parent directory to the path to allow importing from the src module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.firebase_storage import FirebaseStorage
+
+
+class FakeRealtimeDatabase:
+    """In-memory stand-in for the Realtime Database REST API."""
+
+    def __init__(self):
+        """Start with an empty database and request log."""
+        self.data = {}
+        self.requests = []
+
+    def _node_path(self, request: web.Request):
+        """Split a request path like /chat_history/s.json into its keys."""
+        path = request.path[:-len(".json")] if request.path.endswith(".json") else request.path
+        return [part for part in path.split("/") if part]
+
+    def _get(self, keys):
+        """Read the node at a key path, or None."""
+        node = self.data
+        for key in keys:
+            if not isinstance(node, dict) or key not in node:
+                return None
+            node = node[key]
+        return node
+
+    def _set(self, keys, value):
+        """Write a value at a key path, creating parents."""
+        node = self.data
+        for key in keys[:-1]:
+            if not isinstance(node.get(key), dict):
+                node[key] = {}
+            node = node[key]
+        node[keys[-1]] = value
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Serve GET, PUT, PATCH and DELETE on the stored tree."""
+        keys = self._node_path(request)
+        body = await request.read()
+        self.requests.append((request.method, request.path, body))
+
+        if request.method == "GET":
+            return web.json_response(self._get(keys) if keys else self.data)
+        if request.method == "DELETE":
+            parent = self._get(keys[:-1]) if len(keys) > 1 else self.data
+            if isinstance(parent, dict):
+                parent.pop(keys[-1], None)
+            return web.json_response(None)
+
+        payload = json.loads(body)
+        if request.method == "PUT":
+            self._set(keys, payload)
+        else:
+            # PATCH keys may be paths relative to the target node
+            for child, value in payload.items():
+                self._set(keys + child.split("/"), value)
+        return web.json_response(payload)
+
+
+class TestFirebaseStorage(unittest.IsolatedAsyncioTestCase):
+    """Test cases for append-only chat history persistence."""
+
+    async def asyncSetUp(self):
+        """Start the stand-in database and point a storage at it."""
+        self.database = FakeRealtimeDatabase()
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self.database.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+
+        self.database_url = f"http://127.0.0.1:{port}"
+        self.encryption_key = Fernet.generate_key().decode()
+        self.storage = self._make_storage()
+
+    async def asyncTearDown(self):
+        """Close the storage and stop the stand-in database."""
+        await self.storage.close()
+        await self.runner.cleanup()
+
+    def _make_storage(self) -> FirebaseStorage:
+        return FirebaseStorage(database_url=self.database_url, api_key="test",
+                               encryption_key=self.encryption_key, write_delay=0.01)
+
+    async def _load_fresh(self, session_id: str):
+        """Load a session through a new storage with no local state."""
+        loader = self._make_storage()
+        try:
+            return await loader.load_chat_history(session_id)
+        finally:
+            await loader.close()
+
+    def _writes(self):
+        return [(method, body) for method, _, body in self.database.requests if method != "GET"]
+
+    async def test_save_writes_only_new_messages(self):
+        """A later save sends just the added message; a fresh loader reassembles all of them."""
+        messages = [{"role": "user", "content": "hello"}, {"role": "assistant", "content": "hi"}]
+        self.assertTrue(await self.storage.save_chat_history("s", messages))
+        messages.append({"role": "user", "content": "weather in Paris?"})
+        self.assertTrue(await self.storage.save_chat_history("s", messages))
+
+        writes = self._writes()
+        self.assertEqual([method for method, _ in writes], ["PATCH", "PATCH"])
+        second = json.loads(writes[1][1])
+        self.assertEqual([key for key in second if key.startswith("messages/")], ["messages/m0000000002"])
+
+        self.assertEqual(await self._load_fresh("s"), messages)
+
+    async def test_burst_of_appends_is_one_patch(self):
+        """Appends arriving together are coalesced into a single request."""
+        results = await asyncio.gather(*(
+            self.storage.append_chat_message("s", {"role": "user", "content": f"message {i}"})
+            for i in range(5)
+        ))
+
+        self.assertEqual(results, [True] * 5)
+        self.assertEqual(len(self._writes()), 1)
+        self.assertEqual(self.storage.stats["patches"], 1)
+        loaded = await self.storage.load_chat_history("s")
+        self.assertEqual([message["content"] for message in loaded], [f"message {i}" for i in range(5)])
+
+    async def test_replace_stores_a_sliding_window(self):
+        """A window that dropped older messages replaces the stored history even at the same length."""
+        self.assertTrue(await self.storage.save_chat_history("s", [{"content": "a"}, {"content": "b"}]))
+        window = [{"content": "b"}, {"content": "c"}]
+        self.assertTrue(await self.storage.replace_chat_history("s", window))
+
+        self.assertEqual(self._writes()[-1][0], "PUT")
+        self.assertEqual(await self._load_fresh("s"), window)
+
+    async def test_legacy_single_blob_history_is_loaded(self):
+        """Histories saved as one encrypted list still load, and the next save rewrites them per message."""
+        messages = [{"role": "user", "content": "old"}]
+        self.database.data["chat_history"] = {"s": {"messages": self.storage._encrypt_data(messages)}}
+        self.assertEqual(await self.storage.load_chat_history("s"), messages)
+
+        messages.append({"role": "assistant", "content": "new"})
+        self.assertTrue(await self.storage.save_chat_history("s", messages))
+        self.assertEqual(await self._load_fresh("s"), messages)
+
+    async def test_append_to_legacy_history_keeps_old_messages(self):
+        """Appending to a history stored as one encrypted list rewrites it per message instead of replacing it."""
+        old = [{"content": "old1"}, {"content": "old2"}]
+        self.database.data["chat_history"] = {"s": {"messages": self.storage._encrypt_data(old)}}
+
+        self.assertTrue(await self.storage.append_chat_message("s", {"content": "new"}))
+        self.assertEqual(await self._load_fresh("s"), old + [{"content": "new"}])
+
+    async def test_failed_append_is_resent_with_the_next_one(self):
+        """A message whose PATCH failed is kept queued rather than overwritten by the next append."""
+        self.assertTrue(await self.storage.append_chat_message("s", {"content": "first"}))
+        with patch.object(self.storage, "_firebase_request", AsyncMock(return_value=None)):
+            self.assertFalse(await self.storage.append_chat_message("s", {"content": "lost"}))
+
+        self.assertTrue(await self.storage.append_chat_message("s", {"content": "third"}))
+        self.assertEqual([message["content"] for message in await self._load_fresh("s")],
+                         ["first", "lost", "third"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+"""
+Tests for the chat history.
+
+This module contains unit tests for token-budgeted history, rolling
+summaries, tool result digests and the restore of resumed sessions.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import unittest
+
+# Add the parent directory to the path to allow importing from the src module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.gemini.memory import ChatHistory, message_tokens
+
+
+class TestChatHistory(unittest.TestCase):
+    """Test cases for the token-budgeted chat history."""
+
+    def test_history_stays_within_token_budget(self):
+        """Messages beyond the budget are folded into an extractive summary."""
+        history = ChatHistory(max_history_tokens=100, summary_max_tokens=50)
+        for i in range(10):
+            history.add_message("s", "user", f"message {i} " + "x" * 90)
+
+        messages = history.get_history("s")
+        self.assertLessEqual(sum(message_tokens(m) for m in messages[1:]), 100)
+        self.assertEqual(messages[-1]["content"].split()[1], "9")
+        self.assertIn("Summary of the earlier conversation", messages[0]["content"])
+        # The summary keeps the most recently folded messages within its budget
+        self.assertIn("message 6", history.summaries["s"])
+        self.assertLessEqual(len(history.summaries["s"]), 200)
+        self.assertGreater(history.get_stats()["folded_messages"], 0)
+
+    def test_get_history_returns_a_read_only_snapshot(self):
+        """The returned snapshot cannot be changed and does not follow later messages."""
+        history = ChatHistory()
+        history.add_message("s", "user", "hello")
+        snapshot = history.get_history("s")
+
+        with self.assertRaises(AttributeError):
+            snapshot.append({"role": "user", "content": "injected"})
+        with self.assertRaises(TypeError):
+            snapshot[1]["content"] = "changed"
+
+        history.add_message("s", "assistant", "hi")
+        self.assertEqual(len(snapshot), 2)
+        self.assertEqual(len(history.get_history("s")), 3)
+
+    def test_least_recently_used_session_is_evicted(self):
+        """Reading or writing a session keeps it; the idlest session is dropped at the cap."""
+        history = ChatHistory(max_sessions=2)
+        history.add_message("a", "user", "first")
+        history.add_message("b", "user", "second")
+        history.get_history("a")
+        history.add_message("c", "user", "third")
+
+        self.assertEqual(list(history.histories), ["a", "c"])
+        self.assertEqual(history.get_history("b"), ())
+        self.assertEqual(history.get_stats()["evicted_sessions"], 1)
+        self.assertNotIn("b", history.history_tokens)
+
+    def test_session_churn_benchmark(self):
+        """Microbenchmark: 100k sessions through a capped store stay fast and bounded."""
+        history = ChatHistory(max_sessions=1000)
+        start = time.perf_counter()
+        for i in range(100_000):
+            history.add_message(f"session-{i}", "user", "hello")
+            history.get_history(f"session-{i // 2}")
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(len(history.histories), 1000)
+        self.assertEqual(history.get_stats()["evicted_sessions"], 99_000)
+        # Sorting every timestamp on each eviction is orders of magnitude slower than this bound
+        self.assertLess(elapsed, 10.0)
+
+    def test_tool_results_are_digested_with_full_payload_by_reference(self):
+        """History keeps a short digest; the full result is available by reference."""
+        history = ChatHistory(tool_digest_chars=300, max_tool_results=2)
+        result = {"features": [{"id": i, "name": f"feature {i}"} for i in range(500)]}
+
+        ref = history.add_tool_result("s", "find_nearby_features", result)
+        entry = history.get_history("s")[-1]["content"]
+        self.assertIn(f"ref {ref}", entry)
+        self.assertLess(len(entry), 400)
+        self.assertEqual(history.get_tool_result("s", ref)["result"], result)
+
+        history.add_tool_result("s", "t", {"a": 1})
+        history.add_tool_result("s", "t", {"a": 2})
+        self.assertIsNone(history.get_tool_result("s", ref))
+
+        history.clear_history("s")
+        self.assertEqual(history.tool_results, {})
+
+
+class TestBackgroundSummary(unittest.IsolatedAsyncioTestCase):
+    """Test cases for summaries produced off the request path."""
+
+    async def test_summarizer_runs_in_background(self):
+        """Folding schedules the summarizer instead of waiting for it."""
+        release = asyncio.Event()
+        calls = []
+
+        async def summarizer(previous, messages):
+            calls.append(len(messages))
+            await release.wait()
+            return f"{previous} folded {len(messages)}".strip()
+
+        history = ChatHistory(max_history_length=2, summarizer=summarizer)
+        for i in range(4):
+            history.add_message("s", "user", f"message {i}")
+
+        # add_message returned while the summary is still being generated
+        self.assertNotIn("s", history.summaries)
+        self.assertEqual(history.get_stats()["pending_summaries"], 1)
+
+        release.set()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        # Both folds were waiting when the task started, so they were summarized together
+        self.assertEqual(calls, [2])
+        self.assertEqual(history.summaries["s"], "folded 2")
+        self.assertIn("folded 2", history.get_history("s")[0]["content"])
+        self.assertEqual(history.get_stats()["pending_summaries"], 0)
+
+
+class TestSessionRestore(unittest.IsolatedAsyncioTestCase):
+    """Test cases for restoring resumed sessions from snapshots."""
+
+    def setUp(self):
+        """Build a session with messages and a tool result, and a loader that serves its snapshot."""
+        self.original = ChatHistory()
+        self.original.add_message("s", "user", "What is the weather in Paris?")
+        self.ref = self.original.add_tool_result("s", "get_current_weather", {"temperature": 20.5})
+        self.original.add_message("s", "assistant", "It is 20.5 degrees in Paris.")
+        self.snapshots = {"s": self.original.export_session("s")}
+        self.loads = []
+        self.summaries = []
+
+    async def load(self, session_id):
+        self.loads.append(session_id)
+        await asyncio.sleep(0.01)
+        return self.snapshots.get(session_id)
+
+    async def summarize(self, previous, messages):
+        self.summaries.append(messages)
+        return "model summary"
+
+    async def test_resumed_session_is_restored_once_on_first_use(self):
+        """Marking a session loads nothing; the first uses share one load that restores everything."""
+        history = ChatHistory(summarizer=self.summarize, session_loader=self.load)
+        history.mark_restorable("s")
+        self.assertEqual(self.loads, [])
+
+        restored = await asyncio.gather(*(history.ensure_session("s") for _ in range(3)))
+
+        self.assertEqual(restored, [True] * 3)
+        self.assertEqual(self.loads, ["s"])
+        self.assertEqual(history.get_history("s"), self.original.get_history("s"))
+        self.assertEqual(history.get_tool_result("s", self.ref)["result"], {"temperature": 20.5})
+        self.assertEqual(self.summaries, [])
+        # Later uses do not load again
+        self.assertFalse(await history.ensure_session("s"))
+        self.assertEqual(history.get_stats()["restored_sessions"], 1)
+
+    async def test_long_stored_history_is_folded_without_the_model(self):
+        """A stored message list longer than the limits is cut down with an extractive summary."""
+        self.snapshots["s"] = {"messages": [{"role": "user", "content": f"message {i}"} for i in range(50)]}
+        history = ChatHistory(max_history_length=10, summarizer=self.summarize, session_loader=self.load)
+        history.mark_restorable("s")
+
+        self.assertTrue(await history.ensure_session("s"))
+
+        messages = history.get_history("s")
+        self.assertEqual([m["content"] for m in messages[1:]], [f"message {i}" for i in range(40, 50)])
+        self.assertIn("message 39", history.summaries["s"])
+        self.assertEqual(self.summaries, [])
+
+    async def test_unmarked_and_unknown_sessions_start_empty(self):
+        """Sessions that were not resumed are never loaded, and unknown ones start empty."""
+        history = ChatHistory(session_loader=self.load)
+        self.assertFalse(await history.ensure_session("s"))
+
+        history.mark_restorable("unknown")
+        self.assertFalse(await history.ensure_session("unknown"))
+        self.assertEqual(self.loads, ["unknown"])
+        self.assertEqual(history.get_history("unknown"), ())
+        self.assertEqual(history.get_stats()["restore_misses"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
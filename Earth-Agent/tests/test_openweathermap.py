@@ -0,0 +1,117 @@
+"""
+Tests for the OpenWeatherMap client.
+
+This module runs OpenWeatherMapClient against a local stand-in for the
+OpenWeatherMap API to check connection pooling, cached geocoding, request
+coalescing and bulk fetches.
+"""
+
+import os
+import sys
+import shutil
+import asyncio
+import tempfile
+import unittest
+
+from aiohttp import web
+
+# Add the parent directory to the path to allow importing from the src module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.data_sources.openweathermap_connector import OpenWeatherMapClient
+from src.utils.cache import Cache, AsyncCache
+
+
+class FakeOpenWeatherMap:
+    """Stand-in for the weather and geocoding endpoints."""
+
+    def __init__(self, delay: float = 0.05):
+        """Answer every request after a short delay, recording it."""
+        self.delay = delay
+        self.requests = []
+        self.peers = set()
+
+    async def geocode(self, request: web.Request) -> web.Response:
+        """Resolve every place name to fixed coordinates."""
+        self.requests.append(("direct", request.query.get("q")))
+        await asyncio.sleep(self.delay)
+        if request.query.get("q") == "Nowhere":
+            return web.json_response([])
+        return web.json_response([{"name": request.query["q"], "lat": 48.85, "lon": 2.35}])
+
+    async def weather(self, request: web.Request) -> web.Response:
+        """Return current conditions for the requested coordinates."""
+        self.requests.append(("weather", request.query.get("lat"), request.query.get("lon")))
+        if "lat" not in request.query:
+            return web.json_response({"cod": "404", "message": "city not found"}, status=404)
+        self.peers.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(self.delay)
+        return web.json_response({
+            "name": "Paris",
+            "coord": {"lat": float(request.query["lat"]), "lon": float(request.query["lon"])},
+            "main": {"temp": 20.5}
+        })
+
+
+class TestOpenWeatherMapClient(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the pooled, coalescing OpenWeatherMap client."""
+
+    async def asyncSetUp(self):
+        """Start the stand-in API and point a client at it."""
+        self.api = FakeOpenWeatherMap()
+        app = web.Application()
+        app.router.add_get("/geo/1.0/direct", self.api.geocode)
+        app.router.add_get("/data/2.5/weather", self.api.weather)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        root = f"http://127.0.0.1:{self.runner.addresses[0][1]}"
+
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = AsyncCache(Cache(self.cache_dir, default_ttl=60))
+        self.client = OpenWeatherMapClient(cache=self.cache)
+        self.client.api_key = "test"
+        self.client.base_url = f"{root}/data/2.5"
+        self.client.geo_url = f"{root}/geo/1.0"
+
+    async def asyncTearDown(self):
+        """Close the client, stop the stand-in API and remove the cache."""
+        await self.client.close()
+        await self.runner.cleanup()
+        self.cache.flush()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    async def test_identical_concurrent_requests_are_sent_once(self):
+        """Concurrent lookups of one place share the geocode and the weather request."""
+        results = await asyncio.gather(*(self.client.get_current_weather("Paris") for _ in range(5)))
+
+        self.assertEqual([r["weather"]["temperature"]["current"] for r in results], [20.5] * 5)
+        self.assertEqual([request[0] for request in self.api.requests], ["direct", "weather"])
+        self.assertEqual(self.client.stats["coalesced_requests"], 8)
+
+    async def test_geocode_is_cached_across_clients(self):
+        """A resolved place name is read from the cache instead of the geocoding API."""
+        self.assertEqual(await self.client.resolve_location("Paris"), (48.85, 2.35))
+
+        other = OpenWeatherMapClient(cache=self.cache)
+        other.api_key = "test"
+        other.geo_url = self.client.geo_url
+        self.assertEqual(await other.resolve_location("  paris "), (48.85, 2.35))
+        self.assertEqual(other.stats["geocode_hits"], 1)
+        self.assertEqual(len([r for r in self.api.requests if r[0] == "direct"]), 1)
+
+    async def test_bulk_weather_reuses_connections_and_reports_failures(self):
+        """Bulk fetches run concurrently on the pooled session; unknown places get an error entry."""
+        locations = [f"{lat},2.35" for lat in range(40, 50)] + ["Nowhere"]
+        results = await self.client.get_weather_bulk(locations, max_concurrency=2, requests_per_second=1000)
+
+        self.assertEqual(set(results), set(locations))
+        self.assertIn("error", results["Nowhere"])
+        self.assertEqual(results["45,2.35"]["location"]["coordinates"]["latitude"], 45.0)
+        # Ten weather requests over at most two kept-alive connections
+        self.assertLessEqual(len(self.api.peers), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
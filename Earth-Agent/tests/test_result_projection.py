@@ -0,0 +1,67 @@
+"""
+Tests for tool result projection.
+
+This module contains unit tests for the compaction of tool results sent back
+to the model as function responses.
+"""
+
+import os
+import sys
+import json
+import unittest
+
+# Add the parent directory to the path to allow importing from the src module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.result_projection import project_tool_result, compact_value, serialized_size
+
+
+def _forecast_entry(day, hour, temp, description):
+    """Build one 3-hourly entry in the shape returned by the forecast tool."""
+    return {
+        "timestamp": 0,
+        "date_time": f"2025-05-0{day} {hour:02d}:00:00",
+        "temperature": {"value": temp, "feels_like": temp, "min": temp - 1, "max": temp + 1, "unit": "°C"},
+        "weather": {"description": description, "icon": "01d"},
+        "precipitation": {"probability": 10 * hour / 3, "unit": "%"},
+        "humidity": {"value": 50, "unit": "%"},
+        "wind": {"speed": 3, "direction": 180, "speed_unit": "m/s"}
+    }
+
+
+class TestResultProjection(unittest.TestCase):
+    """Test cases for tool result projection."""
+
+    def test_forecast_is_summarised_per_day(self):
+        """3-hourly forecast entries collapse into daily summaries."""
+        forecast = [_forecast_entry(day, hour, 20 + hour / 3, "clear sky" if hour < 12 else "light rain")
+                    for day in (1, 2) for hour in range(0, 24, 3)]
+        result = {"result": {"location": {"name": "Lahore"}, "forecast": forecast}}
+
+        projected = project_tool_result("get_weather_forecast", result)
+        self.assertEqual([day["date"] for day in projected["daily"]], ["2025-05-01", "2025-05-02"])
+        self.assertEqual(projected["daily"][0]["temp_min"], 19)
+        self.assertEqual(projected["daily"][0]["temp_max"], 28)
+        self.assertEqual(projected["daily"][0]["precipitation_probability_max"], 70)
+        self.assertLess(serialized_size(projected), serialized_size(result) / 5)
+
+    def test_generic_results_are_truncated_to_budget(self):
+        """Long lists and strings are cut and the result fits the size limit."""
+        result = {"features": [{"id": i, "note": "x" * 1000} for i in range(200)], "empty": None}
+
+        projected = project_tool_result("spatial_query", result, max_chars=2000, max_string_chars=50)
+        self.assertLessEqual(serialized_size(projected), 2000)
+        self.assertNotIn("empty", projected)
+        self.assertIn("more items omitted", projected["features"][-1])
+
+        self.assertEqual(compact_value(["a", "b", "c"], max_list_items=2), ["a", "b", "... 1 more items omitted"])
+
+    def test_errors_and_non_dict_results(self):
+        """Errors skip the tool projection and plain values are wrapped in a dict."""
+        self.assertEqual(project_tool_result("get_weather_forecast", {"error": "down"}), {"error": "down"})
+        self.assertEqual(project_tool_result("any_tool", [1, 2]), {"result": [1, 2]})
+        self.assertEqual(json.loads(json.dumps(project_tool_result("any_tool", {"when": object}))).keys(), {"when"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Tests for the security utilities.
+
+This module contains unit tests for the token bucket rate limiter, including
+idle-client expiry, fair waiting and a memory benchmark.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import unittest
+import tracemalloc
+
+# Add the parent directory to the path to allow importing from the src module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.security import RateLimiter
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        """Start at zero."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test cases for the token bucket rate limiter."""
+
+    def test_bucket_refills_at_the_configured_rate(self):
+        """A drained bucket earns tokens back over time, up to the burst size."""
+        clock = FakeClock()
+        limiter = RateLimiter(rate=2, per=1, burst=2, clock=clock)
+
+        self.assertTrue(limiter.can_request("a"))
+        self.assertTrue(limiter.can_request("a"))
+        self.assertFalse(limiter.can_request("a"))
+
+        clock.now = 0.5
+        self.assertTrue(limiter.can_request("a"))
+        self.assertFalse(limiter.can_request("a"))
+
+    def test_idle_clients_expire(self):
+        """Clients idle long enough to refill completely are dropped; active ones stay."""
+        clock = FakeClock()
+        limiter = RateLimiter(rate=1, per=1, burst=2, sweep_interval=1, clock=clock)
+        limiter.can_request("idle")
+        limiter.can_request("active")
+
+        for second in range(1, 5):
+            clock.now = second
+            limiter.can_request("active")
+
+        self.assertEqual(len(limiter), 1)
+        self.assertEqual(limiter.get_stats()["expired_clients"], 1)
+        # An expired client comes back with a full bucket
+        self.assertTrue(limiter.can_request("idle", tokens=2))
+
+    def test_million_clients_memory_stays_flat(self):
+        """Benchmark: a million distinct client ids, one per millisecond, keep memory flat."""
+        clock = FakeClock()
+        limiter = RateLimiter(rate=10, per=1, burst=10, clock=clock)
+
+        start = time.perf_counter()
+        for i in range(1_000_000):
+            clock.now = i / 1000
+            if i == 900_000:
+                # Allocations still held after the last 100k clients show any growth
+                tracemalloc.start()
+            limiter.can_request(f"client-{i}")
+        retained_memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        elapsed = time.perf_counter() - start
+
+        # Only clients seen within the last idle_ttl (plus one sweep interval) are kept
+        self.assertLessEqual(len(limiter), 1300)
+        # Keeping every client would retain tens of megabytes here
+        self.assertLess(retained_memory, 1024 * 1024)
+        self.assertLess(elapsed, 60.0)
+
+
+class TestRateLimiterWaiting(unittest.IsolatedAsyncioTestCase):
+    """Test cases for waiting on the rate limiter."""
+
+    async def test_waiters_are_served_in_arrival_order(self):
+        """Waiting requests of one client are granted first come, first served."""
+        limiter = RateLimiter(rate=100, per=1, burst=1)
+        self.assertTrue(limiter.can_request("a"))
+
+        order = []
+
+        async def wait(name):
+            self.assertTrue(await limiter.wait_for_token("a"))
+            order.append(name)
+
+        tasks = [asyncio.create_task(wait(name)) for name in ("first", "second", "third")]
+        await asyncio.sleep(0)
+        # A plain request cannot overtake the queue
+        self.assertFalse(limiter.can_request("a"))
+
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["first", "second", "third"])
+
+    async def test_request_larger_than_burst_is_refused(self):
+        """A request that can never fit in the bucket does not wait forever."""
+        limiter = RateLimiter(rate=1, per=1, burst=2)
+        self.assertFalse(await limiter.wait_for_token("a", tokens=3))
+
+
+if __name__ == '__main__':
+    unittest.main()
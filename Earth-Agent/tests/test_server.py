@@ -7,15 +7,45 @@ This module contains unit tests for the MCP server functionality.
 import os
 import sys
 import json
+import time
+import shutil
+import tempfile
 import unittest
 import asyncio
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 # Add the parent directory to the path to allow importing from the src module
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+
 from src.mcp_server.server import create_server
 from src.config import ConfigManager
+from src.utils.cache import Cache, AsyncCache
+from src.utils.tool_executor import ToolExecutor
+from src.utils.session_snapshots import SessionSnapshotStore
+
+
+class FakeWebSocket:
+    """In-memory stand-in for a WebSocket connection; None in the inbox disconnects."""
+    
+    def __init__(self, messages):
+        self.inbox = asyncio.Queue()
+        for message in messages:
+            self.inbox.put_nowait(message)
+        self.sent = []
+        self.received = 0
+    
+    async def receive_json(self):
+        data = await self.inbox.get()
+        if data is None:
+            raise WebSocketDisconnect()
+        self.received += 1
+        return data
+    
+    async def send_json(self, message):
+        self.sent.append(message)
 
 
 class TestMCPServer(unittest.TestCase):
@@ -104,7 +134,74 @@ class TestMCPServer(unittest.TestCase):
         self.assertEqual(server.tools["custom_tool"]["description"], "Custom test tool")
         self.assertEqual(server.tools["custom_tool"]["function"], test_function)
         self.assertEqual(server.tools["custom_tool"]["parameters"], {"param1": {"type": "string"}})
+    
+    def test_tool_declarations_are_cached_and_routed(self):
+        """Declarations are built once, rebuilt after registration and subset per query."""
+        server = create_server(name="Test MCP Server")
+        
+        first = server._prepare_tools_for_gemini()
+        self.assertIs(server._prepare_tools_for_gemini()[0], first[0])
+        self.assertEqual(len(first), len(server.tools))
+        
+        server.register_tool(
+            name="estimate_flood_depth",
+            function=MagicMock(),
+            description="Estimate river flood depth",
+            parameters={"type": "object", "properties": {"river": {"type": "string", "minLength": 1}}}
+        )
+        routed = server._prepare_tools_for_gemini("How deep will the river flood get?")
+        names = [tool["function_declarations"][0]["name"] for tool in routed]
+        self.assertEqual(names[0], "estimate_flood_depth")
+        self.assertLess(len(routed), len(server.tools))
+        self.assertNotIn("minLength", routed[0]["function_declarations"][0]["parameters"]["properties"]["river"])
+        self.assertEqual(server.tools["estimate_flood_depth"]["parameters"]["properties"]["river"]["minLength"], 1)
+        
+        # Queries without matching words are offered every tool
+        self.assertEqual(len(server._prepare_tools_for_gemini("hello there")), len(server.tools))
+    
+    def test_result_files_are_served_from_the_temporary_directory_only(self):
+        """/results/.../file serves a visualization file and refuses paths outside the temporary directory."""
+        server = create_server(name="Test MCP Server")
+        with tempfile.NamedTemporaryFile("w", suffix=".html", delete=False) as handle:
+            handle.write("<html>map</html>")
+        self.addCleanup(os.remove, handle.name)
+        session_id = "file-session"
+        map_ref = server.chat_history.add_tool_result(session_id, "generate_map", {"file_path": handle.name})
+        outside_ref = server.chat_history.add_tool_result(session_id, "generate_map", {"file_path": __file__})
+        
+        token = server.connection_manager.token_signer.issue(session_id)
+        
+        client = TestClient(server.app)
+        self.assertEqual(client.get(f"/results/{session_id}/{map_ref}?token={token}").json()["result"],
+                         {"file_path": handle.name})
+        self.assertEqual(client.get(f"/results/{session_id}/{map_ref}/file?token={token}").text, "<html>map</html>")
+        self.assertEqual(client.get(f"/results/{session_id}/{outside_ref}/file?token={token}").status_code, 404)
+        self.assertEqual(client.get(f"/results/{session_id}/unknown?token={token}").status_code, 404)
+    
+    def test_results_need_the_session_token(self):
+        """Another session's results and files are refused without that session's token."""
+        server = create_server(name="Test MCP Server")
+        session_id = "owner-session"
+        ref = server.chat_history.add_tool_result(session_id, "get_current_weather", {"temperature": 20.5})
+        other_token = server.connection_manager.token_signer.issue("other-session")
+        
+        client = TestClient(server.app)
+        self.assertEqual(client.get(f"/results/{session_id}/{ref}").status_code, 403)
+        self.assertEqual(client.get(f"/results/{session_id}/{ref}?token={other_token}").status_code, 403)
+        self.assertEqual(client.get(f"/results/{session_id}/{ref}/file?token={other_token}").status_code, 403)
 
+    
+    def test_shutdown_closes_the_weather_client(self):
+        """Stopping the app closes the pooled OpenWeatherMap session."""
+        server = create_server(name="Test MCP Server")
+        weather_client = MagicMock()
+        weather_client.close = AsyncMock()
+        
+        with patch('src.mcp_server.server.get_openweathermap_client', return_value=weather_client):
+            with TestClient(server.app):
+                weather_client.close.assert_not_awaited()
+        
+        weather_client.close.assert_awaited_once()
 
 class TestAsyncMCPServer(unittest.IsolatedAsyncioTestCase):
     """Asynchronous test cases for the MCP server."""
@@ -173,6 +270,282 @@ class TestAsyncMCPServer(unittest.IsolatedAsyncioTestCase):
         # Check the result
         self.assertEqual(result, {"result": "Async test result"})
 
+    async def test_tool_calls_run_concurrently_with_one_analysis(self):
+        """All tool calls of a turn run together and are analyzed in one follow-up call."""
+        server = create_server(name="Test MCP Server")
+        
+        async def slow_tool(arguments):
+            await asyncio.sleep(0.1)
+            return {"echo": arguments["value"]}
+        
+        async def broken_tool(arguments):
+            return {"error": "no data"}
+        
+        server.tools["slow_tool"] = {"function": slow_tool}
+        server.tools["broken_tool"] = {"function": broken_tool}
+        
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, True)
+        with patch('src.utils.tool_executor.get_async_cache', return_value=AsyncCache(Cache(cache_dir))):
+            server.tool_executor = ToolExecutor(server.tools)
+        
+        chat = AsyncMock(return_value={"text": "Combined analysis"})
+        self.mock_gemini_client.return_value.chat = chat
+        
+        start = time.monotonic()
+        request_history = [{"role": "user", "content": "compare"}]
+        response = await server._handle_tool_calls("parallel-session", "compare", [
+            {"name": "slow_tool", "arguments": {"value": 1}},
+            {"name": "slow_tool", "arguments": {"value": 2}},
+            {"name": "broken_tool", "arguments": {}}
+        ], request_history)
+        elapsed = time.monotonic() - start
+        
+        self.assertLess(elapsed, 0.18)
+        self.assertEqual(chat.await_count, 1)
+        
+        # The follow-up continues the turn with function calls and responses
+        messages = chat.await_args.kwargs["messages"]
+        self.assertEqual(messages[0], {"role": "user", "content": "compare"})
+        self.assertEqual(len(messages[1]["tool_calls"]), 3)
+        self.assertEqual([m["role"] for m in messages[2:]], ["tool", "tool", "tool"])
+        self.assertEqual(messages[2]["content"], {"echo": 1})
+        self.assertEqual(response["type"], "tool_result_with_analysis")
+        self.assertEqual(response["tool_name"], "slow_tool")
+        self.assertEqual(response["analysis"], "Combined analysis")
+        self.assertEqual([call["result"] for call in response["tool_calls"]],
+                         [{"echo": 1}, {"echo": 2}, {"error": "no data"}])
+
+    async def test_streamed_query_sends_chunks_and_tool_progress(self):
+        """Streamed queries forward text chunks and tool progress before the final message."""
+        server = create_server(name="Test MCP Server")
+        
+        async def quick_tool(arguments):
+            return {"value": 42}
+        
+        server.tools["quick_tool"] = {"function": quick_tool}
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, True)
+        with patch('src.utils.tool_executor.get_async_cache', return_value=AsyncCache(Cache(cache_dir))):
+            server.tool_executor = ToolExecutor(server.tools)
+        
+        turns = [
+            [{"done": True, "response": {"text": "", "tool_calls": [{"name": "quick_tool", "arguments": {}}]}}],
+            [{"text": "The value "}, {"text": "is 42."},
+             {"done": True, "response": {"text": "The value is 42.", "tool_calls": []}}]
+        ]
+        
+        async def chat_stream(messages, tools=None):
+            for event in turns.pop(0):
+                yield event
+        
+        self.mock_gemini_client.return_value.chat_stream = chat_stream
+        sent = []
+        
+        async def send(message):
+            sent.append(message)
+        
+        response = await server._handle_websocket_message(
+            {"type": "query", "query": "value?", "session_id": "stream-session", "stream": True},
+            send=send
+        )
+        
+        self.assertEqual([m["type"] for m in sent],
+                         ["tool_progress", "tool_progress", "response_chunk", "response_chunk"])
+        self.assertEqual([m["status"] for m in sent[:2]], ["started", "completed"])
+        self.assertEqual("".join(m["content"] for m in sent[2:]), "The value is 42.")
+        self.assertEqual(response["type"], "tool_result_with_analysis")
+        self.assertEqual(response["analysis"], "The value is 42.")
+        self.assertTrue(response["streamed"])
+
+    async def test_failing_tool_call_uses_the_gemini_fallback(self):
+        """A direct tool call that fails, streamed or not, is answered by the Gemini fallback."""
+        server = create_server(name="Test MCP Server")
+        fallback_queries = []
+        
+        async def broken_tool(arguments):
+            return {"error": "no data"}
+        
+        async def raising_tool(arguments):
+            raise RuntimeError("service down")
+        
+        async def fallback(arguments):
+            fallback_queries.append(arguments["query"])
+            return {"analysis": "General information"}
+        
+        server.tools["broken_tool"] = {"function": broken_tool}
+        server.tools["raising_tool"] = {"function": raising_tool}
+        server.tools["analyze_query_with_gemini"] = {"function": fallback}
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, True)
+        with patch('src.utils.tool_executor.get_async_cache', return_value=AsyncCache(Cache(cache_dir))):
+            server.tool_executor = ToolExecutor(server.tools)
+        sent = []
+        
+        async def send(message):
+            sent.append(message)
+        
+        for tool_name, stream in (("broken_tool", False), ("broken_tool", True), ("raising_tool", False)):
+            response = await server._handle_websocket_message(
+                {"type": "tool_call", "tool_name": tool_name, "arguments": {"value": 1}, "stream": stream},
+                send=send
+            )
+            
+            self.assertNotIn("error", response)
+            self.assertEqual(response["tool_name"], tool_name)
+            self.assertEqual(response["analysis"], "General information")
+        
+        self.assertEqual(fallback_queries[0], 'Tool call: broken_tool with arguments: {"value": 1}')
+        self.assertEqual([m["status"] for m in sent], ["started", "failed"])
+
+    async def test_resumed_session_continues_without_repeat_calls(self):
+        """After a hibernation the next query sees the earlier conversation, restored without model calls."""
+        server = create_server(name="Test MCP Server")
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, True)
+        async_cache = AsyncCache(Cache(cache_dir))
+        self.addCleanup(async_cache.flush)
+        server.session_snapshots = SessionSnapshotStore(async_cache, ttl=60)
+        previous_loader = server.chat_history.session_loader
+        server.chat_history.session_loader = server.session_snapshots.load
+        self.addCleanup(setattr, server.chat_history, "session_loader", previous_loader)
+        
+        session_id = "resume-session"
+        server.chat_history.add_message(session_id, "user", "What is the weather in Paris?")
+        server.chat_history.add_tool_result(session_id, "get_current_weather", {"temperature": 20.5})
+        await server._hibernate_session(session_id)
+        # The worker that served the session is gone
+        server.chat_history._drop_session(session_id)
+        
+        chat = AsyncMock(return_value={"text": "Still 20.5 degrees.", "tool_calls": []})
+        self.mock_gemini_client.return_value.chat = chat
+        server.chat_history.mark_restorable(session_id)
+        response = await server._handle_websocket_message(
+            {"type": "query", "query": "And tomorrow?", "session_id": session_id}
+        )
+        
+        self.assertEqual(response["response"], "Still 20.5 degrees.")
+        self.assertEqual(chat.await_count, 1)
+        contents = [m["content"] for m in chat.await_args.kwargs["messages"]]
+        self.assertIn("What is the weather in Paris?", contents)
+        self.assertTrue(any("get_current_weather" in c and "20.5" in c for c in contents))
+        self.assertEqual(contents[-1], "And tomorrow?")
+    
+    async def test_large_tool_results_are_sent_by_reference(self):
+        """Results above the inline limit become references for clients that opted in; fetch_result resolves them."""
+        server = create_server(name="Test MCP Server")
+        server.max_inline_result_bytes = 1000
+        session_id = "reference-session"
+        large = {"values": list(range(1000))}
+        large_ref = server.chat_history.add_tool_result(session_id, "large_tool", large)
+        small_ref = server.chat_history.add_tool_result(session_id, "small_tool", {"value": 1})
+        
+        # Clients that did not connect with result_refs=true get every result inline
+        inline = server._format_tool_response(session_id, "large_tool", {}, large, "analysis", result_ref=large_ref)
+        self.assertEqual(inline["result"], large)
+        
+        server._result_ref_sessions.add(session_id)
+        response = server._format_tool_response(session_id, "large_tool", {}, large, "analysis", tool_calls=[
+            {"tool_name": "large_tool", "arguments": {}, "result": large, "ref": large_ref},
+            {"tool_name": "small_tool", "arguments": {}, "result": {"value": 1}, "ref": small_ref}
+        ], result_ref=large_ref)
+        
+        self.assertEqual(response["result"]["result_ref"], large_ref)
+        self.assertGreater(response["result"]["size"], 1000)
+        self.assertIn("preview", response["result"])
+        self.assertEqual(response["tool_calls"][0]["result"]["result_ref"], large_ref)
+        self.assertEqual(response["tool_calls"][1]["result"], {"value": 1})
+        
+        fetched = await server._handle_websocket_message(
+            {"type": "fetch_result", "ref": large_ref, "session_id": session_id}
+        )
+        self.assertEqual((fetched["type"], fetched["result"]), ("tool_result", large))
+        missing = await server._handle_websocket_message(
+            {"type": "fetch_result", "ref": "unknown", "session_id": session_id}
+        )
+        self.assertIn("error", missing)
+    
+    async def _serve_with_blocking_queries(self, server, messages):
+        """Serve a fake connection whose queries wait for the returned event."""
+        release = asyncio.Event()
+        
+        async def handle(data, send=None):
+            if data["type"] == "query":
+                await release.wait()
+            return {"type": data["type"], "session_id": data["session_id"]}
+        
+        server._handle_websocket_message = handle
+        websocket = FakeWebSocket(messages)
+        serving = asyncio.create_task(server._serve_websocket(websocket, "ws-session"))
+        await asyncio.sleep(0.05)
+        return websocket, serving, release
+    
+    async def test_slow_request_does_not_block_later_messages(self):
+        """A clear_history sent after a slow query is answered first, with its request id."""
+        server = create_server(name="Test MCP Server")
+        websocket, serving, release = await self._serve_with_blocking_queries(server, [
+            {"type": "query", "query": "slow"},
+            {"type": "clear_history", "request_id": "client-7"}
+        ])
+        
+        self.assertEqual(websocket.sent, [{"type": "clear_history", "session_id": "ws-session", "request_id": "client-7"}])
+        release.set()
+        await asyncio.sleep(0.05)
+        self.assertEqual(websocket.sent[1]["request_id"], 1)
+        
+        websocket.inbox.put_nowait(None)
+        with self.assertRaises(WebSocketDisconnect):
+            await serving
+    
+    async def test_messages_cannot_name_another_session(self):
+        """A session_id sent by the client is replaced with the connection's own."""
+        server = create_server(name="Test MCP Server")
+        websocket, serving, release = await self._serve_with_blocking_queries(server, [
+            {"type": "clear_history", "session_id": "someone-else"}
+        ])
+        
+        self.assertEqual(websocket.sent[0]["session_id"], "ws-session")
+        websocket.inbox.put_nowait(None)
+        with self.assertRaises(WebSocketDisconnect):
+            await serving
+    
+    async def test_disconnect_sets_the_tool_cancel_event(self):
+        """Closing the connection sets the event that cancels the session's tool calls."""
+        server = create_server(name="Test MCP Server")
+        websocket, serving, release = await self._serve_with_blocking_queries(server, [
+            {"type": "query", "query": "slow"}
+        ])
+        disconnected = server._disconnect_events["ws-session"]
+        self.assertFalse(disconnected.is_set())
+        
+        websocket.inbox.put_nowait(None)
+        with self.assertRaises(WebSocketDisconnect):
+            await serving
+        
+        self.assertTrue(disconnected.is_set())
+        self.assertNotIn("ws-session", server._disconnect_events)
+    
+    async def test_full_queue_pauses_reading(self):
+        """The reader stops receiving once the in-flight and queued limits are reached."""
+        server = create_server(name="Test MCP Server")
+        server.max_in_flight_per_session = 1
+        server.max_queued_messages = 1
+        websocket, serving, release = await self._serve_with_blocking_queries(
+            server, [{"type": "query", "query": str(i)} for i in range(5)]
+        )
+        
+        # One in flight, one queued and one waiting to be queued
+        self.assertEqual(websocket.received, 3)
+        self.assertEqual(websocket.sent, [])
+        
+        release.set()
+        await asyncio.sleep(0.05)
+        self.assertEqual([message["request_id"] for message in websocket.sent], [1, 2, 3, 4, 5])
+        
+        websocket.inbox.put_nowait(None)
+        with self.assertRaises(WebSocketDisconnect):
+            await serving
+
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
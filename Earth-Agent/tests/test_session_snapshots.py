@@ -0,0 +1,98 @@
+"""
+Tests for session snapshots.
+
+This module checks that a hibernated session's snapshot is saved to and
+loaded from the cache, and that the chat history stored in Firebase is used
+when the cache no longer holds it.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+# Add the parent directory to the path to allow importing from the src module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.gemini.memory import ChatHistory
+from src.utils.cache import Cache, AsyncCache
+from src.utils.session_snapshots import SessionSnapshotStore
+
+
+class FakeFirebase:
+    """Stand-in for FirebaseStorage's chat history methods."""
+
+    disabled = False
+
+    def __init__(self):
+        self.histories = {}
+
+    async def replace_chat_history(self, session_id, messages):
+        self.histories[session_id] = list(messages)
+        return True
+
+    async def load_chat_history(self, session_id):
+        return self.histories.get(session_id)
+
+    async def delete_chat_history(self, session_id):
+        return self.histories.pop(session_id, None) is not None
+
+
+class TestSessionSnapshotStore(unittest.IsolatedAsyncioTestCase):
+    """Test cases for saving and loading session snapshots."""
+
+    async def asyncSetUp(self):
+        """Create a store on a temporary cache with a Firebase stand-in."""
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = AsyncCache(Cache(self.cache_dir))
+        self.firebase = FakeFirebase()
+        self.store = SessionSnapshotStore(self.cache, ttl=60, firebase=self.firebase)
+
+        self.history = ChatHistory()
+        self.history.add_message("s", "user", "Show the forecast")
+        self.history.add_tool_result("s", "get_weather_forecast", {"day": date(2026, 10, 19), "rain": 0.4})
+
+    async def asyncTearDown(self):
+        """Remove the temporary cache."""
+        self.cache.flush()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    async def test_snapshot_round_trip(self):
+        """A saved snapshot is read back from the cache and restores the session elsewhere."""
+        self.assertTrue(await self.store.save("s", self.history.export_session("s")))
+        self.cache.flush()
+        self.cache.cache.memory_cache.clear()
+
+        restored = ChatHistory(session_loader=self.store.load)
+        restored.mark_restorable("s")
+        self.assertTrue(await restored.ensure_session("s"))
+
+        self.assertEqual(restored.get_history("s"), self.history.get_history("s"))
+        ref = next(iter(restored.tool_results["s"]))
+        # Values JSON cannot encode are kept as text
+        self.assertEqual(restored.get_tool_result("s", ref)["result"], {"day": "2026-10-19", "rain": 0.4})
+        self.assertEqual(self.store.get_stats()["cache_hits"], 1)
+
+    async def test_firebase_history_is_used_when_the_cache_has_no_snapshot(self):
+        """Without a cached snapshot the messages stored in Firebase are restored."""
+        await self.store.save("s", self.history.export_session("s"))
+        await self.cache.delete({"session_snapshot": "s"})
+
+        snapshot = await self.store.load("s")
+
+        self.assertEqual(snapshot["messages"], self.history.export_session("s")["messages"])
+        self.assertEqual(self.store.get_stats()["firebase_hits"], 1)
+
+    async def test_deleted_snapshot_is_not_restored(self):
+        """A cleared conversation is removed from the cache and Firebase."""
+        await self.store.save("s", self.history.export_session("s"))
+        await self.store.delete("s")
+
+        self.assertIsNone(await self.store.load("s"))
+        self.assertEqual(self.store.get_stats()["misses"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
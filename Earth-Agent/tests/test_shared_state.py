@@ -0,0 +1,330 @@
+"""
+Tests for the shared state backends.
+
+This module checks that rate limits and cache entries are shared between
+independent limiter and cache instances through the SQLite backend and,
+against a local stand-in server, the Redis backend. It also benchmarks the
+per-request overhead each backend adds to a rate limit check.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import socket
+import tempfile
+import threading
+import unittest
+import socketserver
+from unittest.mock import patch
+
+# Add the parent directory to the path to allow importing from the src module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.cache import Cache
+from src.utils.security import RateLimiter
+from src.utils.shared_state import SQLiteStateBackend, RedisStateBackend, SharedStateBackend
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Serves one connection of the Redis stand-in."""
+
+    def setup(self):
+        """Disable Nagle's algorithm, as Redis does, so pipelined replies are not delayed."""
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        """Read RESP commands until the client disconnects."""
+        server = self.server
+        self.watched = {}
+        self.queued = None
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            with server.lock:
+                reply = self._execute(command)
+            self.wfile.write(reply)
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:])
+        parts = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:])
+            parts.append(self.rfile.read(length + 2)[:-2])
+        return parts
+
+    def _execute(self, command):
+        name = command[0].upper()
+        if self.queued is not None and name not in (b"EXEC", b"DISCARD"):
+            self.queued.append(command)
+            return b"+QUEUED\r\n"
+        if name == b"WATCH":
+            for key in command[1:]:
+                self.watched[key] = self.server.versions.get(key, 0)
+            return b"+OK\r\n"
+        if name == b"UNWATCH":
+            self.watched = {}
+            return b"+OK\r\n"
+        if name == b"MULTI":
+            self.queued = []
+            return b"+OK\r\n"
+        if name == b"DISCARD":
+            self.queued, self.watched = None, {}
+            return b"+OK\r\n"
+        if name == b"EXEC":
+            queued, self.queued = self.queued, None
+            changed = any(self.server.versions.get(key, 0) != version for key, version in self.watched.items())
+            self.watched = {}
+            if changed:
+                return b"*-1\r\n"
+            replies = [self._run(c) for c in queued]
+            return b"*%d\r\n" % len(replies) + b"".join(replies)
+        return self._run(command)
+
+    def _run(self, command):
+        name, args = command[0].upper(), command[1:]
+        data, versions = self.server.data, self.server.versions
+        self.server.expire_keys()
+        if name == b"PING":
+            return b"+PONG\r\n"
+        if name == b"GET":
+            value = data.get(args[0])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value[0]), value[0])
+        if name == b"SET":
+            expires = None
+            if len(args) > 3 and args[2].upper() == b"PX":
+                expires = time.time() + int(args[3]) / 1000
+            data[args[0]] = (args[1], expires)
+            versions[args[0]] = versions.get(args[0], 0) + 1
+            return b"+OK\r\n"
+        if name == b"DEL":
+            removed = 0
+            for key in args:
+                if data.pop(key, None) is not None:
+                    versions[key] = versions.get(key, 0) + 1
+                    removed += 1
+            return b":%d\r\n" % removed
+        if name == b"SCAN":
+            pattern = args[args.index(b"MATCH") + 1].rstrip(b"*") if b"MATCH" in args else b""
+            keys = [key for key in data if key.startswith(pattern)]
+            return b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys) + b"".join(
+                b"$%d\r\n%s\r\n" % (len(key), key) for key in keys)
+        return b"-ERR unknown command\r\n"
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    """Minimal in-memory stand-in for a Redis server."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        """Listen on a free local port."""
+        super().__init__(("127.0.0.1", 0), FakeRedisHandler)
+        self.lock = threading.Lock()
+        self.data = {}
+        self.versions = {}
+
+    def expire_keys(self):
+        """Drop keys past their expiry."""
+        now = time.time()
+        for key in [key for key, (_, expires) in self.data.items() if expires is not None and expires <= now]:
+            del self.data[key]
+
+
+def measure_overhead(limiter: RateLimiter, calls: int = 500) -> float:
+    """Average seconds per can_request call over distinct clients."""
+    start = time.perf_counter()
+    for i in range(calls):
+        limiter.can_request(f"client-{i}")
+    return (time.perf_counter() - start) / calls
+
+
+class TestSQLiteStateBackend(unittest.TestCase):
+    """Test cases for state shared through a SQLite database."""
+
+    def setUp(self):
+        """Create two backends on one database, as two workers would."""
+        self.temp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.temp_dir, "shared_state.db")
+        self.worker_a = SQLiteStateBackend(db_path)
+        self.worker_b = SQLiteStateBackend(db_path)
+
+    def tearDown(self):
+        """Remove the temporary database."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_rate_limit_is_shared_between_workers(self):
+        """Two limiters on the same backend draw from one bucket per client."""
+        limiter_a = RateLimiter(rate=1, per=60, burst=3, backend=self.worker_a, name="query")
+        limiter_b = RateLimiter(rate=1, per=60, burst=3, backend=self.worker_b, name="query")
+
+        allowed = [limiter.can_request("client") for limiter in (limiter_a, limiter_b, limiter_a, limiter_b)]
+        self.assertEqual(allowed, [True, True, True, False])
+        # Limiters with another name have their own buckets
+        self.assertTrue(RateLimiter(rate=1, per=60, burst=3, backend=self.worker_b, name="tool").can_request("client"))
+
+    def test_cache_entries_are_shared_between_workers(self):
+        """A value cached by one worker is read by another."""
+        cache_a = Cache(self.temp_dir, disk_store=self.worker_a)
+        cache_b = Cache(self.temp_dir, disk_store=self.worker_b)
+
+        cache_a.set("key", {"value": 1})
+        self.assertEqual(cache_b.get("key"), {"value": 1})
+
+    def test_idle_buckets_are_deleted_by_the_sweep(self):
+        """A sweep deletes the limiter's idle shared buckets and leaves other limiters' buckets."""
+        now = [0.0]
+        limiter = RateLimiter(rate=1, per=1, burst=1, idle_ttl=10, clock=lambda: now[0],
+                              backend=self.worker_a, name="query")
+        limiter.can_request("client")
+        RateLimiter(rate=1, per=1, burst=1, backend=self.worker_a, name="tool").can_request("client")
+
+        with patch("time.time", return_value=time.time() + 60):
+            now[0] = 60.0
+            limiter.can_request("other")
+
+        keys = [row[0] for row in self.worker_b._connection().execute("SELECT key FROM rate_buckets")]
+        self.assertEqual(sorted(keys), ["query:other", "tool:client"])
+
+    def test_legacy_json_files_are_migrated_into_the_backend(self):
+        """Cache files from the old JSON layout are imported into a shared backend too."""
+        with open(os.path.join(self.temp_dir, "legacy.json"), "w") as f:
+            json.dump({"value": {"value": 1}, "expiry": time.time() + 60}, f)
+
+        Cache(self.temp_dir, disk_store=self.worker_a)
+
+        self.assertEqual(self.worker_b.get("legacy")[0], json.dumps({"value": 1}))
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, "legacy.json")))
+
+    def test_backend_interface_is_abstract(self):
+        """The interface cannot be instantiated without the cache and bucket methods."""
+        with self.assertRaises(TypeError):
+            SharedStateBackend()
+
+    def test_overhead_benchmark(self):
+        """Benchmark: a shared SQLite bucket adds at most a few milliseconds per check."""
+        local = measure_overhead(RateLimiter(rate=10, per=1, burst=10))
+        shared = measure_overhead(RateLimiter(rate=10, per=1, burst=10, backend=self.worker_a))
+        self.assertLess(shared - local, 0.005)
+
+
+class BlockingBackend(SQLiteStateBackend):
+    """SQLite backend whose bucket updates wait on a contended lock."""
+
+    def take_tokens(self, *args, **kwargs):
+        time.sleep(0.2)
+        return super().take_tokens(*args, **kwargs)
+
+
+class TestAsyncRateLimit(unittest.IsolatedAsyncioTestCase):
+    """Test cases for rate limit checks made from the event loop."""
+
+    async def test_slow_backend_does_not_block_the_event_loop(self):
+        """acquire runs the backend call in a thread while other coroutines keep running."""
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        limiter = RateLimiter(rate=1, per=60, burst=1,
+                              backend=BlockingBackend(os.path.join(temp_dir, "shared_state.db")))
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        self.assertEqual([await limiter.acquire("client") for _ in range(2)], [True, False])
+        ticker.cancel()
+
+        self.assertGreater(ticks, 10)
+        self.assertEqual(limiter.get_stats()["backend_errors"], 0)
+
+
+class TestRedisStateBackend(unittest.TestCase):
+    """Test cases for state shared through a Redis server."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start the Redis stand-in."""
+        cls.server = FakeRedisServer()
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = f"redis://127.0.0.1:{cls.server.server_address[1]}/0"
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the Redis stand-in."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        """Connect two backends, as two hosts would, to an empty server."""
+        self.server.data.clear()
+        self.worker_a = RedisStateBackend(self.url)
+        self.worker_b = RedisStateBackend(self.url)
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Close the connections."""
+        self.worker_a.close()
+        self.worker_b.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_rate_limit_is_shared_between_hosts(self):
+        """Concurrent limiters on different connections never exceed the burst together."""
+        limiters = [RateLimiter(rate=1, per=60, burst=20, backend=backend, name="query")
+                    for backend in (self.worker_a, self.worker_b)]
+        allowed = []
+
+        def hammer(limiter):
+            for _ in range(20):
+                allowed.append(limiter.can_request("client"))
+
+        threads = [threading.Thread(target=hammer, args=(limiter,)) for limiter in limiters]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(allowed.count(True), 20)
+        self.assertEqual(limiters[0].get_stats()["backend_errors"], 0)
+
+    def test_cache_entries_are_shared_and_cleared(self):
+        """Entries written through one connection are read, counted and cleared through another."""
+        cache_a = Cache(self.temp_dir, disk_store=self.worker_a)
+        cache_b = Cache(self.temp_dir, disk_store=self.worker_b)
+
+        cache_a.set("key", {"value": 1}, ttl=60)
+        self.assertEqual(cache_b.get("key"), {"value": 1})
+        self.assertEqual(self.worker_b.count(), 1)
+
+        cache_b.clear()
+        cache_a.memory_cache.clear()
+        self.assertIsNone(cache_a.get("key"))
+
+    def test_unreachable_server_falls_back_to_local_limit(self):
+        """If the server is down, requests are limited per process instead of failing."""
+        backend = RedisStateBackend("redis://127.0.0.1:1/0", socket_timeout=0.2)
+        limiter = RateLimiter(rate=1, per=60, burst=1, backend=backend)
+
+        self.assertEqual([limiter.can_request("client") for _ in range(2)], [True, False])
+        self.assertEqual(limiter.get_stats()["backend_errors"], 2)
+
+    def test_overhead_benchmark(self):
+        """Benchmark: a shared Redis bucket on a local server adds a few milliseconds per check at most."""
+        local = measure_overhead(RateLimiter(rate=10, per=1, burst=10), calls=200)
+        shared = measure_overhead(RateLimiter(rate=10, per=1, burst=10, backend=self.worker_a), calls=200)
+        self.assertLess(shared - local, 0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Tests for spatial cache-key normalisation.
+
+This module contains unit tests for geohash snapping of coordinates and the
+canonicalisation of place names in tool arguments.
+"""
+
+import os
+import sys
+import unittest
+
+# Add the parent directory to the path to allow importing from the src module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.spatial_key import geohash_encode, canonical_place_name, normalize_location, normalize_arguments
+
+
+class TestSpatialKey(unittest.TestCase):
+    """Test cases for spatial cache-key normalisation."""
+
+    def test_geohash_matches_reference_value(self):
+        """Encoding agrees with the published geohash of a known point."""
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 5), "u4pru")
+
+    def test_nearby_coordinates_share_a_cell(self):
+        """Points a couple of hundred metres apart snap to one key; distant points do not."""
+        a = normalize_location("48.8566,2.3522", 6)
+        b = normalize_location(" 48.8570 , 2.3540 ", 6)
+        far = normalize_location("48.8566,2.4522", 6)
+
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, far)
+        self.assertTrue(a.startswith("geohash:"))
+
+    def test_place_names_are_canonicalised(self):
+        """Case, spacing and comma spacing do not change the key."""
+        self.assertEqual(canonical_place_name("  Paris ,France "), "paris, france")
+        self.assertEqual(normalize_location("PARIS,  france"), normalize_location("paris, France"))
+        # Out-of-range numbers are treated as a name, not coordinates
+        self.assertEqual(normalize_location("123,456"), "place:123, 456")
+
+    def test_numeric_pairs_and_nested_arguments(self):
+        """Separate latitude/longitude values, also nested, become one geohash."""
+        arguments = {"area": {"lat": 48.8566, "lon": 2.3522}, "latitude": 10.0, "longitude": 20.0, "days": 3}
+        normalized = normalize_arguments(arguments, 5)
+
+        self.assertEqual(normalized, {
+            "area": {"geohash": geohash_encode(48.8566, 2.3522, 5)},
+            "geohash": geohash_encode(10.0, 20.0, 5),
+            "days": 3
+        })
+        # The arguments passed to the tool are left as they were
+        self.assertEqual(arguments["latitude"], 10.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,289 @@
+"""
+Tests for the tool executor.
+
+This module contains unit tests for tool execution, caching and request
+coalescing.
+"""
+
+import os
+import sys
+import time
+import shutil
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to the path to allow importing from the src module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.cache import Cache, AsyncCache
+from src.utils.tool_executor import ToolExecutor
+
+
+class TestToolExecutor(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the tool executor."""
+
+    def setUp(self):
+        """Set up an executor backed by a temporary cache."""
+        self.cache_dir = tempfile.mkdtemp()
+        self.async_cache = AsyncCache(Cache(self.cache_dir))
+        self.calls = 0
+        self.release = asyncio.Event()
+
+        async def slow_weather(arguments):
+            self.calls += 1
+            await self.release.wait()
+            return {"location": arguments["location"], "temperature": 21}
+
+        async def failing_tool(arguments):
+            self.calls += 1
+            await self.release.wait()
+            raise RuntimeError("upstream unavailable")
+
+        self.tools = {
+            "get_current_weather": {"function": slow_weather},
+            "failing_tool": {"function": failing_tool}
+        }
+        self.cache_patcher = patch('src.utils.tool_executor.get_async_cache', return_value=self.async_cache)
+        self.cache_patcher.start()
+        self.executor = ToolExecutor(self.tools)
+
+    def tearDown(self):
+        """Tear down test fixtures after each test method."""
+        self.cache_patcher.stop()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    async def test_identical_concurrent_calls_run_once(self):
+        """Concurrent identical calls share a single execution."""
+        tasks = [
+            asyncio.create_task(self.executor.execute_tool("get_current_weather", {"location": "Lahore"}))
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0.05)
+        self.release.set()
+        results = await asyncio.gather(*tasks)
+
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(result == {"location": "Lahore", "temperature": 21} for result in results))
+        self.assertEqual(self.executor.get_stats()["coalesced_calls"], 4)
+        self.assertEqual(self.executor.get_stats()["in_flight"], 0)
+
+        # The shared result was cached for later callers
+        await self.executor.execute_tool("get_current_weather", {"location": "Lahore"})
+        self.assertEqual(self.calls, 1)
+
+    async def test_errors_reach_every_caller(self):
+        """An error from the shared execution is returned to all coalesced callers."""
+        tasks = [
+            asyncio.create_task(self.executor.execute_tool("failing_tool", {"x": 1}))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.05)
+        self.release.set()
+        results = await asyncio.gather(*tasks)
+
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(result == {"error": "upstream unavailable"} for result in results))
+        self.assertEqual(self.executor.get_stats()["coalesced_errors"], 2)
+
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        """Cancelling one caller leaves the shared execution running for the rest."""
+        first = asyncio.create_task(self.executor.execute_tool("get_current_weather", {"location": "Delhi"}))
+        second = asyncio.create_task(self.executor.execute_tool("get_current_weather", {"location": "Delhi"}))
+        await asyncio.sleep(0.05)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        self.release.set()
+
+        self.assertEqual((await second)["location"], "Delhi")
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+        self.assertEqual(self.executor.get_stats()["cancelled_executions"], 0)
+
+    async def test_last_cancelled_caller_cancels_execution(self):
+        """The shared execution is cancelled once no caller is waiting for it."""
+        task = asyncio.create_task(self.executor.execute_tool("get_current_weather", {"location": "Paris"}))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertEqual(self.executor.get_stats()["cancelled_executions"], 1)
+        self.assertEqual(self.executor.get_stats()["in_flight"], 0)
+
+    async def test_stale_results_are_served_while_refreshing(self):
+        """Entries past their soft TTL are returned at once and refreshed once in the background."""
+        arguments = {"location": "Oslo"}
+        cache_key = self.executor._generate_cache_key("get_current_weather", arguments)
+        await self.async_cache.set(cache_key, {"result": {"temperature": 5}, "fresh_until": 0, "swr": True}, 60)
+
+        first = await self.executor.execute_tool("get_current_weather", arguments)
+        second = await self.executor.execute_tool("get_current_weather", arguments)
+        self.assertEqual(first, {"temperature": 5})
+        self.assertEqual(second, {"temperature": 5})
+        self.assertEqual(self.executor.get_stats()["stale_hits"], 2)
+        self.assertEqual(self.executor.get_stats()["background_refreshes"], 1)
+
+        self.release.set()
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.calls, 1)
+        refreshed = await self.executor.execute_tool("get_current_weather", arguments)
+        self.assertEqual(refreshed, {"location": "Oslo", "temperature": 21})
+
+    async def test_failed_refresh_keeps_the_stale_result(self):
+        """A background refresh that fails leaves the stale entry in place and is retried later."""
+        arguments = {"x": 1}
+        cache_key = self.executor._generate_cache_key("failing_tool", arguments)
+        await self.async_cache.set(cache_key, {"result": {"value": 5}, "fresh_until": 0, "swr": True}, 60)
+        self.release.set()
+
+        self.assertEqual(await self.executor.execute_tool("failing_tool", arguments), {"value": 5})
+        await asyncio.sleep(0.05)
+        self.assertEqual(await self.executor.execute_tool("failing_tool", arguments), {"value": 5})
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.executor.get_stats()["failed_refreshes"], 1)
+
+        # Once the retry interval has passed the next stale hit refreshes again
+        self.executor.refresh_retry_interval = 0
+        await self.executor.execute_tool("failing_tool", arguments)
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.calls, 2)
+
+    def test_cache_policy_from_config(self):
+        """Soft and hard TTLs come from the configured policy with built-in fallbacks."""
+        self.executor.cache_policy = {
+            "default": {"stale_factor": 3},
+            "get_current_weather": {"soft_ttl": 60, "hard_ttl": 600}
+        }
+        self.assertEqual(self.executor._determine_cache_policy("get_current_weather", {}), (60, 600))
+        self.assertEqual(self.executor._determine_cache_policy("analyze_area", {}), (43200, 129600))
+        self.assertEqual(self.executor._determine_cache_policy("generate_map", {}), (0, 0))
+        self.assertEqual(self.executor._determine_cache_policy("analyze_area", {"error": "x"}), (300, 300))
+
+    async def test_nearby_locations_hit_the_spatial_cache(self):
+        """Nearby coordinates and respellings of a place are answered from the cache."""
+        self.executor.spatial_precision = {"get_current_weather": 6}
+        self.release.set()
+
+        for location in ["48.8566,2.3522", "48.8570,2.3540", "Paris, France", "  paris,FRANCE"]:
+            result = await self.executor.execute_tool("get_current_weather", {"location": location})
+            self.assertEqual(result["temperature"], 21)
+
+        stats = self.executor.get_stats()
+        self.assertEqual(self.calls, 2)
+        self.assertEqual((stats["cache_hits"], stats["cache_misses"]), (2, 2))
+        self.assertEqual(stats["cache_hit_rate"], 0.5)
+
+    def _add_sleep_tools(self):
+        """Register tools that sleep for a tenth of a second."""
+        async def locate(arguments):
+            await asyncio.sleep(0.1)
+            return {"coordinates": {"lat": 1.0, "lon": 2.0}, "name": arguments["name"]}
+
+        async def analyze(arguments):
+            await asyncio.sleep(0.1)
+            if arguments.get("fail"):
+                return {"error": "analysis failed"}
+            return {"analyzed": arguments}
+
+        self.executor.tools["locate"] = {"function": locate}
+        self.executor.tools["analyze"] = {"function": analyze}
+
+    async def test_pipeline_runs_independent_steps_concurrently(self):
+        """Independent steps overlap while dependent steps wait for their inputs."""
+        self._add_sleep_tools()
+        pipeline = [
+            {"tool": "locate", "arguments": {"name": "a"}, "output_mapping": {"coords": "coordinates"}},
+            {"tool": "locate", "arguments": {"name": "b"}},
+            {"tool": "analyze", "arguments": {"point": "${coords}"}},
+            {"tool": "analyze", "arguments": {"name": "c"}}
+        ]
+
+        start = time.monotonic()
+        results = await self.executor.execute_pipeline(pipeline, use_cache=False)
+        elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 0.35)
+        self.assertEqual([r["tool"] for r in results], ["locate", "locate", "analyze", "analyze"])
+        self.assertEqual(results[2]["arguments"], {"point": {"lat": 1.0, "lon": 2.0}})
+        self.assertEqual(self.executor._build_pipeline_dependencies(pipeline), [{}, {}, {"coords": 0}, {}])
+
+    async def test_pipeline_stops_after_failed_required_step(self):
+        """Results end at a failed required step, while optional failures continue."""
+        self._add_sleep_tools()
+        pipeline = [
+            {"tool": "analyze", "arguments": {"fail": True}, "required": False},
+            {"tool": "analyze", "arguments": {"fail": True}},
+            {"tool": "locate", "arguments": {"name": "never"}}
+        ]
+
+        results = await self.executor.execute_pipeline(pipeline, use_cache=False, max_concurrency=1)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[1]["result"], {"error": "analysis failed"})
+
+    async def test_parallel_results_keyed_by_call_index(self):
+        """Two calls to the same tool keep separate results."""
+        self._add_sleep_tools()
+        results = await self.executor.execute_parallel(
+            [("locate", {"name": "a"}), ("locate", {"name": "b"})], use_cache=False
+        )
+        self.assertEqual(results[0]["name"], "a")
+        self.assertEqual(results[1]["name"], "b")
+
+        metrics = self.executor.get_stats()["parallel"]["locate"]
+        self.assertEqual(metrics["calls"], 2)
+        self.assertGreater(metrics["execution_avg"], 0.05)
+
+    async def test_parallel_per_tool_limit_and_timeout(self):
+        """Per-tool limits queue extra calls and slow calls hit their timeout."""
+        self._add_sleep_tools()
+        self.executor.max_concurrent_per_tool = 1
+        self.executor.tool_timeouts = {"get_current_weather": 0.05}
+
+        results = await self.executor.execute_parallel([
+            ("locate", {"name": "a"}),
+            ("locate", {"name": "b"}),
+            ("get_current_weather", {"location": "Rome"})
+        ], use_cache=False)
+
+        self.assertIn("timed out", results[2]["error"])
+        stats = self.executor.get_stats()["parallel"]
+        self.assertEqual(stats["get_current_weather"]["timeouts"], 1)
+        self.assertGreater(stats["locate"]["queue_wait_max"], 0.05)
+
+    async def test_busy_tool_does_not_hold_global_slots(self):
+        """Calls queued on a saturated tool leave global slots free for other tools."""
+        self._add_sleep_tools()
+        self.executor.max_concurrent_per_tool = 1
+        self.executor._global_semaphore = asyncio.Semaphore(2)
+
+        await self.executor.execute_parallel([
+            ("locate", {"name": "a"}),
+            ("locate", {"name": "b"}),
+            ("locate", {"name": "c"}),
+            ("analyze", {"name": "d"})
+        ], use_cache=False)
+
+        self.assertLess(self.executor.get_stats()["parallel"]["analyze"]["queue_wait_max"], 0.05)
+
+    async def test_parallel_cancel_event_cancels_outstanding_calls(self):
+        """Setting the cancel event cancels calls that have not finished."""
+        self._add_sleep_tools()
+        cancel_event = asyncio.Event()
+        run = asyncio.create_task(self.executor.execute_parallel([
+            ("locate", {"name": "a"}),
+            ("get_current_weather", {"location": "Lima"})
+        ], use_cache=False, cancel_event=cancel_event))
+
+        await asyncio.sleep(0.15)
+        cancel_event.set()
+        results = await run
+
+        self.assertEqual(results[0]["name"], "a")
+        self.assertIn("cancelled", results[1]["error"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+"""
+Tests for the WebSocket wire formats.
+
+This module checks JSON and MessagePack framing, chunking of large
+messages, delivery of both through the connection manager, and that a real
+server negotiates permessage-deflate. It also benchmarks the bytes on the
+wire and the serialisation CPU of each format for a large tool result.
+"""
+
+import os
+import sys
+import time
+import zlib
+import random
+import asyncio
+import unittest
+from pathlib import Path
+from datetime import date
+
+import uvicorn
+import websockets
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+
+# Add the parent directory to the path to allow importing from the src module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.connection_manager import ConnectionManager
+from src.utils.wire_format import (
+    encode_message, decode_message, frame_message, join_chunks, negotiate_encoding, frame_size
+)
+
+
+def climate_trend_result(years: int = 75) -> dict:
+    """A tool response shaped like a climate trend analysis."""
+    rng = random.Random(1)
+    return {
+        "type": "tool_result_with_analysis",
+        "tool_name": "analyze_climate_trends",
+        "result": {
+            "region": "Paris",
+            "yearly": {
+                str(year): {
+                    "temperature": {"mean": round(rng.uniform(10, 15), 3), "max": round(rng.uniform(30, 38), 3)},
+                    "precipitation": [round(rng.uniform(0, 120), 2) for _ in range(12)]
+                }
+                for year in range(1950, 1950 + years)
+            },
+            "file_path": "/tmp/map_paris.html"
+        },
+        "analysis": "Temperatures rose steadily over the period. " * 10
+    }
+
+
+def deflated_size(payload: bytes) -> int:
+    """Size of a payload compressed as one permessage-deflate message."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return len(compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+
+
+class FakeWebSocket:
+    """In-memory stand-in for a WebSocket that records text and binary frames."""
+
+    def __init__(self):
+        self.frames = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.frames.append(text)
+
+    async def send_bytes(self, data):
+        self.frames.append(data)
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+
+class TestWireFormat(unittest.TestCase):
+    """Test cases for encoding and chunking messages."""
+
+    def test_messages_round_trip_in_both_encodings(self):
+        """JSON is sent as text and MessagePack as bytes; both decode to the original message."""
+        message = climate_trend_result(years=2)
+
+        self.assertIsInstance(encode_message(message, "json"), str)
+        self.assertIsInstance(encode_message(message, "msgpack"), bytes)
+        for encoding in ("json", "msgpack"):
+            self.assertEqual(decode_message(encode_message(message, encoding)), message)
+
+    def test_unknown_encoding_falls_back_to_json(self):
+        """Only available encodings are negotiated."""
+        self.assertEqual(negotiate_encoding("msgpack"), "msgpack")
+        self.assertEqual(negotiate_encoding("protobuf"), "json")
+        self.assertEqual(negotiate_encoding(None), "json")
+
+    def test_large_messages_are_chunked(self):
+        """A message above the frame limit is split into chunks that rejoin to the original."""
+        message = climate_trend_result()
+        for encoding in ("json", "msgpack"):
+            frames = frame_message(message, encoding, max_frame_bytes=4096)
+            chunks = [decode_message(frame) for frame in frames]
+
+            self.assertGreater(len(frames), 2)
+            self.assertTrue(all(chunk["type"] == "chunk" and chunk["count"] == len(frames) for chunk in chunks))
+            self.assertEqual(join_chunks(list(reversed(chunks))), message)
+        self.assertEqual(len(frame_message(message, "json")), 1)
+
+    def test_chunks_fit_the_frame_limit_in_bytes(self):
+        """Chunks of text with multi-byte characters and escapes stay within the limit in bytes."""
+        message = {"analysis": "Température \"moyenne\" 気温 " * 2000}
+        for encoding in ("json", "msgpack"):
+            frames = frame_message(message, encoding, max_frame_bytes=4096)
+
+            self.assertTrue(all(frame_size(frame) <= 4096 for frame in frames))
+            self.assertEqual(join_chunks([decode_message(frame) for frame in frames]), message)
+        # Without a limit, as for clients that do not join chunks, a message is one frame
+        self.assertEqual(len(frame_message(message, "json", max_frame_bytes=None)), 1)
+
+    def test_values_outside_both_formats_are_encoded(self):
+        """Datetimes, sets and other non-native values in tool results do not break encoding."""
+        message = {"day": date(2026, 10, 19), "tags": {"rain"}, "path": Path("/tmp/map.html")}
+        expected = {"day": "2026-10-19", "tags": ["rain"], "path": "/tmp/map.html"}
+        for encoding in ("json", "msgpack"):
+            self.assertEqual(decode_message(encode_message(message, encoding)), expected)
+
+    def test_wire_size_and_cpu_benchmark(self):
+        """Benchmark: deflate shrinks both formats; MessagePack is much cheaper to encode."""
+        message = climate_trend_result()
+        results = {}
+        for encoding in ("json", "msgpack"):
+            start = time.process_time()
+            for _ in range(100):
+                payload = encode_message(message, encoding)
+            cpu = (time.process_time() - start) / 100
+            raw = payload if isinstance(payload, bytes) else payload.encode("utf-8")
+            results[encoding] = (len(raw), deflated_size(raw), cpu)
+
+        for raw, deflated, _ in results.values():
+            self.assertLess(deflated, raw / 2)
+        self.assertLess(results["msgpack"][2], results["json"][2] / 2)
+
+
+class TestConnectionManagerFraming(unittest.IsolatedAsyncioTestCase):
+    """Test cases for sending encoded frames through the connection manager."""
+
+    async def test_clients_receive_their_own_encoding(self):
+        """One broadcast reaches a JSON client as text and a MessagePack client as chunked bytes."""
+        manager = ConnectionManager(max_frame_bytes=4096)
+        json_client, msgpack_client = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(json_client, encoding="json", chunked=True)
+        msgpack_session = await manager.connect(msgpack_client, encoding="msgpack", chunked=True)
+
+        message = climate_trend_result()
+        await manager.broadcast_json(message)
+        await asyncio.sleep(0.05)
+
+        self.assertTrue(all(isinstance(frame, str) for frame in json_client.frames))
+        self.assertTrue(all(isinstance(frame, bytes) for frame in msgpack_client.frames))
+        for client in (json_client, msgpack_client):
+            self.assertEqual(join_chunks([decode_message(frame) for frame in client.frames]), message)
+
+        stats = manager.get_client_stats(msgpack_session)
+        self.assertEqual(stats["sent"], 1)
+        self.assertEqual(stats["bytes_sent"], sum(frame_size(frame) for frame in msgpack_client.frames))
+        # Encoded once per format
+        self.assertEqual(manager.get_stats()["chunked_messages"], 2)
+
+    async def test_clients_without_chunking_get_whole_messages(self):
+        """Clients that did not opt in to chunks get large messages as one frame."""
+        manager = ConnectionManager(max_frame_bytes=4096)
+        client = FakeWebSocket()
+        await manager.connect(client)
+
+        await manager.broadcast_json(climate_trend_result())
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(len(client.frames), 1)
+        self.assertEqual(decode_message(client.frames[0]), climate_trend_result())
+
+    async def test_unencodable_message_is_logged_not_raised(self):
+        """A message that cannot be encoded is refused without raising to the caller."""
+        manager = ConnectionManager()
+        session_id = await manager.connect(FakeWebSocket())
+        message = {"kind": "loop"}
+        message["self"] = message
+
+        self.assertFalse(await manager.send_json(session_id, message))
+        self.assertEqual(manager.get_stats()["encode_errors"], 1)
+
+
+class TestPerMessageDeflate(unittest.IsolatedAsyncioTestCase):
+    """Test cases for compression negotiated by a real server."""
+
+    async def asyncSetUp(self):
+        """Serve a connection manager endpoint with uvicorn on a free port."""
+        self.manager = ConnectionManager()
+        app = FastAPI()
+
+        @app.websocket("/ws")
+        async def endpoint(websocket: WebSocket):
+            session_id = await self.manager.connect(websocket, encoding=websocket.query_params.get("encoding", "json"))
+            await self.manager.send_json(session_id, climate_trend_result())
+            try:
+                await websocket.receive_text()
+            except WebSocketDisconnect:
+                await self.manager.disconnect(session_id)
+
+        config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", ws_per_message_deflate=True)
+        self.server = uvicorn.Server(config)
+        self.serving = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.01)
+        self.port = self.server.servers[0].sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        """Stop the server."""
+        self.server.should_exit = True
+        await self.serving
+
+    async def test_deflate_is_negotiated_for_both_encodings(self):
+        """Clients offering permessage-deflate get compressed frames that decode to the full message."""
+        for encoding in ("json", "msgpack"):
+            async with websockets.connect(f"ws://127.0.0.1:{self.port}/ws?encoding={encoding}",
+                                          compression="deflate") as client:
+                extensions = client.response.headers.get("Sec-WebSocket-Extensions", "")
+                frame = await client.recv()
+
+            self.assertIn("permessage-deflate", extensions)
+            self.assertEqual(decode_message(frame), climate_trend_result())
+
+
+if __name__ == '__main__':
+    unittest.main()
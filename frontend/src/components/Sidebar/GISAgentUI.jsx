@@ -181,7 +181,8 @@ const GISAgentUI = ({ showNotification }) => {
           const query = {
             type: 'query',
             query: messageToSend,
-            session_id: sessionId
+            session_id: sessionId,
+            stream: true
           };
           
           try {
@@ -636,16 +637,38 @@ const GISAgentUI = ({ showNotification }) => {
 
       // Handle error response
       if (response.error) {
+        finishStreamingLastMessage();
         addMessage(`Error: ${response.error}`, 'assistant');
         setIsWaitingForResponse(false);
         return;
       }
 
+      // Handle streamed text as it arrives
+      if (response.type === 'response_chunk') {
+        appendStreamChunk(response.content || '');
+        return;
+      }
+
+      // Handle tool progress while tools run
+      if (response.type === 'tool_progress') {
+        if (response.status === 'started' && showNotification) {
+          showNotification(`Running ${response.tool_name}...`, 'info');
+        }
+        return;
+      }
+
       // Handle standard text response
       if (response.type === 'response') {
         // Simple formatting for JSON content that might be in the response
         let messageText = response.response || 'I received your message but the response was empty.';
         
+        // The text was streamed already; the final message carries the complete version
+        if (response.streamed) {
+          finishStreamingLastMessage(formatJSONInText(messageText));
+          setIsWaitingForResponse(false);
+          return;
+        }
+        
         // Filter out welcome messages if we've already shown one
         if (welcomeShownRef.current && isWelcomeMessage(messageText)) {
           console.log('Filtering out duplicate welcome message from server');
@@ -685,6 +708,15 @@ const GISAgentUI = ({ showNotification }) => {
 
         // Add the data message
         const dataMessage = `Tool \`${response.tool_name}\` executed.\nArguments: ${JSON.stringify(response.arguments, null, 2)}\n${toolOutput}`;
+
+        // The analysis was streamed already; complete it and add the data after it
+        if (response.streamed) {
+          finishStreamingLastMessage(response.analysis);
+          addMessage(dataMessage, 'assistant', true);
+          setIsWaitingForResponse(false);
+          return;
+        }
+
         addMessage(dataMessage, 'assistant', true);
 
         // Add the analysis after a short delay
@@ -815,8 +847,28 @@ const GISAgentUI = ({ showNotification }) => {
     });
   };
 
-  // Mark the last message as no longer streaming
-  const finishStreamingLastMessage = () => {
+  // Append a streamed chunk, starting a streaming message if none is open
+  const appendStreamChunk = (content) => {
+    setMessages((prev) => {
+      const lastMessage = prev[prev.length - 1];
+      
+      if (lastMessage && lastMessage.isStreaming) {
+        return [...prev.slice(0, -1), { ...lastMessage, text: lastMessage.text + content }];
+      }
+      
+      return [...prev, {
+        id: Date.now() + Math.random(),
+        text: content,
+        sender: 'assistant',
+        timestamp: new Date().toISOString(),
+        isToolData: false,
+        isStreaming: true
+      }];
+    });
+  };
+
+  // Mark the last message as no longer streaming, optionally replacing its text
+  const finishStreamingLastMessage = (finalText) => {
     setMessages((prev) => {
       const messages = [...prev];
       const lastMessage = messages[messages.length - 1];
@@ -824,6 +876,7 @@ const GISAgentUI = ({ showNotification }) => {
       if (lastMessage && lastMessage.isStreaming) {
         messages[messages.length - 1] = {
           ...lastMessage,
+          text: finalText !== undefined && finalText !== null ? finalText : lastMessage.text,
           isStreaming: false
         };
       }
@@ -854,7 +907,8 @@ const GISAgentUI = ({ showNotification }) => {
     const query = {
       type: 'query',
       query: inputValue,
-      session_id: sessionId
+      session_id: sessionId,
+      stream: true
     };
 
     // Send to server if connected